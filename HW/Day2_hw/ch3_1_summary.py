@@ -1,10 +1,11 @@
+import os
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 # 1) 連到你的 vLLM OpenAI-Compatible Server
 llm = ChatOpenAI(
-    base_url="https://ws-02.wade0426.me/v1",
+    base_url=os.getenv("LLM_BASE_URL", "https://ws-02.wade0426.me/v1"),
     api_key="vllm-token",  # vLLM 通常不驗證，填什麼都行
     model="google/gemma-3-27b-it",  # 先用你目前跑得動的
     temperature=0.7,
@@ -1,9 +1,10 @@
+import os
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 llm = ChatOpenAI(
-    base_url="https://ws-02.wade0426.me/v1",
+    base_url=os.getenv("LLM_BASE_URL", "https://ws-02.wade0426.me/v1"),
     api_key="vllm-token",
     model="google/gemma-3-27b-it",
     temperature=0.7,
@@ -1,3 +1,4 @@
+import os
 import time
 from typing import Dict
 
@@ -8,7 +9,8 @@ from langchain_core.runnables import RunnableParallel
 
 
 # ===== 你的 vLLM OpenAI-compatible endpoint =====
-BASE_URL = "https://ws-02.wade0426.me/v1"
+# LLM_BASE_URL：統一指到其他 OpenAI-compatible 服務（例如本機的 HW/shared/llm_stub.py）
+BASE_URL = os.getenv("LLM_BASE_URL", "https://ws-02.wade0426.me/v1")
 API_KEY = "vllm-token"
 MODEL = "google/gemma-3-27b-it"   # 先用你目前跑得動的；之後再換更大的
 
@@ -1,8 +1,9 @@
+import os
 from openai import OpenAI
 
 # 連到你本機 vLLM OpenAI-compatible server
 client = OpenAI(
-    base_url="https://ws-02.wade0426.me/v1",
+    base_url=os.getenv("LLM_BASE_URL", "https://ws-02.wade0426.me/v1"),
     api_key="vllm-token"   # vLLM 通常不驗證，隨便填也可
 )
 
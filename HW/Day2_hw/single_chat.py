@@ -1,9 +1,11 @@
+import os
 import json
 import re
 from openai import OpenAI
 
 # ===== 你的 vLLM OpenAI-compatible endpoint =====
-BASE_URL = "https://ws-02.wade0426.me/v1"
+# LLM_BASE_URL：統一指到其他 OpenAI-compatible 服務（例如本機的 HW/shared/llm_stub.py）
+BASE_URL = os.getenv("LLM_BASE_URL", "https://ws-02.wade0426.me/v1")
 API_KEY = "vllm-token"
 
 # 模型可以換：例如 "google/gemma-3-27b-it" 或老師指定那個
@@ -1,7 +1,8 @@
+import os
 from openai import OpenAI
 
 client = OpenAI(
-    base_url="https://ws-02.wade0426.me/v1",
+    base_url=os.getenv("LLM_BASE_URL", "https://ws-02.wade0426.me/v1"),
     api_key="vllm-token",
 )
 
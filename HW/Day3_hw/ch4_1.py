@@ -7,7 +7,8 @@ from langchain_openai import ChatOpenAI
 
 load_dotenv()
 
-BASE_URL = os.getenv("OPENAI_BASE_URL")
+# LLM_BASE_URL：統一指到其他 OpenAI-compatible 服務（例如本機的 HW/shared/llm_stub.py）
+BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv("OPENAI_BASE_URL")
 API_KEY  = os.getenv("OPENAI_API_KEY")
 MODEL    = os.getenv("OPENAI_MODEL")
 
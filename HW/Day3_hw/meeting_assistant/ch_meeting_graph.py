@@ -32,7 +32,8 @@ OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 # 只讀 meeting_assistant/.env（不碰外層 Day3_hw/.env）
 load_dotenv(ROOT / ".env")
 
-OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "").strip()
+# LLM_BASE_URL：統一指到其他 OpenAI-compatible 服務（例如本機的 HW/shared/llm_stub.py）
+OPENAI_BASE_URL = (os.getenv("LLM_BASE_URL") or os.getenv("OPENAI_BASE_URL", "")).strip()
 OPENAI_API_KEY  = os.getenv("OPENAI_API_KEY", "").strip()
 OPENAI_MODEL    = os.getenv("OPENAI_MODEL", "").strip()
 
@@ -2,20 +2,30 @@
 # -*- coding: utf-8 -*-
 import argparse
 import os
+import sys
 import time
 from pathlib import Path
 
 import requests
 
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[3] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import http_pool  # noqa: E402
+
 
 def wait_download(url: str, auth: tuple[str, str], max_tries: int, poll_s: float) -> str | None:
     """Poll an endpoint until 200 OK, otherwise keep waiting (commonly 404 while processing)."""
     for _ in range(max_tries):
         try:
-            resp = requests.get(url, timeout=(5, 60), auth=auth)
+            # 輪詢走共用連線池：每次不用重新 TLS 握手，5xx / 逾時由 http_pool 先重試
+            resp = http_pool.get(url, timeout=(5, 60), auth=auth)
             if resp.status_code == 200:
                 return resp.text
-        except requests.exceptions.ReadTimeout:
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            # 重試用完的讀取逾時會包成 ConnectionError
             pass
         time.sleep(poll_s)
     return None
@@ -57,7 +67,7 @@ def main() -> int:
     print(f"[HW-asr] audio={audio_path}")
     print(f"[HW-asr] out_dir={out_dir}")
 
-    # 1) create task
+    # 1) create task（上傳檔案建立任務不是冪等的，維持原本的 requests.post）
     with open(audio_path, "rb") as f:
         r = requests.post(create_url, files={"audio": f}, timeout=60, auth=auth)
     r.raise_for_status()
@@ -85,6 +95,7 @@ def main() -> int:
             srt_path.write_text(srt_text, encoding="utf-8")
             print("轉錄成功:", srt_path)
 
+    http_pool.print_stats()
     return 0
 
 
@@ -18,7 +18,8 @@ from langgraph.prebuilt import ToolNode
 
 load_dotenv()
 
-BASE_URL = os.getenv("BASE_URL", "https://ws-05.huannago.com/v1")
+# LLM_BASE_URL：統一指到其他 OpenAI-compatible 服務（例如本機的 HW/shared/llm_stub.py）
+BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv("BASE_URL", "https://ws-05.huannago.com/v1")
 API_KEY = os.getenv("API_KEY", "aabbccdd1115")
 MODEL = os.getenv("MODEL", "Qwen3-VL-8B-Instruct-BF16.gguf")
 
@@ -13,7 +13,8 @@ from langgraph.graph import StateGraph, END
 # =============================
 load_dotenv()
 
-BASE_URL = os.getenv("BASE_URL", "https://ws-02.wade0426.me/v1")
+# LLM_BASE_URL：統一指到其他 OpenAI-compatible 服務（例如本機的 HW/shared/llm_stub.py）
+BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv("BASE_URL", "https://ws-02.wade0426.me/v1")
 API_KEY = os.getenv("API_KEY", "")
 MODEL = os.getenv("MODEL", "google/gemma-3-27b-it")
 
@@ -15,12 +15,15 @@ from langgraph.graph import StateGraph, END
 load_dotenv()
 
 # 慢但強（Expert）：老師常用 ws-02 + gemma
-EXPERT_BASE_URL = os.getenv("EXPERT_BASE_URL", os.getenv("BASE_URL", "https://ws-02.wade0426.me/v1"))
+# LLM_BASE_URL：統一指到其他 OpenAI-compatible 服務（例如本機的 HW/shared/llm_stub.py）
+EXPERT_BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv(
+    "EXPERT_BASE_URL", os.getenv("BASE_URL", "https://ws-02.wade0426.me/v1")
+)
 EXPERT_API_KEY = os.getenv("EXPERT_API_KEY", os.getenv("API_KEY", ""))
 EXPERT_MODEL = os.getenv("EXPERT_MODEL", os.getenv("MODEL", "google/gemma-3-27b-it"))
 
 # 快速通道（Fast）：你自己的 ws-05 + qwen (或任何你可用的快速模型)
-FAST_BASE_URL = os.getenv("FAST_BASE_URL", "https://ws-05.huannago.com/v1")
+FAST_BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv("FAST_BASE_URL", "https://ws-05.huannago.com/v1")
 FAST_API_KEY = os.getenv("FAST_API_KEY", os.getenv("API_KEY", ""))
 FAST_MODEL = os.getenv("FAST_MODEL", "Qwen3-VL-8B-Instruct-BF16.gguf")
 
@@ -1,5 +1,14 @@
 import requests
 import json
+import sys
+from pathlib import Path
+
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[1] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import http_pool  # noqa: E402
 
 SEARXNG_URL = "https://puli-8080.huannago.com/search"
 
@@ -31,7 +40,7 @@ def search_searxng(query: str, time_range: str = None, limit: int = 3):
 
     try:
         # 發送請求
-        response = requests.get(SEARXNG_URL, params=params, timeout=10)
+        response = http_pool.get(SEARXNG_URL, params=params, timeout=10)
         response.raise_for_status() # 檢查 HTTP 狀態碼
         
         data = response.json()
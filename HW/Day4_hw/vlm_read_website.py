@@ -5,7 +5,7 @@ from langchain_core.messages import HumanMessage
 from playwright.sync_api import sync_playwright
 
 llm = ChatOpenAI(
-    base_url="https://ws-05.huannago.com/v1",
+    base_url=os.getenv("LLM_BASE_URL", "https://ws-05.huannago.com/v1"),
     api_key="",
     model="Qwen3-VL-8B-Instruct-BF16.gguf",
     temperature=0
@@ -0,0 +1,153 @@
+# cw01_semantic_cache.py
+# Semantic answer cache for rag_answer
+# - key = query embedding（cosine 相似度 >= threshold 視為同一題）+ collection 版本
+# - 命中時直接回傳上次的 answer / used_chunk_ids，不打 Qdrant、不打 LLM
+# - TTL 過期 + 容量上限（滿了先丟過期的，再丟最久沒用到的）
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CACHE_THRESHOLD = 0.92  # cosine 相似度門檻（embed API 有 normalize，內積即 cosine）
+CACHE_TTL_SEC = 600
+CACHE_MAX_ENTRIES = 1024
+
+
+@dataclass
+class CacheEntry:
+    query_text: str
+    scope: str  # collection 版本 + top_k，不同 scope 不能互相命中
+    context: str
+    answer: str
+    used_chunk_ids: List[str]
+    created_at: float
+    last_used: float
+
+
+@dataclass
+class CacheHit:
+    entry: CacheEntry
+    similarity: float
+
+
+class SemanticAnswerCache:
+    """Fixed-capacity answer cache; lookup is one matrix-vector product over all slots."""
+
+    def __init__(
+        self,
+        dim: int,
+        *,
+        threshold: float = CACHE_THRESHOLD,
+        ttl_sec: float = CACHE_TTL_SEC,
+        max_entries: int = CACHE_MAX_ENTRIES,
+    ) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be > 0")
+        self.dim = dim
+        self.threshold = threshold
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+
+        self._vecs = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries: List[Optional[CacheEntry]] = [None] * max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # -----------------------------
+    # helpers
+    # -----------------------------
+    def _normalize(self, vec: List[float]) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32)
+        if v.shape != (self.dim,):
+            raise ValueError(f"query vector dim mismatch: got {v.shape}, expected ({self.dim},)")
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else v
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_sec
+
+    def _free_slot(self, now: float) -> int:
+        # 1) 空位  2) 已過期  3) 最久沒用到的（LRU）
+        lru_slot, lru_time = 0, float("inf")
+        for slot, entry in enumerate(self._entries):
+            if entry is None or self._expired(entry, now):
+                return slot
+            if entry.last_used < lru_time:
+                lru_slot, lru_time = slot, entry.last_used
+        self.evictions += 1
+        return lru_slot
+
+    # -----------------------------
+    # public API
+    # -----------------------------
+    def lookup(self, query_vec: List[float], scope: str) -> Optional[CacheHit]:
+        now = time.time()
+        q = self._normalize(query_vec)
+        sims = self._vecs @ q
+
+        best_slot, best_sim = -1, self.threshold
+        for slot in np.argsort(-sims):
+            sim = float(sims[slot])
+            if sim < best_sim:
+                break
+            entry = self._entries[slot]
+            if entry is None or entry.scope != scope:
+                continue
+            if self._expired(entry, now):
+                self._entries[slot] = None
+                self._vecs[slot] = 0.0
+                continue
+            best_slot, best_sim = int(slot), sim
+            break
+
+        if best_slot < 0:
+            self.misses += 1
+            return None
+
+        entry = self._entries[best_slot]
+        entry.last_used = now
+        self.hits += 1
+        return CacheHit(entry=entry, similarity=best_sim)
+
+    def store(
+        self,
+        query_vec: List[float],
+        scope: str,
+        *,
+        query_text: str,
+        context: str,
+        answer: str,
+        used_chunk_ids: List[str],
+    ) -> None:
+        now = time.time()
+        slot = self._free_slot(now)
+        self._vecs[slot] = self._normalize(query_vec)
+        self._entries[slot] = CacheEntry(
+            query_text=query_text,
+            scope=scope,
+            context=context,
+            answer=answer,
+            used_chunk_ids=list(used_chunk_ids),
+            created_at=now,
+            last_used=now,
+        )
+
+    def clear(self) -> None:
+        self._vecs[:] = 0.0
+        self._entries = [None] * self.max_entries
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": sum(e is not None for e in self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
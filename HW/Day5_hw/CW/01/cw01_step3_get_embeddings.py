@@ -2,11 +2,21 @@
 # Goal: Get embeddings from senior's embed API (dim=4096) in batches and save to embeddings.json
 
 import json
+import sys
 import time
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import requests
 
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[3] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import embed_wire  # noqa: E402
+import http_pool  # noqa: E402
+
 EMBED_API_URL = "https://ws-04.wade0426.me/embed"
 OUT_FILE = "embeddings.json"
 
@@ -48,20 +58,16 @@ def get_embeddings_batch(
     if task_description is not None:
         payload["task_description"] = task_description
 
-    resp = requests.post(EMBED_API_URL, json=payload, timeout=timeout)
-
-    # 不是 2xx 先印出錯誤，debug 比較快
-    if not resp.ok:
-        print("❌ embed API error:", resp.status_code)
-        print(resp.text[:500])
-        resp.raise_for_status()
-
-    data = resp.json()
-    embeddings = data.get("embeddings") or data.get("embedding")
-    if embeddings is None:
-        raise ValueError(f"Response missing embeddings field. keys={list(data.keys())}")
+    # 優先要 base64 float32（np.frombuffer 還原），server 不支援就退回 JSON 小數
+    try:
+        mat = embed_wire.post_embeddings(http_pool.post, EMBED_API_URL, payload, timeout=timeout, retry=True)
+    except requests.HTTPError as e:
+        # 不是 2xx 先印出錯誤，debug 比較快
+        print("❌ embed API error:", e.response.status_code)
+        print(e.response.text[:500])
+        raise
 
-    return embeddings
+    return mat.tolist()
 
 
 def get_embeddings_batched(
@@ -130,6 +136,7 @@ def main():
     print("count:", len(texts))
     print("dim:", dim)
     print("saved:", OUT_FILE)
+    http_pool.print_stats()
 
 
 if __name__ == "__main__":
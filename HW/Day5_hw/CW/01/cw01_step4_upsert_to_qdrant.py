@@ -1,12 +1,22 @@
 # cw01_step4_upsert_to_qdrant.py
 
+import argparse
+import hashlib
 import json
+import sys
+from pathlib import Path
 from typing import Any, Dict, List, Tuple, Optional
 
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams, PointStruct
 
-QDRANT_URL = "http://localhost:6333"
+# make_client 放在 CW/02/vdb_qdrant.py（URL / gRPC / :memory: / 本機路徑）
+CW02_DIR = Path(__file__).resolve().parents[1] / "02"
+if str(CW02_DIR) not in sys.path:
+    sys.path.insert(0, str(CW02_DIR))
+
+from vdb_qdrant import QDRANT_URL, make_client  # noqa: E402
+
 COLLECTION = "cw01"
 IN_FILE = "embeddings.json"
 
@@ -50,6 +60,11 @@ def build_points(
     meta: Dict[str, Any],
 ) -> List[PointStruct]:
     """Build Qdrant points with payload."""
+    # 同樣的內容得到同樣的 index_version；step7 服務靠它判斷要不要作廢語意快取
+    embed_meta = {k: v for k, v in meta.items() if k not in ("texts", "embeddings")}
+    index_version = hashlib.sha1(
+        json.dumps([texts, embed_meta], sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()[:12]
     model_name = meta.get("model")  # local ST
     provider = meta.get("provider")  # senior API
     embed_api_url = meta.get("embed_api_url")
@@ -63,6 +78,7 @@ def build_points(
             "source": "cw01_embeddings_json",
             "chunk_id": i,
             "dim": dim,
+            "index_version": index_version,
         }
 
         # attach whichever metadata exists
@@ -96,22 +112,36 @@ def upsert_points_batched(
         print(f"✅ upserted {start + 1}~{start + len(batch)} / {total}")
 
 
+def build_argparser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="CW01 Step4 - upsert embeddings.json into Qdrant")
+    ap.add_argument("--in-file", default=IN_FILE, help="embeddings.json path")
+    ap.add_argument("--collection", default=COLLECTION)
+    ap.add_argument(
+        "--qdrant",
+        default=None,
+        help=f"Qdrant URL, ':memory:' or local path (default: $QDRANT_LOCATION or {QDRANT_URL})",
+    )
+    ap.add_argument("--grpc", action="store_true", help="use gRPC for remote Qdrant")
+    return ap
+
+
 def main():
-    dim, texts, embeddings, meta = load_embeddings_json(IN_FILE)
+    args = build_argparser().parse_args()
+    dim, texts, embeddings, meta = load_embeddings_json(args.in_file)
 
-    client = QdrantClient(url=QDRANT_URL)
+    client = make_client(args.qdrant, prefer_grpc=args.grpc)
 
     # Fresh collection (avoid deprecated recreate_collection)
-    ensure_fresh_collection(client, COLLECTION, dim)
+    ensure_fresh_collection(client, args.collection, dim)
 
     points = build_points(dim, texts, embeddings, meta)
 
     # Batch upsert (senior wants batching)
-    upsert_points_batched(client, COLLECTION, points, batch_size=UPSERT_BATCH_SIZE)
+    upsert_points_batched(client, args.collection, points, batch_size=UPSERT_BATCH_SIZE)
 
-    info = client.get_collection(COLLECTION)
+    info = client.get_collection(args.collection)
     print("✅ Step4 done")
-    print("collection:", COLLECTION)
+    print("collection:", args.collection)
     print("dim:", dim)
     print("points_count:", info.points_count)
 
@@ -1,10 +1,20 @@
 from __future__ import annotations
 
+import sys
 import time
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import requests
 
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[3] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import embed_wire  # noqa: E402
+import http_pool  # noqa: E402
+
 QDRANT_URL = "http://localhost:6333"
 COLLECTION = "cw01"
 TOP_K = 3
@@ -41,18 +51,15 @@ def embed_texts_batched(
         if task_description is not None:
             payload["task_description"] = task_description
 
-        resp = requests.post(EMBED_API_URL, json=payload, timeout=timeout)
-        if not resp.ok:
-            print(f"❌ embed error: status={resp.status_code}")
-            print(resp.text[:500])
-            resp.raise_for_status()
-
-        data = resp.json()
-        embeddings = data.get("embeddings") or data.get("embedding")
-        if embeddings is None:
-            raise ValueError(f"Missing embeddings field. keys={list(data.keys())}")
+        # 優先要 base64 float32（np.frombuffer 還原），server 不支援就退回 JSON 小數
+        try:
+            mat = embed_wire.post_embeddings(http_pool.post, EMBED_API_URL, payload, timeout=timeout, retry=True)
+        except requests.HTTPError as e:
+            print(f"❌ embed error: status={e.response.status_code}")
+            print(e.response.text[:500])
+            raise
 
-        all_embeddings.extend(embeddings)
+        all_embeddings.extend(mat.tolist())
         print(f"✅ embed batch {idx}/{len(batches)} (size={len(batch_texts)})")
 
         if sleep_sec > 0:
@@ -76,7 +83,7 @@ def qdrant_search_rest(
     url = f"{QDRANT_URL}/collections/{COLLECTION}/points/search"
     payload = {"vector": query_vec, "limit": top_k, "with_payload": with_payload}
 
-    resp = requests.post(url, json=payload, timeout=timeout)
+    resp = http_pool.post(url, json=payload, timeout=timeout, retry=True)  # 搜尋是冪等的
     if not resp.ok:
         print(f"❌ qdrant error: status={resp.status_code}")
         print(resp.text[:500])
@@ -129,6 +136,7 @@ def main():
     )
 
     print_results(query_text, results, TOP_K)
+    http_pool.print_stats()
 
 
 if __name__ == "__main__":
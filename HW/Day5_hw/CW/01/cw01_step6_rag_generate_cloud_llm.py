@@ -5,11 +5,21 @@
 from __future__ import annotations
 
 import os
+import sys
 import time
+from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[3] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import embed_wire  # noqa: E402
+import http_pool  # noqa: E402
+
 # -----------------------------
 # Qdrant (local)
 # -----------------------------
@@ -31,7 +41,9 @@ SLEEP_SEC = 0.0  # 若 API 容易限流可設 0.05~0.2
 # -----------------------------
 # Senior LLM API (cloud)
 # -----------------------------
-LLM_API_URL = "https://ws-03.wade0426.me/v1/chat/completions"
+# LLM_BASE_URL：統一指到其他 OpenAI-compatible 服務（例如本機的 HW/shared/llm_stub.py）
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://ws-03.wade0426.me/v1").rstrip("/")
+LLM_API_URL = f"{LLM_BASE_URL}/chat/completions"
 LLM_MODEL = "/models/gpt-oss-120b"
 LLM_TIMEOUT = 120
 
@@ -67,18 +79,15 @@ def embed_texts_batched(
         if task_description is not None:
             payload["task_description"] = task_description
 
-        resp = requests.post(EMBED_API_URL, json=payload, timeout=timeout)
-        if not resp.ok:
-            print(f"❌ embed error: status={resp.status_code}")
-            print(resp.text[:500])
-            resp.raise_for_status()
+        # 優先要 base64 float32（np.frombuffer 還原），server 不支援就退回 JSON 小數
+        try:
+            mat = embed_wire.post_embeddings(http_pool.post, EMBED_API_URL, payload, timeout=timeout, retry=True)
+        except requests.HTTPError as e:
+            print(f"❌ embed error: status={e.response.status_code}")
+            print(e.response.text[:500])
+            raise
 
-        data = resp.json()
-        embeddings = data.get("embeddings") or data.get("embedding")
-        if embeddings is None:
-            raise ValueError(f"Missing embeddings field. keys={list(data.keys())}")
-
-        all_embeddings.extend(embeddings)
+        all_embeddings.extend(mat.tolist())
         print(f"✅ embed batch {idx}/{len(batches)} (size={len(batch_texts)})")
 
         if sleep_sec > 0:
@@ -117,7 +126,7 @@ def qdrant_search_rest(
     url = f"{QDRANT_URL}/collections/{COLLECTION}/points/search"
     payload = {"vector": query_vec, "limit": top_k, "with_payload": with_payload}
 
-    resp = requests.post(url, json=payload, timeout=timeout)
+    resp = http_pool.post(url, json=payload, timeout=timeout, retry=True)  # 搜尋是冪等的
     if not resp.ok:
         print(f"❌ qdrant error: status={resp.status_code}")
         print(resp.text[:500])
@@ -148,7 +157,8 @@ def build_context(results: List[Dict[str, Any]]) -> Tuple[str, List[str]]:
 # -----------------------------
 # Step6-3: Generate (Senior LLM)
 # -----------------------------
-def call_senior_llm(query_text: str, context: str, used_chunk_ids: List[str]) -> str:
+def build_llm_messages(query_text: str, context: str, used_chunk_ids: List[str]) -> List[Dict[str, str]]:
+    """Build chat messages for the senior LLM (shared with the step7 service)."""
     system_msg = (
         "你是一個嚴謹的助理。"
         "請只根據【資料】回答【問題】。"
@@ -165,20 +175,29 @@ def call_senior_llm(query_text: str, context: str, used_chunk_ids: List[str]) ->
 最後加一行：使用的chunk_id: {", ".join(used_chunk_ids)}
 """
 
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": user_msg},
+    ]
+
+
+def llm_headers() -> Dict[str, str]:
     headers = {"Content-Type": "application/json"}
     if SENIOR_LLM_API_KEY:
         headers["Authorization"] = f"Bearer {SENIOR_LLM_API_KEY}"
+    return headers
 
+
+def call_senior_llm(query_text: str, context: str, used_chunk_ids: List[str]) -> str:
+    headers = llm_headers()
     body = {
         "model": LLM_MODEL,
-        "messages": [
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ],
+        "messages": build_llm_messages(query_text, context, used_chunk_ids),
         "temperature": 0.2,
     }
 
-    resp = requests.post(LLM_API_URL, headers=headers, json=body, timeout=LLM_TIMEOUT)
+    # LLM 生成不是冪等的（逾時後重送 = 再付一次生成），只重試連線失敗與 429
+    resp = http_pool.post(LLM_API_URL, headers=headers, json=body, timeout=LLM_TIMEOUT)
     if not resp.ok:
         print(f"❌ llm error: status={resp.status_code}")
         print(resp.text[:800])
@@ -214,6 +233,7 @@ def main():
     print("\n=== RAG Answer (Senior LLM) ===")
     print(answer)
     print("\n(used_chunk_id)", ", ".join(used_chunk_ids))
+    http_pool.print_stats()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,464 @@
+# cw01_step7_rag_service.py
+# RAG Step 7 (Service) = Step6 的 rag_answer 包成常駐 asyncio HTTP 服務
+# - 單一 process 常駐：interpreter 啟動、import、TCP/TLS 連線只付一次
+# - aiohttp ClientSession 連線池：embed / Qdrant / LLM 都走 keep-alive
+# - 幾毫秒內同時進來的 query 合併成一次 /embed（micro-batching）
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from cw01_step6_rag_generate_cloud_llm import (
+    COLLECTION,
+    EMBED_API_URL,
+    EMBED_BATCH_SIZE,
+    EMBED_TIMEOUT,
+    LLM_API_URL,
+    LLM_MODEL,
+    LLM_TIMEOUT,
+    NORMALIZE,
+    QDRANT_TIMEOUT,
+    QDRANT_URL,
+    TASK_DESCRIPTION,
+    TOP_K,
+    build_context,
+    build_llm_messages,
+    llm_headers,
+)
+from cw01_semantic_cache import (
+    CACHE_MAX_ENTRIES,
+    CACHE_THRESHOLD,
+    CACHE_TTL_SEC,
+    SemanticAnswerCache,
+)
+
+# -----------------------------
+# Service config
+# -----------------------------
+SERVICE_HOST = "0.0.0.0"
+SERVICE_PORT = 8088
+
+BATCH_WINDOW_MS = 5.0  # 第一筆進來後最多等幾毫秒收集同一批
+POOL_LIMIT_PER_HOST = 32  # 每個上游 host 的連線池大小
+KEEPALIVE_SEC = 60
+MAX_TOP_K = 20  # /rag 的 top_k 上限（超出範圍自動夾到 1..MAX_TOP_K）
+COLLECTION_VERSION_TTL_SEC = 30  # collection 版本多久重新查一次
+
+
+# -----------------------------
+# Micro-batching embed
+# -----------------------------
+class EmbedMicroBatcher:
+    """Collect embed requests that arrive within a short window and send them as ONE /embed call."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        *,
+        url: str = EMBED_API_URL,
+        window_ms: float = BATCH_WINDOW_MS,
+        max_batch: int = EMBED_BATCH_SIZE,
+        task_description: Optional[str] = TASK_DESCRIPTION,
+        normalize: bool = NORMALIZE,
+        timeout: int = EMBED_TIMEOUT,
+    ) -> None:
+        self.session = session
+        self.url = url
+        self.window_s = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.task_description = task_description
+        self.normalize = normalize
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self._pending: Dict[str, asyncio.Future] = {}  # 文字 -> 排隊 / 送出中的結果（single-flight）
+
+        # 統計：/embed 呼叫次數 vs 實際 embed 的句數
+        self.calls = 0
+        self.texts = 0
+        self.joined = 0  # 同一段文字已在途，直接共用結果的次數
+
+    def start(self) -> None:
+        self._worker = asyncio.create_task(self._collect_loop())
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        leftover = []
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        self._fail(leftover)
+
+    @staticmethod
+    def _fail(items: List[Tuple[str, asyncio.Future]]) -> None:
+        for _, fut in items:
+            if not fut.done():
+                fut.set_exception(RuntimeError("embed batcher closed"))
+
+    async def embed(self, text: str) -> List[float]:
+        # 同一段文字已經在排隊或送出中：等那一份結果，不再進 queue（同一批也就不會有重複文字）
+        fut = self._pending.get(text)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[text] = fut
+            fut.add_done_callback(lambda _: self._pending.pop(text, None))
+            await self._queue.put((text, fut))
+        else:
+            self.joined += 1
+        # shield：其中一個呼叫端被取消，不會連帶取消其他人共用的 future
+        return await asyncio.shield(fut)
+
+    async def _collect_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: List[Tuple[str, asyncio.Future]] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.window_s
+                while len(batch) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                # 送出後不等回應，下一批可以同時開始收集
+                task = asyncio.create_task(self._flush(batch))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                batch = []
+        except asyncio.CancelledError:
+            # 收集到一半被關掉：已經從 queue 拿出來、還沒送出的這批也要通知呼叫端，不然會一直等
+            self._fail(batch)
+            raise
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [t for t, _ in batch]
+        payload: Dict[str, Any] = {"texts": texts, "normalize": self.normalize}
+        if self.task_description is not None:
+            payload["task_description"] = self.task_description
+
+        try:
+            async with self.session.post(self.url, json=payload, timeout=self.timeout) as resp:
+                if resp.status >= 400:
+                    body = await resp.text()
+                    raise RuntimeError(f"embed error: status={resp.status} body={body[:500]}")
+                data = await resp.json()
+
+            embeddings = data.get("embeddings") or data.get("embedding")
+            if embeddings is None:
+                raise ValueError(f"Missing embeddings field. keys={list(data.keys())}")
+            if len(embeddings) != len(texts):
+                raise RuntimeError(
+                    f"Embedding count mismatch: got {len(embeddings)} != texts {len(texts)}"
+                )
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.calls += 1
+        self.texts += len(texts)
+        for (_, fut), vec in zip(batch, embeddings):
+            if not fut.done():
+                fut.set_result(vec)
+
+
+# -----------------------------
+# RAG service (warm clients)
+# -----------------------------
+class RagService:
+    """Async version of step6 rag_answer, sharing one pooled ClientSession for all upstreams."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        batcher: EmbedMicroBatcher,
+        *,
+        cache_threshold: float = CACHE_THRESHOLD,
+        cache_ttl_sec: float = CACHE_TTL_SEC,
+        cache_max_entries: int = CACHE_MAX_ENTRIES,
+        use_cache: bool = True,
+    ) -> None:
+        self.session = session
+        self.batcher = batcher
+        self.llm_headers = llm_headers()
+
+        # 語意快取：第一次拿到向量才知道 dim，所以延後建立
+        self.use_cache = use_cache
+        self.cache_kwargs = {
+            "threshold": cache_threshold,
+            "ttl_sec": cache_ttl_sec,
+            "max_entries": cache_max_entries,
+        }
+        self.cache: Optional[SemanticAnswerCache] = None
+
+        self._version: Optional[str] = None
+        self._version_at = 0.0
+        self._version_lock = asyncio.Lock()
+
+    async def collection_version(self) -> str:
+        """
+        Cheap fingerprint of the collection: config + points_count + the index_version step4 writes into every payload.
+        Only one refresh runs at a time; requests arriving meanwhile wait for it instead of querying Qdrant again.
+        """
+        if self._version is not None and time.monotonic() - self._version_at < COLLECTION_VERSION_TTL_SEC:
+            return self._version
+        async with self._version_lock:
+            # 等鎖期間別人可能已經更新過
+            if self._version is not None and time.monotonic() - self._version_at < COLLECTION_VERSION_TTL_SEC:
+                return self._version
+            self._version = await self._fetch_version()
+            self._version_at = time.monotonic()
+            return self._version
+
+    async def _fetch_version(self) -> str:
+        timeout = aiohttp.ClientTimeout(total=QDRANT_TIMEOUT)
+        base = f"{QDRANT_URL}/collections/{COLLECTION}"
+        async with self.session.get(base, timeout=timeout) as resp:
+            if resp.status >= 400:
+                body = await resp.text()
+                raise RuntimeError(f"qdrant error: status={resp.status} body={body[:500]}")
+            info = (await resp.json()).get("result", {}) or {}
+
+        # 只讀一個 point 的 index_version（step4 每次重建都會寫新的），不掃整個 collection
+        payload = {"limit": 1, "with_payload": ["index_version"], "with_vector": False}
+        async with self.session.post(f"{base}/points/scroll", json=payload, timeout=timeout) as resp:
+            if resp.status >= 400:
+                body = await resp.text()
+                raise RuntimeError(f"qdrant error: status={resp.status} body={body[:500]}")
+            points = ((await resp.json()).get("result", {}) or {}).get("points", [])
+        index_version = (points[0].get("payload") or {}).get("index_version") if points else None
+
+        sig = [info.get("config"), info.get("points_count"), index_version]
+        h = hashlib.sha1(json.dumps(sig, sort_keys=True).encode("utf-8"))
+        return f"{COLLECTION}:{h.hexdigest()[:12]}"
+
+    def invalidate(self) -> None:
+        """清掉快取的答案，並讓下一個請求重新計算 collection 版本。"""
+        if self.cache is not None:
+            self.cache.clear()
+        self._version = None
+
+    async def qdrant_search(
+        self,
+        query_vec: List[float],
+        *,
+        top_k: int = 3,
+        with_payload: bool = True,
+    ) -> List[Dict[str, Any]]:
+        url = f"{QDRANT_URL}/collections/{COLLECTION}/points/search"
+        payload = {"vector": query_vec, "limit": top_k, "with_payload": with_payload}
+
+        timeout = aiohttp.ClientTimeout(total=QDRANT_TIMEOUT)
+        async with self.session.post(url, json=payload, timeout=timeout) as resp:
+            if resp.status >= 400:
+                body = await resp.text()
+                raise RuntimeError(f"qdrant error: status={resp.status} body={body[:500]}")
+            data = await resp.json()
+        return data.get("result", []) or []
+
+    async def call_llm(self, query_text: str, context: str, used_chunk_ids: List[str]) -> str:
+        body = {
+            "model": LLM_MODEL,
+            "messages": build_llm_messages(query_text, context, used_chunk_ids),
+            "temperature": 0.2,
+        }
+
+        timeout = aiohttp.ClientTimeout(total=LLM_TIMEOUT)
+        async with self.session.post(
+            LLM_API_URL, headers=self.llm_headers, json=body, timeout=timeout
+        ) as resp:
+            if resp.status >= 400:
+                text = await resp.text()
+                raise RuntimeError(f"llm error: status={resp.status} body={text[:800]}")
+            data = await resp.json()
+        return data["choices"][0]["message"]["content"].strip()
+
+    async def rag_answer_cached(
+        self, query_text: str, *, top_k: int = 3
+    ) -> Tuple[str, str, List[str], bool]:
+        """Return (context, answer, used_chunk_ids, cache_hit)."""
+        qvec = await self.batcher.embed(query_text)
+
+        scope = ""
+        if self.use_cache:
+            if self.cache is None:
+                self.cache = SemanticAnswerCache(len(qvec), **self.cache_kwargs)
+            scope = f"{await self.collection_version()}|top_k={top_k}"
+            hit = self.cache.lookup(qvec, scope)
+            if hit is not None:
+                e = hit.entry
+                return e.context, e.answer, list(e.used_chunk_ids), True
+
+        results = await self.qdrant_search(qvec, top_k=top_k, with_payload=True)
+        if not results:
+            raise RuntimeError("No retrieval results. Check Qdrant container and collection name.")
+        context, used_chunk_ids = build_context(results)
+        answer = await self.call_llm(query_text, context, used_chunk_ids)
+
+        if self.cache is not None:
+            self.cache.store(
+                qvec,
+                scope,
+                query_text=query_text,
+                context=context,
+                answer=answer,
+                used_chunk_ids=used_chunk_ids,
+            )
+        return context, answer, used_chunk_ids, False
+
+    async def rag_answer(self, query_text: str, *, top_k: int = 3) -> Tuple[str, str, List[str]]:
+        """Return (context, answer, used_chunk_ids) — same contract as step6 rag_answer."""
+        context, answer, used_chunk_ids, _ = await self.rag_answer_cached(query_text, top_k=top_k)
+        return context, answer, used_chunk_ids
+
+
+# -----------------------------
+# HTTP handlers
+# -----------------------------
+async def handle_rag(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+    except Exception:
+        return web.json_response({"error": "body must be JSON"}, status=400)
+
+    if not isinstance(body, dict):
+        return web.json_response({"error": "body must be a JSON object"}, status=400)
+
+    query_text = str(body.get("query", "")).strip()
+    if not query_text:
+        return web.json_response({"error": "missing 'query'"}, status=400)
+    try:
+        top_k = int(body.get("top_k", TOP_K))
+    except (TypeError, ValueError):
+        return web.json_response({"error": "'top_k' must be an integer"}, status=400)
+    top_k = min(max(top_k, 1), MAX_TOP_K)
+
+    service: RagService = request.app["service"]
+    t0 = time.perf_counter()
+    try:
+        context, answer, used_chunk_ids, cache_hit = await service.rag_answer_cached(
+            query_text, top_k=top_k
+        )
+    except Exception as e:
+        return web.json_response({"error": str(e)}, status=502)
+
+    return web.json_response(
+        {
+            "query": query_text,
+            "answer": answer,
+            "context": context,
+            "used_chunk_ids": used_chunk_ids,
+            "cache_hit": cache_hit,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+        }
+    )
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    service: RagService = request.app["service"]
+    return web.json_response(
+        {
+            "ok": True,
+            "embed_calls": service.batcher.calls,
+            "embed_texts": service.batcher.texts,
+            "embed_joined": service.batcher.joined,
+            "cache": service.cache.stats() if service.cache is not None else None,
+        }
+    )
+
+
+async def handle_cache_clear(request: web.Request) -> web.Response:
+    service: RagService = request.app["service"]
+    service.invalidate()
+    return web.json_response({"ok": True})
+
+
+def build_app(
+    *,
+    window_ms: float = BATCH_WINDOW_MS,
+    pool_limit: int = POOL_LIMIT_PER_HOST,
+    cache_threshold: float = CACHE_THRESHOLD,
+    cache_ttl_sec: float = CACHE_TTL_SEC,
+    cache_max_entries: int = CACHE_MAX_ENTRIES,
+    use_cache: bool = True,
+) -> web.Application:
+    app = web.Application()
+
+    async def warm_clients(app: web.Application):
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=pool_limit,
+            keepalive_timeout=KEEPALIVE_SEC,
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        batcher = EmbedMicroBatcher(session, window_ms=window_ms)
+        batcher.start()
+        app["service"] = RagService(
+            session,
+            batcher,
+            cache_threshold=cache_threshold,
+            cache_ttl_sec=cache_ttl_sec,
+            cache_max_entries=cache_max_entries,
+            use_cache=use_cache,
+        )
+
+        yield
+
+        await batcher.close()
+        await session.close()
+
+    app.cleanup_ctx.append(warm_clients)
+    app.router.add_post("/rag", handle_rag)
+    app.router.add_get("/health", handle_health)
+    app.router.add_post("/cache/clear", handle_cache_clear)
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description="CW01 Step7 - RAG HTTP service (warm clients + embed micro-batching)")
+    ap.add_argument("--host", default=SERVICE_HOST)
+    ap.add_argument("--port", type=int, default=SERVICE_PORT)
+    ap.add_argument("--window-ms", type=float, default=BATCH_WINDOW_MS, help="embed micro-batch window (ms)")
+    ap.add_argument("--pool-limit", type=int, default=POOL_LIMIT_PER_HOST, help="connections per upstream host")
+    ap.add_argument("--cache-threshold", type=float, default=CACHE_THRESHOLD, help="semantic cache cosine threshold")
+    ap.add_argument("--cache-ttl", type=float, default=CACHE_TTL_SEC, help="semantic cache TTL seconds")
+    ap.add_argument("--cache-size", type=int, default=CACHE_MAX_ENTRIES, help="semantic cache max entries")
+    ap.add_argument("--no-cache", action="store_true", help="disable semantic answer cache")
+    args = ap.parse_args()
+
+    print(f"✅ Step7 RAG service on http://{args.host}:{args.port}  (POST /rag, GET /health, POST /cache/clear)")
+    app = build_app(
+        window_ms=args.window_ms,
+        pool_limit=args.pool_limit,
+        cache_threshold=args.cache_threshold,
+        cache_ttl_sec=args.cache_ttl,
+        cache_max_entries=args.cache_size,
+        use_cache=not args.no_cache,
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Union
+
+try:
+    import orjson  # 有裝就用（快好幾倍），沒有就退回標準函式庫 json
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+except ImportError:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+PathLike = Union[str, Path]
+
+WRITE_BUFFER_BYTES = 1 << 20  # 累積 1 MiB 才真的寫一次
+ZSTD_LEVEL = 3
+
+def _is_zst(path: PathLike) -> bool:
+    return str(path).endswith(".zst")
+
+def chunk_record(c) -> Dict[str, Any]:
+    """Chunk / ChunkView -> 一行 JSONL 的欄位（與原本 dump_jsonl 相同）。"""
+    return {
+        "chunk_id": c.chunk_id,
+        "source": c.source,
+        "method": c.method,
+        "start": c.start,
+        "end": c.end,
+        "text": c.text
+    }
+
+class JsonlWriter:
+    """
+    緩衝寫入：每筆先序列化成 bytes 放在記憶體，滿 WRITE_BUFFER_BYTES 才寫檔。
+    檔名以 .zst 結尾就用 zstd 串流壓縮（需要 zstandard 套件）。
+    """
+
+    def __init__(self, path: PathLike):
+        self.path = Path(path)
+        raw = self.path.open("wb")
+        if _is_zst(path):
+            import zstandard
+            self._f = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw)
+        else:
+            self._f = raw
+        self._buf = []
+        self._size = 0
+        self.count = 0
+
+    def write(self, obj: Dict[str, Any]) -> None:
+        line = dumps(obj) + b"\n"
+        self._buf.append(line)
+        self._size += len(line)
+        self.count += 1
+        if self._size >= WRITE_BUFFER_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buf:
+            self._f.write(b"".join(self._buf))
+            self._buf, self._size = [], 0
+
+    def close(self) -> None:
+        self.flush()
+        self._f.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def write_jsonl(path: PathLike, records: Iterable[Dict[str, Any]]) -> int:
+    """寫出所有紀錄，回傳筆數。"""
+    with JsonlWriter(path) as w:
+        for r in records:
+            w.write(r)
+        return w.count
+
+def iter_jsonl(path: PathLike) -> Iterator[Dict[str, Any]]:
+    """
+    逐行 lazy 讀取（不先整檔載入），空行略過；.zst 檔邊解壓邊讀。
+    拿到第一行就可以開始後續處理（例如 embed + upsert）。
+    """
+    with open(path, "rb") as raw:
+        if _is_zst(path):
+            import zstandard
+            f = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+        else:
+            f = raw
+        for line in f:
+            if line.strip():
+                yield loads(line)
@@ -0,0 +1,210 @@
+import hashlib
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from chunker import Chunk, _clean_text, fixed_spans, sliding_spans, token_spans
+from token_counter import get_counter
+
+class _Interner:
+    """字串 <-> 小整數 id（source / method / chunk_id 前綴只存一份）。"""
+    __slots__ = ("names", "_ids")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def id(self, name: str) -> int:
+        i = self._ids.get(name)
+        if i is None:
+            i = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+class ChunkView:
+    """
+    ChunkTable 的一列（只存 table + 列號），欄位名稱與 Chunk 相同，
+    dedup_chunks / build_points / dump_jsonl 可以直接吃。text 用到時才切出來。
+    """
+    __slots__ = ("_t", "_i")
+
+    def __init__(self, table: "ChunkTable", i: int):
+        self._t = table
+        self._i = i
+
+    @property
+    def chunk_id(self) -> str:
+        return self._t.chunk_id(self._i)
+
+    @property
+    def text(self) -> str:
+        return self._t.text(self._i)
+
+    @property
+    def start(self) -> int:
+        return self._t.start[self._i]
+
+    @property
+    def end(self) -> int:
+        return self._t.end[self._i]
+
+    @property
+    def method(self) -> str:
+        return self._t.methods.names[self._t.method_id[self._i]]
+
+    @property
+    def source(self) -> str:
+        return self._t.sources.names[self._t.source_id[self._i]]
+
+    def to_chunk(self) -> Chunk:
+        return Chunk(chunk_id=self.chunk_id, text=self.text, start=self.start,
+                     end=self.end, method=self.method, source=self.source)
+
+    def __repr__(self) -> str:
+        return f"ChunkView({self.chunk_id!r}, {self.end - self.start} chars)"
+
+class ChunkTable:
+    """
+    欄位式（columnar）chunk 表：
+    - 所有清理後的文字接在同一個 buffer，chunk 只記 [lo, hi) 位置，fixed / sliding 共用同一份原文
+    - source / method / chunk_id 前綴都 intern 成整數 id
+    - 每個欄位是一條 array，沒有每塊一個 Python 物件；要 embed / 顯示時才 materialize 文字
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._size = 0
+        self._buf = ""
+        self._docs: Dict[str, Tuple[int, int]] = {}  # source -> (buffer 起點, 長度)
+        self._doc_hash: Dict[str, bytes] = {}        # source -> 原文 hash（同 source 不同內容要擋下來）
+
+        self.sources = _Interner()
+        self.methods = _Interner()
+        self.prefixes = _Interner()
+
+        self.lo = array("q")         # buffer 內的文字範圍（已去頭尾空白）
+        self.hi = array("q")
+        self.start = array("q")      # 原本 Chunk.start / end（文件內位置或表格列號）
+        self.end = array("q")
+        self.source_id = array("i")
+        self.method_id = array("i")
+        self.prefix_id = array("i")
+        self.ordinal = array("i")    # chunk_id = 前綴 + 序號（-1 表示前綴就是完整 id）
+
+    # ---- buffer ----
+    def _append_text(self, s: str) -> int:
+        base = self._size
+        self._parts.append(s)
+        self._size += len(s)
+        return base
+
+    @property
+    def buffer(self) -> str:
+        # 新增文字後才重新 join 一次；之後的 text(i) 都是對同一個字串切片
+        if len(self._buf) != self._size:
+            self._buf = "".join(self._parts)
+            self._parts = [self._buf]
+        return self._buf
+
+    def add_doc(self, text: str, source: str) -> int:
+        """
+        清理後放進 buffer（同一個 source 只放一次），回傳起點位置。
+        同一個 source 換了內容會 raise ValueError：chunk_id 以 source 為前綴，不能讓新舊內容混在一起。
+        """
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        if source in self._docs:
+            if self._doc_hash[source] != digest:
+                raise ValueError(f"source {source!r} already added with different text; use a distinct source name")
+        else:
+            cleaned = _clean_text(text)
+            self._docs[source] = (self._append_text(cleaned), len(cleaned))
+            self._doc_hash[source] = digest
+        return self._docs[source][0]
+
+    def _doc_text(self, source: str) -> str:
+        base, n = self._docs[source]
+        return self.buffer[base:base + n]
+
+    # ---- rows ----
+    def _add_row(self, lo: int, hi: int, start: int, end: int, source: str, method: str, prefix: str, ordinal: int) -> None:
+        self.lo.append(lo)
+        self.hi.append(hi)
+        self.start.append(start)
+        self.end.append(end)
+        self.source_id.append(self.sources.id(source))
+        self.method_id.append(self.methods.id(method))
+        self.prefix_id.append(self.prefixes.id(prefix))
+        self.ordinal.append(ordinal)
+
+    def _add_spans(self, spans: Iterable, source: str, method: str) -> range:
+        first = len(self)
+        base = self._docs[source][0]
+        prefix = f"{source}::{method}::"
+        for idx, (i, j, lo, hi) in enumerate(spans):
+            self._add_row(base + lo, base + hi, i, j, source, method, prefix, idx)
+        return range(first, len(self))
+
+    def add_fixed(self, text: str, chunk_size: int = 500, overlap: int = 100, source: str = "text.txt") -> range:
+        """等同 chunker.fixed_chunk，回傳新增的列號範圍。"""
+        self.add_doc(text, source)
+        return self._add_spans(fixed_spans(self._doc_text(source), chunk_size, overlap), source, "fixed")
+
+    def add_sliding(self, text: str, window_size: int = 500, stride: int = 400, source: str = "text.txt") -> range:
+        """等同 chunker.sliding_window，回傳新增的列號範圍。"""
+        self.add_doc(text, source)
+        return self._add_spans(sliding_spans(self._doc_text(source), window_size, stride), source, "sliding")
+
+    def add_token(self, text: str, max_tokens: int = 256, overlap_tokens: int = 0, source: str = "text.txt",
+                  tokenizer: str = "cl100k_base") -> range:
+        """等同 chunker.token_chunk，回傳新增的列號範圍。"""
+        self.add_doc(text, source)
+        spans = token_spans(self._doc_text(source), max_tokens, overlap_tokens, get_counter(tokenizer))
+        return self._add_spans(spans, source, "token")
+
+    def add_chunks(self, chunks: Iterable[Chunk]) -> range:
+        """已經是 Chunk 的結果（例如 pack_rows 的表格塊）：文字各自接進 buffer。"""
+        first = len(self)
+        for c in chunks:
+            lo = self._append_text(c.text)
+            prefix, _, tail = c.chunk_id.rpartition("::")
+            if prefix and tail.isdigit():
+                prefix, ordinal = prefix + "::", int(tail)
+            else:
+                prefix, ordinal = c.chunk_id, -1
+            self._add_row(lo, lo + len(c.text), c.start, c.end, c.source, c.method, prefix, ordinal)
+        return range(first, len(self))
+
+    # ---- access ----
+    def __len__(self) -> int:
+        return len(self.lo)
+
+    def __getitem__(self, i: int) -> ChunkView:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return ChunkView(self, i)
+
+    def __iter__(self) -> Iterator[ChunkView]:
+        return (ChunkView(self, i) for i in range(len(self)))
+
+    def views(self, rows: Iterable[int]) -> List[ChunkView]:
+        return [ChunkView(self, i) for i in rows]
+
+    def chunk_id(self, i: int) -> str:
+        prefix = self.prefixes.names[self.prefix_id[i]]
+        n = self.ordinal[i]
+        return prefix if n < 0 else f"{prefix}{n}"
+
+    def text(self, i: int) -> str:
+        return self.buffer[self.lo[i]:self.hi[i]]
+
+    def texts(self, rows: Sequence[int]) -> List[str]:
+        buf = self.buffer
+        return [buf[self.lo[i]:self.hi[i]] for i in rows]
+
+    def nbytes(self) -> int:
+        """粗估記憶體：buffer + 各欄位 array + intern 字串。"""
+        cols = (self.lo, self.hi, self.start, self.end, self.source_id, self.method_id, self.prefix_id, self.ordinal)
+        interned = sum(sys.getsizeof(s) for it in (self.sources, self.methods, self.prefixes) for s in it.names)
+        return sys.getsizeof(self.buffer) + sum(a.itemsize * len(a) for a in cols) + interned
@@ -1,5 +1,8 @@
+import re
 from dataclasses import dataclass
-from typing import List
+from typing import Iterator, List, Optional, Tuple
+
+from token_counter import CountFn, get_counter
 
 @dataclass
 class Chunk:
@@ -7,7 +10,7 @@ class Chunk:
     text: str
     start: int
     end: int
-    method: str          # "fixed" or "sliding"
+    method: str          # "fixed" / "sliding" / "token"
     source: str          # filename/path
 
 def _clean_text(s: str) -> str:
@@ -25,59 +28,163 @@ def _clean_text(s: str) -> str:
         prev_empty = empty
     return "\n".join(out).strip()
 
-def fixed_chunk(text: str, chunk_size: int = 500, overlap: int = 100, source: str = "text.txt") -> List[Chunk]:
-    """
-    固定切塊：每塊 chunk_size 字元，重疊 overlap。
-    """
+Span = Tuple[int, int, int, int]  # (start, end, 去頭尾空白後的 lo, hi)
+
+def _trim(text: str, i: int, j: int) -> Tuple[int, int]:
+    # 等同 text[i:j].strip()，但只算位置不複製字串
+    while i < j and text[i].isspace():
+        i += 1
+    while j > i and text[j - 1].isspace():
+        j -= 1
+    return i, j
+
+def fixed_spans(text: str, chunk_size: int = 500, overlap: int = 100) -> Iterator[Span]:
+    """固定切塊的位置（text 需已 _clean_text），空白塊不輸出。"""
     if overlap >= chunk_size:
         raise ValueError("overlap must be < chunk_size")
 
-    text = _clean_text(text)
-    chunks: List[Chunk] = []
     step = chunk_size - overlap
     i = 0
-    idx = 0
     while i < len(text):
         j = min(i + chunk_size, len(text))
-        seg = text[i:j].strip()
-        if seg:
-            chunks.append(Chunk(
-                chunk_id=f"{source}::fixed::{idx}",
-                text=seg,
-                start=i,
-                end=j,
-                method="fixed",
-                source=source
-            ))
-            idx += 1
+        lo, hi = _trim(text, i, j)
+        if lo < hi:
+            yield i, j, lo, hi
         i += step
-    return chunks
 
-def sliding_window(text: str, window_size: int = 500, stride: int = 400, source: str = "text.txt") -> List[Chunk]:
-    """
-    滑動視窗切塊：window_size 視窗大小，stride 步長（越小重疊越多）。
-    """
+def sliding_spans(text: str, window_size: int = 500, stride: int = 400) -> Iterator[Span]:
+    """滑動視窗的位置（text 需已 _clean_text），空白塊不輸出。"""
     if stride <= 0:
         raise ValueError("stride must be > 0")
 
-    text = _clean_text(text)
-    chunks: List[Chunk] = []
     i = 0
-    idx = 0
     while i < len(text):
         j = min(i + window_size, len(text))
-        seg = text[i:j].strip()
-        if seg:
-            chunks.append(Chunk(
-                chunk_id=f"{source}::sliding::{idx}",
-                text=seg,
-                start=i,
-                end=j,
-                method="sliding",
-                source=source
-            ))
-            idx += 1
+        lo, hi = _trim(text, i, j)
+        if lo < hi:
+            yield i, j, lo, hi
         if j == len(text):
             break
         i += stride
-    return chunks
+
+def fixed_chunk(text: str, chunk_size: int = 500, overlap: int = 100, source: str = "text.txt") -> List[Chunk]:
+    """
+    固定切塊：每塊 chunk_size 字元，重疊 overlap。
+    """
+    text = _clean_text(text)
+    return [
+        Chunk(
+            chunk_id=f"{source}::fixed::{idx}",
+            text=text[lo:hi],
+            start=i,
+            end=j,
+            method="fixed",
+            source=source
+        )
+        for idx, (i, j, lo, hi) in enumerate(fixed_spans(text, chunk_size, overlap))
+    ]
+
+def sliding_window(text: str, window_size: int = 500, stride: int = 400, source: str = "text.txt") -> List[Chunk]:
+    """
+    滑動視窗切塊：window_size 視窗大小，stride 步長（越小重疊越多）。
+    """
+    text = _clean_text(text)
+    return [
+        Chunk(
+            chunk_id=f"{source}::sliding::{idx}",
+            text=text[lo:hi],
+            start=i,
+            end=j,
+            method="sliding",
+            source=source
+        )
+        for idx, (i, j, lo, hi) in enumerate(sliding_spans(text, window_size, stride))
+    ]
+
+
+# 句尾：中英文句號、問驚嘆號、分號，或換行
+_SENT_END = re.compile(r"[。！？!?；;]+|\n+|(?<=\.)\s+")
+
+def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+    spans = []
+    i = 0
+    for m in _SENT_END.finditer(text):
+        if m.end() > i:
+            spans.append((i, m.end()))
+            i = m.end()
+    if i < len(text):
+        spans.append((i, len(text)))
+    return spans
+
+def _split_long(text: str, a: int, b: int, max_tokens: int, count: CountFn) -> Iterator[Tuple[int, int, int]]:
+    # 單句就超過預算：二分搜尋每段能放到的最後一個字元
+    while a < b:
+        lo, hi = a + 1, b
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if count(text[a:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        yield a, lo, count(text[a:lo])
+        a = lo
+
+def token_spans(text: str, max_tokens: int = 256, overlap_tokens: int = 0, count: Optional[CountFn] = None) -> Iterator[Span]:
+    """
+    依 token 預算切塊（text 需已 _clean_text）：
+    - 以句子為單位累加，句子的 token 數有 memoize，同一句只會真的 tokenize 一次
+    - 塊與塊之間重疊最後幾句，總數不超過 overlap_tokens
+    - 單句超過 max_tokens 才在句中硬切
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be > 0")
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be < max_tokens")
+    count = count or get_counter()
+
+    pieces: List[Tuple[int, int, int]] = []  # (start, end, tokens)
+    for a, b in _sentence_spans(text):
+        n = count(text[a:b])
+        if n <= max_tokens:
+            pieces.append((a, b, n))
+        else:
+            pieces.extend(_split_long(text, a, b, max_tokens, count))
+
+    k = 0
+    while k < len(pieces):
+        m, total = k, 0
+        while m < len(pieces) and total + pieces[m][2] <= max_tokens:
+            total += pieces[m][2]
+            m += 1
+        m = max(m, k + 1)
+        i, j = pieces[k][0], pieces[m - 1][1]
+        lo, hi = _trim(text, i, j)
+        if lo < hi:
+            yield i, j, lo, hi
+        if m == len(pieces):
+            break
+        # 往回退幾句當重疊，但一定要往前推進
+        back, n_back = m, 0
+        while back - 1 > k and n_back + pieces[back - 1][2] <= overlap_tokens:
+            back -= 1
+            n_back += pieces[back][2]
+        k = back
+
+def token_chunk(text: str, max_tokens: int = 256, overlap_tokens: int = 0, source: str = "text.txt",
+                tokenizer: str = "cl100k_base") -> List[Chunk]:
+    """
+    token 預算切塊：每塊 <= max_tokens（用 tokenizer 計算，不是字元數），
+    送進 /embed 的每批 token 總量才可預期，不會被 embedding server 截斷。
+    """
+    text = _clean_text(text)
+    return [
+        Chunk(
+            chunk_id=f"{source}::token::{idx}",
+            text=text[lo:hi],
+            start=i,
+            end=j,
+            method="token",
+            source=source
+        )
+        for idx, (i, j, lo, hi) in enumerate(token_spans(text, max_tokens, overlap_tokens, get_counter(tokenizer)))
+    ]
@@ -0,0 +1,105 @@
+import hashlib
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from chunker import Chunk
+
+_PRIME = (1 << 31) - 1  # a * h < 2^62，uint64 乘法不會溢位
+
+@dataclass
+class DedupResult:
+    kept: List[Chunk]
+    merged_ids: Dict[str, List[str]] = field(default_factory=dict)      # 倖存 chunk_id -> 被併掉的 chunk_id
+    merged_sources: Dict[str, List[str]] = field(default_factory=dict)  # 倖存 chunk_id -> 被併掉的來源檔
+
+    @property
+    def dropped(self) -> int:
+        return sum(len(v) for v in self.merged_ids.values())
+
+def shingles(text: str, k: int = 5) -> Set[str]:
+    """字元 k-gram（中文沒有空白斷詞，用字元比較穩），先去掉所有空白。"""
+    s = re.sub(r"\s+", "", text)
+    if len(s) <= k:
+        return {s} if s else set()
+    return {s[i:i + k] for i in range(len(s) - k + 1)}
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, seed: int = 42):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, sh: Set[str]) -> np.ndarray:
+        if not sh:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        h = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(x.encode("utf-8"), digest_size=4).digest(), "little") for x in sh),
+            dtype=np.uint64,
+            count=len(sh),
+        ) % np.uint64(_PRIME)
+        # (num_perm, n_shingles) 一次算完，再對每個 permutation 取最小值
+        return ((self.a[:, None] * h[None, :] + self.b[:, None]) % np.uint64(_PRIME)).min(axis=1)
+
+def dedup_chunks(
+    chunks: Sequence[Chunk],
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    bands: int = 32,
+    k: int = 5,
+) -> DedupResult:
+    """
+    MinHash + LSH 近似重複過濾（放在切塊之後、embedding 之前）：
+    - 依序處理，第一次出現的 chunk 當倖存者
+    - LSH 分 band 找候選，再用真正的 Jaccard（k-gram 集合）確認 >= threshold 才併掉
+    - 被併掉的 chunk_id / 來源檔記錄在倖存者底下
+    """
+    if num_perm % bands != 0:
+        raise ValueError("num_perm must be divisible by bands")
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm=num_perm)
+
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    kept: List[Chunk] = []
+    kept_sh: List[Set[str]] = []
+    result = DedupResult(kept=kept)
+
+    for c in chunks:
+        sh = shingles(c.text, k)
+        sig = hasher.signature(sh)
+        keys = [(b, sig[b * rows:(b + 1) * rows].tobytes()) for b in range(bands)]
+
+        cand: Set[int] = set()
+        for key in keys:
+            cand.update(buckets.get(key, ()))
+
+        best, best_sim = -1, threshold
+        for i in sorted(cand):
+            sim = jaccard(sh, kept_sh[i])
+            if sim >= best_sim:
+                best, best_sim = i, sim
+
+        if best >= 0:
+            survivor = kept[best]
+            result.merged_ids.setdefault(survivor.chunk_id, []).append(c.chunk_id)
+            srcs = result.merged_sources.setdefault(survivor.chunk_id, [])
+            if c.source != survivor.source and c.source not in srcs:
+                srcs.append(c.source)
+            continue
+
+        idx = len(kept)
+        kept.append(c)
+        kept_sh.append(sh)
+        for key in keys:
+            buckets[key].append(idx)
+
+    return result
@@ -1,24 +1,33 @@
-import requests
+import os
+import sys
+from pathlib import Path
 from typing import List
 
-API_URL = "https://ws-04.wade0426.me/embed"
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[3] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import embed_dedup  # noqa: E402
+import embed_wire  # noqa: E402
+import http_pool  # noqa: E402
+
+# 可用 EMBED_API_URL 指到本機的 HW/shared/embed_stub.py（benchmark / 離線測試）
+API_URL = os.getenv("EMBED_API_URL", "https://ws-04.wade0426.me/embed")
 
 def embed_texts(texts: List[str], task_description: str = "檢索技術文件", normalize: bool = True) -> List[List[float]]:
     """
     Call teacher-provided embedding API.
     Returns: embeddings: List[vector], each vector is length 4096 (per your measurement).
     """
-    resp = requests.post(
-        API_URL,
-        json={
-            "texts": texts,
+    def post(batch: List[str]):
+        payload = {
+            "texts": batch,
             "task_description": task_description,
             "normalize": normalize,
-        },
-        timeout=60,
-    )
-    resp.raise_for_status()
-    data = resp.json()
-    if "embeddings" not in data:
-        raise ValueError(f"Unexpected response keys: {list(data.keys())}")
-    return data["embeddings"]
+        }
+        # server 支援就走 base64 float32（np.frombuffer），否則 JSON 小數
+        return embed_wire.post_embeddings(http_pool.post, API_URL, payload, timeout=60, retry=True)
+
+    # 重複文字只送一次；別的執行緒正在 embed 同一段文字就等它的結果
+    return embed_dedup.embed_unique(texts, post, ns=(API_URL, task_description, normalize)).tolist()
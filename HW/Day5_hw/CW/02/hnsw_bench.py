@@ -0,0 +1,202 @@
+"""
+HNSW 參數調校：recall@k vs 延遲（p50 / p95）。
+
+- ground truth：同一批查詢用 exact=True（暴力搜尋）的 top-k
+- 查詢時參數：--ef 每個值各跑一輪
+- 建圖參數：給了 --m / --ef-construct 就把向量複製到暫時的 collection（<name>__m16_efc128）重建 HNSW 再量；
+  沒給時若原 collection 還沒建 HNSW（資料量低於 indexing_threshold，indexed_vectors_count=0），
+  也會用預設參數 + indexing_threshold=1 複製一份再量，否則每個 ef 都只是暴力搜尋、recall 恆為 1
+- 查詢向量：--questions 讀 CSV 的 questions 欄位打 embedding API；沒給就從 collection 抽 --sample 個向量加一點雜訊
+
+    python hnsw_bench.py --collection cw02 --questions ../../Homework/questions.csv --ef 16 32 64 128
+    python hnsw_bench.py --collection day5_fixed --m 8 16 32 --ef-construct 64 200 --ef 32 128
+
+註：行程內模式（:memory: / 本機路徑）一律暴力搜尋，recall 永遠是 1，只有延遲數字有參考價值（會印 WARN）。
+"""
+import argparse
+import csv
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import OptimizersConfigDiff, PointStruct, VectorParams
+
+from vdb_qdrant import QDRANT_URL, hnsw_config, is_local, make_client, resolve_location, search_params
+from vdb_snapshot import SCROLL_BATCH, iter_records
+
+K_DEFAULT = 5
+EF_DEFAULT = [16, 32, 64, 128, 256]
+
+def load_question_vectors(path: str, task_description: str = "檢索技術文件") -> np.ndarray:
+    from embed_client import embed_texts  # 只有要打 API 時才需要
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        questions = [(row.get("questions") or "").strip() for row in csv.DictReader(f)]
+    questions = [q for q in questions if q]
+    vecs: List[List[float]] = []
+    for i in range(0, len(questions), 32):
+        vecs.extend(embed_texts(questions[i:i + 32], task_description=task_description, normalize=True))
+    return np.asarray(vecs, dtype=np.float32)
+
+def sample_query_vectors(client: QdrantClient, collection: str, n: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """從 collection 抽 n 個向量、加高斯雜訊再正規化，當作「跟語料很像但不完全一樣」的查詢。"""
+    rng = np.random.default_rng(seed)
+    # 只 scroll id（不帶向量 / payload），reservoir sampling 抽 n 個，再 retrieve 這 n 個的向量
+    picked: List[Any] = []
+    seen = 0
+    offset = None
+    while True:
+        records, offset = client.scroll(collection_name=collection, limit=SCROLL_BATCH, offset=offset,
+                                        with_payload=False, with_vectors=False)
+        for r in records:
+            if len(picked) < n:
+                picked.append(r.id)
+            else:
+                j = int(rng.integers(seen + 1))
+                if j < n:
+                    picked[j] = r.id
+            seen += 1
+        if offset is None:
+            break
+    if not picked:
+        raise ValueError(f"{collection} is empty")
+    records = client.retrieve(collection_name=collection, ids=picked, with_payload=False, with_vectors=True)
+    mat = np.asarray([r.vector for r in records], dtype=np.float32)
+    mat = mat + rng.normal(scale=noise / np.sqrt(mat.shape[1]), size=mat.shape).astype(np.float32)
+    return mat / np.linalg.norm(mat, axis=1, keepdims=True)
+
+def run_queries(
+    client: QdrantClient,
+    collection: str,
+    qvecs: np.ndarray,
+    k: int,
+    ef: Optional[int] = None,
+    exact: bool = False,
+) -> Tuple[List[List[Any]], np.ndarray]:
+    """回傳 (每題 top-k id, 每題延遲 ms)。"""
+    params = search_params(ef, exact)
+    ids: List[List[Any]] = []
+    lat = np.empty(len(qvecs))
+    for i, q in enumerate(qvecs.tolist()):
+        t0 = time.perf_counter()
+        resp = client.query_points(collection_name=collection, query=q, limit=k, search_params=params,
+                                   with_payload=False, with_vectors=False)
+        lat[i] = (time.perf_counter() - t0) * 1000
+        ids.append([p.id for p in resp.points])
+    return ids, lat
+
+def recall_at_k(approx: Sequence[Sequence[Any]], truth: Sequence[Sequence[Any]]) -> float:
+    hits = [len(set(a) & set(t)) / max(len(t), 1) for a, t in zip(approx, truth)]
+    return float(np.mean(hits)) if hits else 0.0
+
+def has_hnsw(client: QdrantClient, collection: str) -> bool:
+    """collection 是否真的有 HNSW 圖（低於 indexing_threshold 時 Qdrant 不建圖，indexed_vectors_count 會是 0）。"""
+    info = client.get_collection(collection)
+    return not info.points_count or (info.indexed_vectors_count or 0) > 0
+
+def wait_indexed(client: QdrantClient, collection: str, timeout: float = 600.0, require_graph: bool = True) -> None:
+    # 遠端 Qdrant 的 HNSW 是背景建的：status 回到 green 且向量都進了圖才開始量
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        green = str(client.get_collection(collection).status.value) == "green"
+        if green and (not require_graph or has_hnsw(client, collection)):
+            return
+        time.sleep(0.5)
+    raise TimeoutError(f"{collection} still has no HNSW index after {timeout}s")
+
+def build_variant(client: QdrantClient, src: str, m: Optional[int], ef_construct: Optional[int],
+                  require_graph: bool = True) -> str:
+    """把 src 的向量複製到新的 collection，用指定的 HNSW 參數重建索引。"""
+    name = f"{src}__m{m or 'def'}_efc{ef_construct or 'def'}"
+    vectors = client.get_collection(src).config.params.vectors
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=vectors.size, distance=vectors.distance),
+        hnsw_config=hnsw_config(m, ef_construct),
+        # 作業的資料量很小，不調低門檻的話 Qdrant 根本不建 HNSW（一直是暴力搜尋）
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=1),
+    )
+    for records in iter_records(client, src):
+        client.upsert(name, points=[PointStruct(id=r.id, vector=r.vector, payload={}) for r in records])
+    wait_indexed(client, name, require_graph=require_graph)
+    return name
+
+def bench(
+    client: QdrantClient,
+    collection: str,
+    qvecs: np.ndarray,
+    k: int = K_DEFAULT,
+    efs: Sequence[Optional[int]] = EF_DEFAULT,
+    ms: Sequence[Optional[int]] = (None,),
+    ef_constructs: Sequence[Optional[int]] = (None,),
+    keep: bool = False,
+    local: bool = False,
+) -> List[Dict[str, Any]]:
+    truth, exact_lat = run_queries(client, collection, qvecs, k, exact=True)
+    rows = [{"config": "exact", "ef": "-", f"recall@{k}": 1.0,
+             "p50": np.percentile(exact_lat, 50), "p95": np.percentile(exact_lat, 95)}]
+
+    rebuild = list(ms) != [None] or list(ef_constructs) != [None]
+    if local:
+        print("[WARN] in-process Qdrant always searches exactly: recall is 1 for every ef, only latency is meaningful")
+    elif not rebuild and not has_hnsw(client, collection):
+        print(f"[INFO] {collection} has no HNSW graph (below indexing_threshold); "
+              "benchmarking a copy rebuilt with indexing_threshold=1")
+        rebuild = True
+    for m in ms:
+        for efc in ef_constructs:
+            target = build_variant(client, collection, m, efc, require_graph=not local) if rebuild else collection
+            label = f"m={m or 'def'},efc={efc or 'def'}"
+            try:
+                run_queries(client, target, qvecs[:5], k)  # 暖機
+                for ef in efs:
+                    ids, lat = run_queries(client, target, qvecs, k, ef=ef)
+                    rows.append({"config": label, "ef": ef or "def", f"recall@{k}": recall_at_k(ids, truth),
+                                 "p50": np.percentile(lat, 50), "p95": np.percentile(lat, 95)})
+            finally:
+                if rebuild and not keep:
+                    client.delete_collection(target)
+    return rows
+
+def print_table(rows: List[Dict[str, Any]], k: int) -> None:
+    key = f"recall@{k}"
+    print(f"{'config':<22}{'ef':>6}{key:>11}{'p50 ms':>10}{'p95 ms':>10}")
+    print("-" * 59)
+    for r in rows:
+        print(f"{r['config']:<22}{str(r['ef']):>6}{r[key]:>11.4f}{r['p50']:>10.2f}{r['p95']:>10.2f}")
+
+def build_argparser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="HNSW recall@k vs latency bench (approximate vs exact=True)")
+    ap.add_argument("--collection", default="cw02")
+    ap.add_argument("--qdrant", default=None,
+                    help=f"Qdrant URL, ':memory:' or local path (default: $QDRANT_LOCATION or {QDRANT_URL})")
+    ap.add_argument("--grpc", action="store_true", help="use gRPC for remote Qdrant")
+    ap.add_argument("--questions", default=None, help="CSV with a 'questions' column (embedded via API)")
+    ap.add_argument("--sample", type=int, default=100, help="if no --questions: sample N stored vectors as queries")
+    ap.add_argument("--k", type=int, default=K_DEFAULT)
+    ap.add_argument("--ef", type=int, nargs="+", default=EF_DEFAULT, help="search-time hnsw_ef values")
+    ap.add_argument("--m", type=int, nargs="*", default=None, help="rebuild with these HNSW m values")
+    ap.add_argument("--ef-construct", type=int, nargs="*", default=None, help="rebuild with these ef_construct values")
+    ap.add_argument("--keep", action="store_true", help="keep rebuilt variant collections")
+    return ap
+
+def main():
+    args = build_argparser().parse_args()
+    client = make_client(args.qdrant, prefer_grpc=args.grpc)
+
+    if args.questions:
+        qvecs = load_question_vectors(args.questions)
+    else:
+        qvecs = sample_query_vectors(client, args.collection, args.sample)
+    print(f"[INFO] collection={args.collection} queries={len(qvecs)} k={args.k}")
+
+    rows = bench(client, args.collection, qvecs, k=args.k, efs=args.ef,
+                 ms=args.m or [None], ef_constructs=args.ef_construct or [None], keep=args.keep,
+                 local=is_local(resolve_location(args.qdrant)))
+    print_table(rows, args.k)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+from chunker import Chunk
+
+# 行內標籤：文字接在同一段；其他標籤（p、div、section、br、title…）都當段落邊界
+INLINE_TAGS = {
+    "a", "abbr", "b", "bdi", "bdo", "cite", "code", "data", "del", "dfn", "em", "font", "i", "ins",
+    "kbd", "label", "mark", "q", "s", "samp", "small", "span", "strong", "sub", "sup", "time", "u", "var",
+}
+SKIP_TAGS = {"style", "script", "noscript", "template"}
+
+@dataclass
+class TableRow:
+    table_idx: int
+    row_idx: int
+    header: List[str]
+    cells: List[str]
+
+    def to_text(self) -> str:
+        # 每一列都帶上表頭：「欄名：值；欄名：值」，切塊後單獨看也讀得懂
+        if self.header and len(self.header) == len(self.cells):
+            return "；".join(f"{h}：{c}" for h, c in zip(self.header, self.cells))
+        return " | ".join(self.cells)
+
+def _norm(s: str) -> str:
+    return re.sub(r"\s+", " ", s or "").strip()
+
+def _cell_text(cell) -> str:
+    # inline 標籤（strong、br 等）直接串接文字；中文不需要額外補空白
+    return _norm("".join(cell.itertext()))
+
+def _preceding_text(elem, event: str) -> str:
+    """
+    緊接在這個 start / end 標籤前面的那段文字（HTML 裡每段文字都恰好落在某個標籤前面）：
+    - start：前一個兄弟的 tail，沒有兄弟就是父元素的 text
+    - end：最後一個子元素的 tail，沒有子元素就是自己的 text
+    註解沒有 start / end 事件，它前後的 tail 要一起往回收到上一個元素為止。
+    這段文字在解析器讀到該標籤時就已經完整，不會被後面的內容改動。
+    """
+    if event == "start":
+        parent, node = elem.getparent(), elem.getprevious()
+    else:
+        parent, node = elem, (elem[-1] if len(elem) else None)
+    parts: List[str] = []
+    while node is not None:
+        parts.append(node.tail or "")
+        if isinstance(node.tag, str):
+            break
+        node = node.getprevious()
+    else:
+        if parent is not None:
+            parts.append(parent.text or "")
+    return "".join(reversed(parts))
+
+def _drop_previous(elem) -> None:
+    # 前面的兄弟（含 tail）都已讀進緩衝或輸出，才可以刪掉，iterparse 才不會越吃越多記憶體
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+def iter_html(path: str) -> Iterator[Tuple[str, object]]:
+    """
+    用 lxml iterparse 串流解析 HTML，不建整棵樹：
+    - ("row", TableRow)：表格的每一列（表頭列不輸出，但會套到後面的列）
+    - ("text", str)：表格以外的文字，遇到非行內標籤就斷成一段（含 title、caption、
+      section / body 裡的散落文字、行內標籤與各元素的 tail）
+    表頭：<thead> 裡的列，或整列都是 <th> 的第一列。
+    處理完的元素 clear(keep_tail=True)，前面讀完的兄弟再刪掉，大檔案記憶體維持常數。
+    """
+    from lxml import etree  # 真的要解析 HTML 才載入 lxml
+
+    table_idx = -1
+    table_depth = 0
+    thead_depth = 0
+    header: List[str] = []
+    row_idx = 0
+    skip_depth = 0
+    buf: List[str] = []
+
+    def flush():
+        txt = _norm("".join(buf))
+        buf.clear()
+        return txt
+
+    for event, elem in etree.iterparse(path, events=("start", "end"), html=True, recover=True, encoding="utf-8"):
+        tag = elem.tag if isinstance(elem.tag, str) else ""
+        tag = tag.lower()
+
+        # 表格與 script / style 以外，標籤前面那段文字先收進目前段落
+        if not skip_depth and not table_depth:
+            buf.append(_preceding_text(elem, event))
+            if tag not in INLINE_TAGS:
+                txt = flush()
+                if txt:
+                    yield "text", txt
+
+        if event == "start":
+            if not skip_depth and not table_depth:
+                _drop_previous(elem)
+            if tag in SKIP_TAGS:
+                skip_depth += 1
+            elif skip_depth:
+                pass
+            elif tag == "table":
+                table_depth += 1
+                if table_depth == 1:
+                    table_idx += 1
+                    header, row_idx, thead_depth = [], 0, 0
+            elif tag == "thead" and table_depth == 1:
+                thead_depth += 1
+            continue
+
+        # ---- end ----
+        if tag in SKIP_TAGS:
+            skip_depth -= 1
+            if not skip_depth:
+                elem.clear(keep_tail=True)
+            continue
+        if skip_depth:
+            continue
+
+        if tag == "tr" and table_depth == 1:
+            cells = [c for c in elem if isinstance(c.tag, str) and c.tag.lower() in ("th", "td")]
+            texts = [_cell_text(c) for c in cells]
+            is_header = thead_depth > 0 or (cells and all(c.tag.lower() == "th" for c in cells))
+            if is_header and not header:
+                header = texts
+            elif any(texts):
+                yield "row", TableRow(table_idx=table_idx, row_idx=row_idx, header=header, cells=texts)
+                row_idx += 1
+            # 表格裡只有儲存格文字有意義，列與列之間的 tail 是空白，可以直接刪
+            elem.clear(keep_tail=True)
+            _drop_previous(elem)
+        elif tag == "thead" and table_depth == 1:
+            thead_depth -= 1
+        elif tag == "caption" and table_depth == 1:
+            txt = _norm("".join(elem.itertext()))
+            if txt:
+                yield "text", txt
+        elif tag == "table":
+            table_depth -= 1
+            if table_depth == 0:
+                elem.clear(keep_tail=True)
+        elif not table_depth:
+            # 子元素與文字都已收過，只留 tail 給下一個標籤讀
+            elem.clear(keep_tail=True)
+
+def extract_html(path: str) -> Tuple[str, List[TableRow]]:
+    """回傳 (表格以外的純文字, 所有表格列)。"""
+    texts: List[str] = []
+    rows: List[TableRow] = []
+    for kind, item in iter_html(path):
+        if kind == "row":
+            rows.append(item)
+        else:
+            texts.append(item)
+    return "\n".join(texts), rows
+
+def pack_rows(rows: List[TableRow], max_chars: int = 500, source: str = "table.html", method: str = "table") -> List[Chunk]:
+    """
+    把表格列依序裝進不超過 max_chars 的 chunk（列不會被切半；單列超過上限就自成一塊）。
+    start / end 記錄的是列號範圍，不是字元位置。
+    """
+    chunks: List[Chunk] = []
+    buf: List[str] = []
+    size = 0
+    first = 0
+    last_table = None
+
+    def flush(end_row: int):
+        if buf:
+            chunks.append(Chunk(
+                chunk_id=f"{source}::{method}::table::{len(chunks)}",
+                text="\n".join(buf),
+                start=first,
+                end=end_row,
+                method=method,
+                source=source
+            ))
+
+    for i, r in enumerate(rows):
+        line = r.to_text()
+        # 換表格或裝不下就先封一塊
+        if buf and (r.table_idx != last_table or size + len(line) + 1 > max_chars):
+            flush(i)
+            buf, size, first = [], 0, i
+        buf.append(line)
+        size += len(line) + 1
+        last_table = r.table_idx
+    flush(len(rows))
+    return chunks
+
+def dump_html(path: str) -> List[str]:
+    """iter_html 的結果一筆一行（`text` / `row` 加 tab 再接段落或「欄名：值；...」），方便和預期輸出比對。"""
+    return [f"{kind}\t{item if kind == 'text' else item.to_text()}" for kind, item in iter_html(path)]
+
+if __name__ == "__main__":
+    # python html_table.py fixtures/html_mixed.html [fixtures/html_mixed.expected.txt]
+    # 只給 HTML 就印出抽取結果；再給預期檔就逐行比對，不一致時 exit 1
+    import sys
+
+    got = dump_html(sys.argv[1])
+    if len(sys.argv) < 3:
+        print("\n".join(got))
+        sys.exit(0)
+    with open(sys.argv[2], encoding="utf-8") as f:
+        want = f.read().splitlines()
+    if got != want:
+        import difflib
+        print("\n".join(difflib.unified_diff(want, got, "expected", "got", lineterm="")))
+        sys.exit(1)
+    print(f"[OK] {sys.argv[1]}: {len(got)} lines")
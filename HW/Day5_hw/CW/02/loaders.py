@@ -0,0 +1,100 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from html_table import TableRow
+
+@dataclass
+class LoadedDoc:
+    source: str
+    text: str                                           # 一般文字（給 fixed / sliding 切塊）
+    rows: List[TableRow] = field(default_factory=list)  # 表格列（給 pack_rows）
+
+Loader = Callable[[Path], LoadedDoc]
+
+# 副檔名 -> 解析函式；重的套件（lxml 等）都在函式裡才 import，用不到就不付 import 成本
+LOADERS: Dict[str, Loader] = {}
+
+def register(*exts: str) -> Callable[[Loader], Loader]:
+    def deco(fn: Loader) -> Loader:
+        for ext in exts:
+            LOADERS[ext.lower()] = fn
+        return fn
+    return deco
+
+def _read(path: Path) -> str:
+    return path.read_text(encoding="utf-8", errors="ignore")
+
+@register(".txt", ".md")
+def load_text(path: Path) -> LoadedDoc:
+    return LoadedDoc(source=str(path), text=_read(path))
+
+@register(".html", ".htm")
+def load_html(path: Path) -> LoadedDoc:
+    from html_table import extract_html
+    text, rows = extract_html(str(path))
+    return LoadedDoc(source=str(path), text=text, rows=rows)
+
+@register(".jsonl")
+def load_jsonl(path: Path) -> LoadedDoc:
+    """一行一筆 JSON，取每筆的 text 欄位（例如之前輸出的 chunks_*.jsonl）。"""
+    import json
+    texts = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                t = str(json.loads(line).get("text", "")).strip()
+                if t:
+                    texts.append(t)
+    return LoadedDoc(source=str(path), text="\n".join(texts))
+
+@register(".csv")
+def load_csv(path: Path) -> LoadedDoc:
+    """CSV 當表格：第一列是表頭，其餘每列一筆 TableRow。"""
+    import csv
+    rows: List[TableRow] = []
+    with path.open("r", encoding="utf-8-sig", errors="ignore", newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+        for i, r in enumerate(reader):
+            cells = [c.strip() for c in r]
+            if any(cells):
+                rows.append(TableRow(table_idx=0, row_idx=i, header=header, cells=cells))
+    return LoadedDoc(source=str(path), text="", rows=rows)
+
+_SRT_TIME = re.compile(r"^\d{2}:\d{2}:\d{2}[,.]\d{3}\s*-->\s*\d{2}:\d{2}:\d{2}[,.]\d{3}")
+
+@register(".srt")
+def load_srt(path: Path) -> LoadedDoc:
+    """字幕檔：去掉序號與時間軸，只留台詞。"""
+    lines = []
+    for ln in _read(path).splitlines():
+        ln = ln.strip()
+        if not ln or ln.isdigit() or _SRT_TIME.match(ln):
+            continue
+        lines.append(ln)
+    return LoadedDoc(source=str(path), text="\n".join(lines))
+
+def load_file(path) -> LoadedDoc:
+    p = Path(path)
+    loader = LOADERS.get(p.suffix.lower())
+    if loader is None:
+        raise ValueError(f"Unsupported file type: {p.suffix} ({p})")
+    return loader(p)
+
+def load_dir(dir_path: str, pattern: str = "*", recursive: bool = False, workers: int = 8) -> Dict[str, LoadedDoc]:
+    """
+    依副檔名分派 loader，多執行緒同時讀檔 / 解析。
+    不支援的副檔名（例如 Windows 的 :Zone.Identifier）直接略過。
+    """
+    d = Path(dir_path)
+    files = sorted(d.rglob(pattern) if recursive else d.glob(pattern))
+    files = [p for p in files if p.is_file() and p.suffix.lower() in LOADERS]
+    if not files:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        docs = list(pool.map(load_file, files))
+    return {doc.source: doc for doc in docs}
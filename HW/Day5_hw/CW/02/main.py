@@ -1,47 +1,62 @@
-import json
+import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-from chunker import fixed_chunk, sliding_window, Chunk
+from chunk_io import chunk_record, write_jsonl
+from chunk_table import ChunkTable, ChunkView
+from dedup import dedup_chunks
 from embed_client import embed_texts
-from table_loader import load_table_texts
+from html_table import pack_rows
+from table_loader import load_table_docs
 from vdb_qdrant import QdrantVDB
 
+SHARED_DIR = Path(__file__).resolve().parents[3] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+from embed_batcher import AdaptiveBatcher  # noqa: E402
+import embed_dedup  # noqa: E402
+
 OUTDIR = Path("outputs")
 OUTDIR.mkdir(exist_ok=True)
 
 COLLECTION = "cw02"
 VECTOR_SIZE = 4096  # 你量到的 embedding 維度
-
-def dump_jsonl(path: Path, chunks: List[Chunk]) -> None:
-    with path.open("w", encoding="utf-8") as f:
-        for c in chunks:
-            f.write(json.dumps({
-                "chunk_id": c.chunk_id,
-                "source": c.source,
-                "method": c.method,
-                "start": c.start,
-                "end": c.end,
-                "text": c.text
-            }, ensure_ascii=False) + "\n")
-
-def build_points(chunks: List[Chunk], embeddings: List[List[float]]) -> List[Dict[str, Any]]:
+DEDUP_THRESHOLD = 0.8  # Jaccard（字元 5-gram）>= 門檻視為近似重複
+
+def dump_jsonl(path: Path, chunks: List[ChunkView]) -> None:
+    # 檔名改成 .jsonl.zst 就會壓縮輸出
+    write_jsonl(path, (chunk_record(c) for c in chunks))
+
+def build_points(
+    chunks: List[ChunkView],
+    embeddings: List[List[float]],
+    merged_ids: Optional[Dict[str, List[str]]] = None,
+    merged_sources: Optional[Dict[str, List[str]]] = None,
+) -> List[Dict[str, Any]]:
     if len(chunks) != len(embeddings):
         raise ValueError("chunks and embeddings length mismatch")
+    merged_ids = merged_ids or {}
+    merged_sources = merged_sources or {}
 
     points = []
     for i, (c, v) in enumerate(zip(chunks, embeddings)):
+        payload = {
+            "chunk_id": c.chunk_id,
+            "source": c.source,
+            "method": c.method,
+            "start": c.start,
+            "end": c.end,
+            "text": c.text
+        }
+        # 近似重複被併進這個 chunk 的來源，檢索時仍可回溯
+        if c.chunk_id in merged_ids:
+            payload["merged_from"] = merged_ids[c.chunk_id]
+            payload["merged_sources"] = merged_sources.get(c.chunk_id, [])
         points.append({
             "id": i,  # 這裡用整數 id 就好
             "vector": v,
-            "payload": {
-                "chunk_id": c.chunk_id,
-                "source": c.source,
-                "method": c.method,
-                "start": c.start,
-                "end": c.end,
-                "text": c.text
-            }
+            "payload": payload
         })
     return points
 
@@ -74,39 +89,57 @@ def main():
     text = text_path.read_text(encoding="utf-8", errors="ignore")
 
     # 2) 產生 chunks：固定切塊、滑動視窗
-    fixed_chunks = fixed_chunk(text, chunk_size=500, overlap=100, source="text.txt")
-    sliding_chunks = sliding_window(text, window_size=500, stride=400, source="text.txt")
+    # 全部放進同一張 ChunkTable：原文只存一份，chunk 只記位置，embed 時才取出文字
+    table = ChunkTable()
+    fixed_chunks = table.views(table.add_fixed(text, chunk_size=500, overlap=100, source="text.txt"))
+    sliding_chunks = table.views(table.add_sliding(text, window_size=500, stride=400, source="text.txt"))
 
     dump_jsonl(OUTDIR / "chunks_fixed.jsonl", fixed_chunks)
     dump_jsonl(OUTDIR / "chunks_sliding.jsonl", sliding_chunks)
 
     # 3) table 資料夾：讀取並切塊（同樣做 fixed + sliding）
-    table_texts = load_table_texts("table")
-    table_fixed_all: List[Chunk] = []
-    table_sliding_all: List[Chunk] = []
+    table_texts, table_rows = load_table_docs("table")
+    table_fixed_all: List[ChunkView] = []
+    table_sliding_all: List[ChunkView] = []
     for src, t in table_texts.items():
-        table_fixed_all.extend(fixed_chunk(t, chunk_size=500, overlap=100, source=src))
-        table_sliding_all.extend(sliding_window(t, window_size=500, stride=400, source=src))
-
-    # 4) 全部 chunks 合併（一起塞進同一個 collection，用 payload.method 過濾比較）
-    all_chunks = fixed_chunks + sliding_chunks + table_fixed_all + table_sliding_all
-
-    # 5) Embedding（批次做，避免一次塞太多）
-    BATCH = 32
-    all_vectors: List[List[float]] = []
-    for i in range(0, len(all_chunks), BATCH):
-        batch_texts = [c.text for c in all_chunks[i:i+BATCH]]
-        vecs = embed_texts(batch_texts, task_description="檢索技術文件", normalize=True)
-        # 基本檢查維度
-        if vecs and len(vecs[0]) != VECTOR_SIZE:
-            raise ValueError(f"Embedding dim mismatch: got {len(vecs[0])}, expected {VECTOR_SIZE}")
-        all_vectors.extend(vecs)
+        table_fixed_all.extend(table.views(table.add_fixed(t, chunk_size=500, overlap=100, source=src)))
+        table_sliding_all.extend(table.views(table.add_sliding(t, window_size=500, stride=400, source=src)))
+
+    # HTML 表格：一列一筆（帶表頭），整列裝進 <=500 字的 chunk，不會被切成兩半
+    # 兩種方法都放一份，payload.method 過濾時才比得到
+    for src, rows in table_rows.items():
+        table_fixed_all.extend(table.views(table.add_chunks(pack_rows(rows, max_chars=500, source=src, method="fixed"))))
+        table_sliding_all.extend(table.views(table.add_chunks(pack_rows(rows, max_chars=500, source=src, method="sliding"))))
+    print(f"chunks: {len(table)} (chunk table ~{table.nbytes() / 1024:.0f} KiB)")
+
+    # 4) 近似重複過濾（MinHash/LSH），兩種方法各自做，避免跨方法互相吃掉
+    fixed_dd = dedup_chunks(fixed_chunks + table_fixed_all, threshold=DEDUP_THRESHOLD)
+    sliding_dd = dedup_chunks(sliding_chunks + table_sliding_all, threshold=DEDUP_THRESHOLD)
+    merged_ids = {**fixed_dd.merged_ids, **sliding_dd.merged_ids}
+    merged_sources = {**fixed_dd.merged_sources, **sliding_dd.merged_sources}
+    print(f"dedup: fixed -{fixed_dd.dropped}, sliding -{sliding_dd.dropped} near-duplicate chunks")
+
+    # 全部 chunks 合併（一起塞進同一個 collection，用 payload.method 過濾比較）
+    all_chunks = fixed_dd.kept + sliding_dd.kept
+
+    # 5) Embedding（依總字元數分批，批次大小依延遲 / 413 / 逾時自動調整）
+    batcher = AdaptiveBatcher()
+    mat = batcher.embed_all(
+        [c.text for c in all_chunks],
+        lambda batch: embed_texts(batch, task_description="檢索技術文件", normalize=True),
+    )
+    # 基本檢查維度
+    if mat.shape[1] != VECTOR_SIZE:
+        raise ValueError(f"Embedding dim mismatch: got {mat.shape[1]}, expected {VECTOR_SIZE}")
+    all_vectors: List[List[float]] = mat.tolist()
+    print(batcher.report())
+    embed_dedup.print_stats()  # computed = 不重複文字數（樣板句 / 重複表格列只 embed 一次）
 
     # 6) 建 Qdrant collection + upsert
     vdb = QdrantVDB(collection=COLLECTION, vector_size=VECTOR_SIZE)
     vdb.recreate_collection()
 
-    points = build_points(all_chunks, all_vectors)
+    points = build_points(all_chunks, all_vectors, merged_ids, merged_sources)
     vdb.upsert_points(points)
 
     # 7) 做一次 retrieval 比較（固定 vs 滑動）
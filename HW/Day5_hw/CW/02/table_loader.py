@@ -1,34 +1,32 @@
-from pathlib import Path
-from typing import Dict
-from bs4 import BeautifulSoup
+from typing import Dict, List, Tuple
 
-def load_table_texts(table_dir: str = "table") -> Dict[str, str]:
+from html_table import TableRow
+from loaders import load_dir
+
+def load_table_docs(table_dir: str = "table") -> Tuple[Dict[str, str], Dict[str, List[TableRow]]]:
     """
-    讀取 table 資料夾四個檔案：
-    - table_txt.md : 直接當文字
-    - table_html.html : HTML 轉純文字
-    - Prompt_table_v1.txt / v2.txt : 當作文字（也可當 prompt 說明文件）
+    讀取 table 資料夾內所有支援的檔案（依副檔名分派 loaders.py，並行讀取），回傳 (純文字, 表格列)：
+    - .md / .txt（table_txt.md、Prompt_table_v1/v2.txt）: 直接當文字
+    - .html（table_html.html）: lxml 串流解析，表格以外的段落當文字、表格逐列輸出（帶表頭）
+    - .csv / .jsonl / .srt 也能直接丟進來
     """
-    d = Path(table_dir)
+    docs = load_dir(table_dir)
     out: Dict[str, str] = {}
+    rows: Dict[str, List[TableRow]] = {}
+    for src, doc in docs.items():
+        if doc.text.strip():
+            out[src] = doc.text
+        if doc.rows:
+            rows[src] = doc.rows
+    return out, rows
 
-    # 1) md
-    md = d / "table_txt.md"
-    if md.exists():
-        out[str(md)] = md.read_text(encoding="utf-8", errors="ignore")
-
-    # 2) html
-    html = d / "table_html.html"
-    if html.exists():
-        raw = html.read_text(encoding="utf-8", errors="ignore")
-        soup = BeautifulSoup(raw, "lxml")
-        txt = soup.get_text("\n")
-        out[str(html)] = txt
-
-    # 3) prompts
-    for name in ["Prompt_table_v1.txt", "Prompt_table_v2.txt"]:
-        p = d / name
-        if p.exists():
-            out[str(p)] = p.read_text(encoding="utf-8", errors="ignore")
-
+def load_table_texts(table_dir: str = "table") -> Dict[str, str]:
+    """
+    同 load_table_docs，但把表格列（「欄名：值；...」一列一行）接回文字後面，
+    給只需要純文字的呼叫端使用。
+    """
+    out, rows = load_table_docs(table_dir)
+    for src, table_rows in rows.items():
+        lines = [r.to_text() for r in table_rows]
+        out[src] = "\n".join([out.get(src, "")] + lines).strip()
     return out
@@ -0,0 +1,52 @@
+import math
+import re
+from functools import lru_cache
+from typing import Callable, Dict
+
+CountFn = Callable[[str], int]
+
+# 中日韓字元（含全形標點）大多一字一 token；其餘連續字元約 4 字一 token
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+def estimate_tokens(text: str) -> int:
+    """沒有 tokenizer 套件時的估算（中英混合誤差約 ±20%，寧可高估）。"""
+    n_cjk = len(_CJK.findall(text))
+    rest = _CJK.sub(" ", text)
+    n_other = sum(math.ceil(len(w) / 4) for w in rest.split())
+    return n_cjk + n_other
+
+def _tiktoken_counter(encoding: str) -> CountFn:
+    import tiktoken  # 選用套件，真的要算 token 才載入
+    enc = tiktoken.get_encoding(encoding)
+    return lambda s: len(enc.encode(s, disallowed_special=()))
+
+# 名稱 -> 建立 count 函式；要接 HF tokenizer 之類的，register_tokenizer 一個就好
+TOKENIZERS: Dict[str, Callable[[], CountFn]] = {
+    "cl100k_base": lambda: _tiktoken_counter("cl100k_base"),
+    "o200k_base": lambda: _tiktoken_counter("o200k_base"),
+    "estimate": lambda: estimate_tokens,
+}
+
+_COUNTERS: Dict[str, CountFn] = {}
+
+def register_tokenizer(name: str, factory: Callable[[], CountFn]) -> None:
+    TOKENIZERS[name] = factory
+    _COUNTERS.pop(name, None)
+
+def get_counter(name: str = "cl100k_base", cache_size: int = 65536) -> CountFn:
+    """
+    回傳「文字 -> token 數」函式，結果依句子 memoize（同一句在 fixed / sliding / 參數掃描裡會被數很多次）。
+    tokenizer 套件沒裝或載入失敗就退回 estimate_tokens。
+    """
+    if name in _COUNTERS:
+        return _COUNTERS[name]
+    factory = TOKENIZERS.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown tokenizer: {name} (available: {', '.join(TOKENIZERS)})")
+    try:
+        fn = factory()
+    except Exception as e:
+        print(f"[WARN] tokenizer '{name}' unavailable ({type(e).__name__}); falling back to estimate")
+        fn = estimate_tokens
+    _COUNTERS[name] = lru_cache(maxsize=cache_size)(fn)
+    return _COUNTERS[name]
@@ -1,20 +1,101 @@
-from typing import Any, Dict, List, Optional
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Distance, VectorParams, PointStruct,
-    Filter, FieldCondition, MatchValue
+    Filter, FieldCondition, MatchValue,
+    HnswConfigDiff, SearchParams
 )
 
+QDRANT_URL = "http://localhost:6333"
+
+def resolve_location(location: Optional[str] = None) -> str:
+    return location or os.getenv("QDRANT_LOCATION", QDRANT_URL)
+
+_HOST_PORT = re.compile(r"^[A-Za-z0-9_.\-]+:\d+$")
+
+def parse_location(location: str) -> Tuple[str, str]:
+    """
+    location -> (種類, 值)，種類是 "url" / "memory" / "path"：
+    - "http://..." / "https://..."    -> url
+    - "host:6333"（沒寫 scheme）       -> url，補上 http://
+    - ":memory:"                      -> memory
+    - "path:<資料夾>"                  -> path（明確指定本機模式）
+    - 已存在的資料夾，或看得出是路徑的字串（含 / 或 \、以 . 或 ~ 開頭） -> path
+    其他（例如單獨一個主機名稱）分不出是 server 還是資料夾，直接 raise ValueError，不會默默在磁碟上建一個資料夾。
+    """
+    if location.startswith(("http://", "https://")):
+        return "url", location
+    if location == ":memory:":
+        return "memory", location
+    if location.startswith("path:"):
+        return "path", os.path.expanduser(location[len("path:"):])
+    if _HOST_PORT.match(location):
+        return "url", f"http://{location}"
+    if os.path.isdir(location) or "/" in location or "\\" in location or location.startswith((".", "~")):
+        return "path", os.path.expanduser(location)
+    raise ValueError(
+        f"ambiguous Qdrant location {location!r}: use http://host:port, host:port, ':memory:' or path:<dir>"
+    )
+
+def is_local(location: str) -> bool:
+    """:memory: 或本機資料夾（行程內的 Qdrant，不需要另外開 server）。"""
+    return parse_location(location)[0] != "url"
+
+def make_client(location: Optional[str] = None, prefer_grpc: bool = False, grpc_port: int = 6334) -> QdrantClient:
+    """
+    location 決定連線方式（沒給就看環境變數 QDRANT_LOCATION，再沒有就 localhost:6333），規則見 parse_location：
+    - "http://host:6333" / "host:6333"   : 遠端 server（prefer_grpc=True 改走 gRPC）
+    - ":memory:"                          : 行程內、存在記憶體，結束就消失（測試 / benchmark 用）
+    - "path:<資料夾>" / "./qdrant_data"    : 行程內、寫到磁碟（同一時間只能一個行程開啟）
+    """
+    kind, value = parse_location(resolve_location(location))
+    if kind == "memory":
+        return QdrantClient(location=":memory:")
+    if kind == "path":
+        return QdrantClient(path=value)
+    return QdrantClient(url=value, prefer_grpc=prefer_grpc, grpc_port=grpc_port)
+
+def hnsw_config(m: Optional[int] = None, ef_construct: Optional[int] = None) -> Optional[HnswConfigDiff]:
+    """建 collection 時的 HNSW 參數（m：每個節點的邊數、ef_construct：建圖時的候選數），沒給就用 Qdrant 預設。"""
+    if m is None and ef_construct is None:
+        return None
+    return HnswConfigDiff(m=m, ef_construct=ef_construct)
+
+def search_params(ef: Optional[int] = None, exact: bool = False) -> Optional[SearchParams]:
+    """查詢時的參數：ef 越大越準越慢；exact=True 直接暴力搜尋（當作 ground truth）。"""
+    if ef is None and not exact:
+        return None
+    return SearchParams(hnsw_ef=ef, exact=exact)
+
 class QdrantVDB:
-    def __init__(self, host: str = "localhost", port: int = 6333, collection: str = "cw02", vector_size: int = 4096):
-        self.client = QdrantClient(host=host, port=port)
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6333,
+        collection: str = "cw02",
+        vector_size: int = 4096,
+        location: Optional[str] = None,
+        prefer_grpc: bool = False,
+    ):
+        # location（URL / ":memory:" / 本機路徑，或環境變數 QDRANT_LOCATION）優先；沒給就維持原本的 host + port
+        location = location or os.getenv("QDRANT_LOCATION")
+        if location:
+            self.client = make_client(location, prefer_grpc=prefer_grpc)
+        else:
+            self.client = QdrantClient(host=host, port=port, prefer_grpc=prefer_grpc)
         self.collection = collection
         self.vector_size = vector_size
 
-    def recreate_collection(self) -> None:
-        self.client.recreate_collection(
+    def recreate_collection(self, m: Optional[int] = None, ef_construct: Optional[int] = None) -> None:
+        # recreate_collection 已 deprecated：先刪再建，local mode 也適用
+        if self.client.collection_exists(self.collection):
+            self.client.delete_collection(self.collection)
+        self.client.create_collection(
             collection_name=self.collection,
             vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE),
+            hnsw_config=hnsw_config(m, ef_construct),
         )
 
     def upsert_points(self, points: List[Dict[str, Any]]) -> None:
@@ -24,7 +105,14 @@ class QdrantVDB:
         ]
         self.client.upsert(collection_name=self.collection, points=qpoints)
 
-    def search(self, query_vector: List[float], top_k: int = 5, method: Optional[str] = None) -> List[Dict[str, Any]]:
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        method: Optional[str] = None,
+        ef: Optional[int] = None,
+        exact: bool = False,
+    ) -> List[Dict[str, Any]]:
         qfilter = None
         if method:
             qfilter = Filter(
@@ -37,6 +125,7 @@ class QdrantVDB:
             query=query_vector,
             limit=top_k,
             query_filter=qfilter,
+            search_params=search_params(ef, exact),
             with_payload=True,
             with_vectors=False,
         )
@@ -49,3 +138,12 @@ class QdrantVDB:
                 "payload": p.payload
             })
         return results
+
+    # ---- 快照（vdb_snapshot.py）：換機器時直接灌回向量，不用重新 embed ----
+    def export_snapshot(self, path: str) -> Dict[str, Any]:
+        from vdb_snapshot import export_collection
+        return export_collection(self.client, self.collection, path)
+
+    def import_snapshot(self, path: str, recreate: bool = True) -> Dict[str, Any]:
+        from vdb_snapshot import import_collection
+        return import_collection(self.client, path, self.collection, recreate=recreate)
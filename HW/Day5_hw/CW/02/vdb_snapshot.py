@@ -0,0 +1,225 @@
+"""
+Qdrant collection 快照匯出 / 匯入（換機器或 CI 不用重新打 embedding API）。
+
+封存檔是一個 zip：
+- config.json     : collection 名稱、維度、距離、點數、格式版本，加上完整的 collection config
+                    （HNSW / optimizer / WAL / quantization / on_disk …）與 payload index schema
+- points.jsonl    : 每行 {"id": ..., "payload": {...}}（與 vectors.f32 同順序）
+- vectors.f32     : 所有向量，float32 little-endian，row-major（點數 × dim）
+
+    python vdb_snapshot.py export cw01 cw02 day5_fixed day5_sliding day5_semantic --out-dir snapshots
+    python vdb_snapshot.py import snapshots/*.zip
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    CollectionConfig,
+    HnswConfigDiff,
+    OptimizersConfigDiff,
+    PayloadIndexInfo,
+    PointStruct,
+    StrictModeConfig,
+    VectorParams,
+    WalConfigDiff,
+)
+
+from chunk_io import dumps, loads
+from vdb_qdrant import QDRANT_URL, make_client
+
+FORMAT_VERSION = 2  # 2：config.json 帶完整 collection config 與 payload_schema
+SCROLL_BATCH = 512
+UPLOAD_BATCH = 256
+
+def _vector_params(collection: str, config: CollectionConfig) -> VectorParams:
+    vectors = config.params.vectors
+    if not isinstance(vectors, VectorParams):
+        # 這份作業的 collection 都是單一（未命名）向量
+        raise ValueError(f"{collection}: named / multi vectors are not supported")
+    return vectors
+
+def _diff(model, cls):
+    # get_collection 回來的是完整設定，create_collection 要的是 *Diff 型別，欄位名稱相同
+    return cls(**model.model_dump(exclude_none=True)) if model is not None else None
+
+def create_from_config(client: QdrantClient, name: str, config: Dict[str, Any]) -> None:
+    """依 snapshot 的 collection config 建 collection，並補回 payload index。"""
+    cfg = CollectionConfig.model_validate(config["collection_config"])
+    params = cfg.params
+    client.create_collection(
+        collection_name=name,
+        vectors_config=params.vectors,
+        sparse_vectors_config=params.sparse_vectors,
+        shard_number=params.shard_number,
+        sharding_method=params.sharding_method,
+        replication_factor=params.replication_factor,
+        write_consistency_factor=params.write_consistency_factor,
+        on_disk_payload=params.on_disk_payload,
+        hnsw_config=_diff(cfg.hnsw_config, HnswConfigDiff),
+        optimizers_config=_diff(cfg.optimizer_config, OptimizersConfigDiff),
+        wal_config=_diff(cfg.wal_config, WalConfigDiff),
+        quantization_config=cfg.quantization_config,
+        strict_mode_config=_diff(cfg.strict_mode_config, StrictModeConfig),
+        metadata=cfg.metadata,
+    )
+    for field, raw in config["payload_schema"].items():
+        index = PayloadIndexInfo.model_validate(raw)
+        client.create_payload_index(name, field, field_schema=index.params or index.data_type, wait=True)
+
+def iter_records(client: QdrantClient, collection: str, batch: int = SCROLL_BATCH) -> Iterator[List[Any]]:
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection,
+            limit=batch,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if records:
+            yield records
+        if offset is None:
+            break
+
+def export_collection(client: QdrantClient, collection: str, path: str, batch: int = SCROLL_BATCH) -> Dict[str, Any]:
+    """把整個 collection 寫成一個 zip；向量直接寫 float32 bytes，不經過 JSON。"""
+    coll = client.get_collection(collection)
+    params = _vector_params(collection, coll.config)
+    dim = params.size
+    n = 0
+    t0 = time.perf_counter()
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    # zip 同時只能開一個寫入 handle：向量先寫暫存檔，payload 寫完再整段複製進去
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf, tempfile.TemporaryFile() as vtmp:
+        with zf.open("points.jsonl", "w") as pf:
+            for records in iter_records(client, collection, batch):
+                mat = np.asarray([r.vector for r in records], dtype="<f4")
+                if mat.shape[1] != dim:
+                    raise ValueError(f"{collection}: vector dim {mat.shape[1]} != config {dim}")
+                vtmp.write(mat.tobytes())
+                pf.write(b"".join(dumps({"id": r.id, "payload": r.payload}) + b"\n" for r in records))
+                n += len(records)
+
+        # 向量本身壓不太下去，STORED 就好
+        vtmp.seek(0)
+        info = zipfile.ZipInfo("vectors.f32", date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        with zf.open(info, "w", force_zip64=True) as vf:
+            shutil.copyfileobj(vtmp, vf, 1 << 20)
+
+        config = {
+            "format": FORMAT_VERSION,
+            "collection": collection,
+            "dim": dim,
+            "distance": params.distance.value,
+            "points": n,
+            "collection_config": coll.config.model_dump(mode="json", exclude_none=True),
+            "payload_schema": {
+                field: index.model_dump(mode="json", exclude_none=True)
+                for field, index in (coll.payload_schema or {}).items()
+            },
+        }
+        zf.writestr("config.json", dumps(config))
+
+    return {**config, "sec": round(time.perf_counter() - t0, 3), "bytes": Path(path).stat().st_size}
+
+def read_config(path: str) -> Dict[str, Any]:
+    with zipfile.ZipFile(path) as zf:
+        config = loads(zf.read("config.json"))
+    if config.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported snapshot format {config.get('format')} (expected {FORMAT_VERSION})")
+    return config
+
+def iter_snapshot(path: str, batch: int = UPLOAD_BATCH) -> Iterator[Tuple[List[Any], List[Dict[str, Any]], np.ndarray]]:
+    """一次讀一批 (ids, payloads, 向量矩陣)，大檔也不用整個載入記憶體。"""
+    config = read_config(path)
+    row_bytes = config["dim"] * 4
+    with zipfile.ZipFile(path) as zf, zf.open("vectors.f32") as vf, zf.open("points.jsonl") as pf:
+        ids, payloads = [], []
+        for line in pf:
+            if not line.strip():
+                continue
+            rec = loads(line)
+            ids.append(rec["id"])
+            payloads.append(rec["payload"])
+            if len(ids) == batch:
+                yield ids, payloads, np.frombuffer(vf.read(row_bytes * len(ids)), dtype="<f4").reshape(len(ids), -1)
+                ids, payloads = [], []
+        if ids:
+            yield ids, payloads, np.frombuffer(vf.read(row_bytes * len(ids)), dtype="<f4").reshape(len(ids), -1)
+
+def import_collection(
+    client: QdrantClient,
+    path: str,
+    collection: Optional[str] = None,
+    recreate: bool = True,
+    batch: int = UPLOAD_BATCH,
+    parallel: int = 4,
+) -> Dict[str, Any]:
+    """
+    把 export_collection 的 zip 灌回 Qdrant（預設先砍掉重建同名 collection）。
+    新建的 collection 沿用原本的 HNSW / optimizer / quantization 等設定與 payload index；--keep 寫進既有 collection 時不動它的設定。
+    """
+    config = read_config(path)
+    name = collection or config["collection"]
+    t0 = time.perf_counter()
+
+    if recreate and client.collection_exists(name):
+        client.delete_collection(name)
+    if not client.collection_exists(name):
+        create_from_config(client, name, config)
+
+    def points() -> Iterator[PointStruct]:
+        for ids, payloads, mat in iter_snapshot(path, batch):
+            for pid, pay, vec in zip(ids, payloads, mat.tolist()):
+                yield PointStruct(id=pid, vector=vec, payload=pay)
+
+    client.upload_points(name, points(), batch_size=batch, parallel=parallel, wait=True)
+    n = client.count(name, exact=True).count
+    if recreate and n != config["points"]:
+        raise RuntimeError(f"{name}: imported {n} points, snapshot has {config['points']}")
+    return {"collection": name, "points": n, "sec": round(time.perf_counter() - t0, 3)}
+
+def build_argparser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Export / import Qdrant collections as portable snapshot archives")
+    ap.add_argument("--qdrant", "--url", dest="qdrant", default=None,
+                    help=f"Qdrant URL, ':memory:' or local path (default: $QDRANT_LOCATION or {QDRANT_URL})")
+    ap.add_argument("--grpc", action="store_true", help="use gRPC for remote Qdrant")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ex = sub.add_parser("export", help="collections -> <out-dir>/<collection>.zip")
+    ex.add_argument("collections", nargs="+")
+    ex.add_argument("--out-dir", default="snapshots")
+
+    im = sub.add_parser("import", help="snapshot zip(s) -> collections")
+    im.add_argument("archives", nargs="+")
+    im.add_argument("--as", dest="rename", default=None, help="target collection name (single archive only)")
+    im.add_argument("--keep", action="store_true", help="upsert into existing collection instead of recreating it")
+    im.add_argument("--parallel", type=int, default=4, help="parallel upload workers")
+    return ap
+
+def main():
+    args = build_argparser().parse_args()
+    client = make_client(args.qdrant, prefer_grpc=args.grpc)
+
+    if args.cmd == "export":
+        for name in args.collections:
+            info = export_collection(client, name, str(Path(args.out_dir) / f"{name}.zip"))
+            print(f"[OK] export {name}: {info['points']} pts, {info['bytes'] / 1e6:.1f} MB, {info['sec']}s")
+    else:
+        if args.rename and len(args.archives) > 1:
+            raise SystemExit("--as only works with a single archive")
+        for path in args.archives:
+            info = import_collection(client, path, args.rename, recreate=not args.keep, parallel=args.parallel)
+            print(f"[OK] import {path} -> {info['collection']}: {info['points']} pts, {info['sec']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+chunk_sweep.py
+
+切塊參數掃描（不用改 main.py、不用手動重建索引）：
+- 參數網格：fixed 的 chunk_size × overlap、sliding 的 window_size × stride、
+  token（選用）的 max_tokens × overlap_tokens
+- 每組設定都重新切塊（沿用 CW/02/chunker.py 的 fixed_chunk / sliding_window / token_chunk）
+- 語料只 embed 一次：切成 --pool-unit 字元的小格（預設 64），每格 embed 一次；fixed / sliding 的
+  size、overlap、stride 對齊到格子的倍數，chunk 向量 = 涵蓋格子的向量依字數加權平均再正規化
+  （近似值；--pool-unit 0 改回每個 chunk 各自 embed 的精確模式）
+- token 設定的邊界落在句子 / token 上，對不齊字元格子，仍然每個 chunk 各自 embed
+- 先把整個網格切完，印出真正要 embed 的不重複文字數 / 字元數，再一次批次 embed（--max-new-embeds 可設上限）；
+  全部走 embed_cache，重跑只讀快取
+- 用 offline_eval 的指標（recall@k / MRR / ans@k）在本地打分，最後印排名表
+
+    python chunk_sweep.py --fixed-size 256 384 512 --fixed-overlap 0 48 \
+                          --sliding-window 256 512 --sliding-stride 128 200 \
+                          --token-budget 128 256 --token-overlap 0 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import itertools
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embed_cache import EMBED_CACHE_DIR_DEFAULT, EmbeddingCache
+from offline_eval import (
+    EMBED_URL_DEFAULT,
+    K_DEFAULT,
+    TASK_DESC_DEFAULT,
+    evaluate_method,
+    load_labeled_questions,
+)
+
+# chunker.py 放在 CW/02，直接共用同一份切塊實作
+CW02_DIR = Path(__file__).resolve().parents[1] / "CW" / "02"
+if str(CW02_DIR) not in sys.path:
+    sys.path.insert(0, str(CW02_DIR))
+
+from chunker import fixed_chunk, sliding_window, token_chunk  # noqa: E402
+
+Config = Tuple[str, int, int]  # (method, size, overlap_or_stride)
+TOKENIZER = "cl100k_base"
+POOL_UNIT_DEFAULT = 64  # 語料切成幾個字元一格來 embed（0 = 不 pooling）
+
+
+def build_grid(
+    fixed_sizes: Sequence[int],
+    fixed_overlaps: Sequence[int],
+    sliding_windows: Sequence[int],
+    sliding_strides: Sequence[int],
+    token_budgets: Sequence[int] = (),
+    token_overlaps: Sequence[int] = (0,),
+) -> List[Config]:
+    grid: List[Config] = []
+    for size, overlap in itertools.product(fixed_sizes, fixed_overlaps):
+        if overlap < size:
+            grid.append(("fixed", size, overlap))
+    for window, stride in itertools.product(sliding_windows, sliding_strides):
+        if 0 < stride <= window:
+            grid.append(("sliding", window, stride))
+    for budget, overlap in itertools.product(token_budgets, token_overlaps):
+        if 0 <= overlap < budget:
+            grid.append(("token", budget, overlap))
+    return grid
+
+
+def align_config(cfg: Config, unit: int) -> Config:
+    """把 fixed / sliding 的參數四捨五入到 unit 的倍數，chunk 起點才會落在格子上（token 設定不動）。"""
+    method, a, b = cfg
+    if not unit or method == "token":
+        return cfg
+    a = max(unit, round(a / unit) * unit)
+    if method == "fixed":
+        return method, a, min(round(b / unit) * unit, a - unit)
+    return method, a, min(max(unit, round(b / unit) * unit), a)
+
+
+def config_name(cfg: Config) -> str:
+    method, a, b = cfg
+    if method == "fixed":
+        return f"fixed(size={a},overlap={b})"
+    if method == "token":
+        return f"token(max={a},overlap={b})"
+    return f"sliding(window={a},stride={b})"
+
+
+def make_chunks(cfg: Config, corpus: Dict[str, str], tokenizer: str = TOKENIZER) -> List[Dict[str, object]]:
+    method, a, b = cfg
+    out: List[Dict[str, object]] = []
+    for src, text in corpus.items():
+        if method == "fixed":
+            chunks = fixed_chunk(text, chunk_size=a, overlap=b, source=src)
+        elif method == "token":
+            chunks = token_chunk(text, max_tokens=a, overlap_tokens=b, source=src, tokenizer=tokenizer)
+        else:
+            chunks = sliding_window(text, window_size=a, stride=b, source=src)
+        out.extend({"chunk_id": c.chunk_id, "text": c.text, "source": c.source, "start": c.start, "end": c.end}
+                   for c in chunks)
+    return out
+
+
+def make_units(corpus: Dict[str, str], unit: int) -> Dict[str, Dict[int, str]]:
+    """每個檔案切成 unit 字元一格（位置和 chunker 一樣算在清理後的文字上）：{source: {格子編號: 文字}}。"""
+    return {
+        src: {c.start // unit: c.text for c in fixed_chunk(text, chunk_size=unit, overlap=0, source=src)}
+        for src, text in corpus.items()
+    }
+
+
+def pool_chunk_vectors(
+    chunks: Sequence[Dict[str, object]],
+    units: Dict[str, Dict[int, str]],
+    unit_vecs: Dict[str, np.ndarray],
+    unit: int,
+) -> np.ndarray:
+    """chunk 涵蓋的格子向量依字數加權平均，再 L2 正規化（空白格不算）。"""
+    out = np.zeros((len(chunks), next(iter(unit_vecs.values())).shape[1]), dtype=np.float32)
+    rows = {src: {k: i for i, k in enumerate(cells)} for src, cells in units.items()}  # 格子編號 -> unit_vecs 列
+    for r, c in enumerate(chunks):
+        src = str(c["source"])
+        pos = rows[src]
+        cells = [k for k in range(int(c["start"]) // unit, -(-int(c["end"]) // unit)) if k in pos]
+        w = np.array([len(units[src][k]) for k in cells], dtype=np.float32)
+        v = (unit_vecs[src][[pos[k] for k in cells]] * w[:, None]).sum(axis=0)
+        out[r] = v / max(float(np.linalg.norm(v)), 1e-12)
+    return out
+
+
+def load_corpus(patterns: Sequence[str]) -> Dict[str, str]:
+    corpus: Dict[str, str] = {}
+    for pat in patterns:
+        for path in sorted(glob.glob(pat)):
+            corpus[os.path.basename(path)] = Path(path).read_text(encoding="utf-8", errors="ignore")
+    return corpus
+
+
+def run_sweep(
+    questions_csv: str,
+    corpus: Dict[str, str],
+    grid: Sequence[Config],
+    cache: EmbeddingCache,
+    ks: Sequence[int] = K_DEFAULT,
+    tokenizer: str = TOKENIZER,
+    max_new_embeds: int = 0,
+    pool_unit: int = POOL_UNIT_DEFAULT,
+) -> List[Tuple[Config, Dict[str, float]]]:
+    questions = load_labeled_questions(questions_csv)
+    q_vecs = cache.embed([q.question for q in questions])
+
+    # 1) 先切完整個網格，算出真正要打 /embed 的量（new_embeds 記在第一個產生該文字的設定上）
+    units = make_units(corpus, pool_unit) if pool_unit else {}
+    unit_texts = [t for cells in units.values() for t in cells.values()]
+    todo: List[str] = cache.missing(unit_texts)
+    seen = set(todo)
+
+    plans: List[Tuple[Config, List[Dict[str, object]], int]] = []
+    for cfg in grid:
+        chunks = make_chunks(cfg, corpus, tokenizer)
+        if pool_unit and cfg[0] != "token":
+            plans.append((cfg, chunks, 0))
+            continue
+        new = [t for t in cache.missing([str(c["text"]) for c in chunks]) if t not in seen]
+        seen.update(new)
+        todo.extend(new)
+        plans.append((cfg, chunks, len(new)))
+
+    n_chunks = sum(len(chunks) for _, chunks, _ in plans)
+    if pool_unit:
+        print(f"[INFO] pooling: {len(unit_texts)} units of {pool_unit} chars "
+              f"({sum(map(len, unit_texts))} chars) shared by all fixed / sliding configs")
+    print(f"[INFO] {len(grid)} configs -> {n_chunks} chunks; not cached: {len(todo)} unique texts "
+          f"({sum(map(len, todo))} chars)")
+    if max_new_embeds and len(todo) > max_new_embeds:
+        raise SystemExit(f"需要 embed {len(todo)} 段新文字，超過 --max-new-embeds={max_new_embeds}；請縮小網格")
+
+    # 2) 全部新文字一次批次 embed（adaptive batching），之後每組設定都只讀快取
+    t0 = time.perf_counter()
+    cache.embed(todo)
+    print(f"[INFO] embedded {len(todo)} new texts in {time.perf_counter() - t0:.1f}s")
+    unit_vecs = {src: cache.get_many(list(cells.values())) for src, cells in units.items() if cells}
+
+    results: List[Tuple[Config, Dict[str, float]]] = []
+    for i, (cfg, chunks, new_texts) in enumerate(plans, start=1):
+        t0 = time.perf_counter()
+        if pool_unit and cfg[0] != "token":
+            c_vecs = pool_chunk_vectors(chunks, units, unit_vecs, pool_unit)
+        else:
+            c_vecs = cache.get_many([str(c["text"]) for c in chunks])
+
+        metrics = evaluate_method(q_vecs, questions, c_vecs, chunks, ks)
+        metrics["new_embeds"] = float(new_texts)
+        metrics["sec"] = time.perf_counter() - t0
+        results.append((cfg, metrics))
+        print(f"[{i}/{len(grid)}] {config_name(cfg)}: chunks={len(chunks)} new_embeds={new_texts}")
+
+    return results
+
+
+def pick_rank_key(results: Sequence[Tuple[Config, Dict[str, float]]], rank_by: str) -> str:
+    # 沒有 source 標註就沒有 MRR，退而用 answer 覆蓋率排
+    if any(rank_by in m for _, m in results):
+        return rank_by
+    for fallback in ("MRR", "ans@1"):
+        if any(fallback in m for _, m in results):
+            print(f"[WARN] no '{rank_by}' metric, rank by '{fallback}' instead")
+            return fallback
+    return "n_chunks"
+
+
+def print_ranking(results: Sequence[Tuple[Config, Dict[str, float]]], ks: Sequence[int], rank_by: str) -> None:
+    key = pick_rank_key(results, rank_by)
+    ranked = sorted(results, key=lambda r: r[1].get(key, float("-inf")), reverse=True)
+
+    cols = [f"recall@{k}" for k in ks] + ["MRR"] + [f"ans@{k}" for k in ks] + ["n_chunks", "new_embeds"]
+    print(f"\n=== ranked by {key} ===")
+    print(f"{'#':>3}  {'config':<32}" + "".join(f"{c:>11}" for c in cols))
+    print("-" * (37 + 11 * len(cols)))
+    for rank, (cfg, m) in enumerate(ranked, start=1):
+        cells = []
+        for c in cols:
+            v = m.get(c)
+            if v is None:
+                cells.append(f"{'-':>11}")
+            elif c in ("n_chunks", "new_embeds"):
+                cells.append(f"{int(v):>11}")
+            else:
+                cells.append(f"{v:>11.3f}")
+        print(f"{rank:>3}  {config_name(cfg):<32}" + "".join(cells))
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Day5 RAG HW01 - chunking parameter sweep (shared embedding cache)")
+    ap.add_argument("--questions", default="questions.csv", help="questions.csv path (needs answer/source)")
+    ap.add_argument("--corpus", nargs="+", default=["data_*.txt"], help="corpus file glob(s)")
+    ap.add_argument("--fixed-size", type=int, nargs="*", default=[256, 384, 512])
+    ap.add_argument("--fixed-overlap", type=int, nargs="*", default=[0, 48, 100])
+    ap.add_argument("--sliding-window", type=int, nargs="*", default=[256, 384, 512])
+    ap.add_argument("--sliding-stride", type=int, nargs="*", default=[128, 200, 400])
+    ap.add_argument("--token-budget", type=int, nargs="*", default=[], help="token-budget chunking max_tokens (empty = skip)")
+    ap.add_argument("--token-overlap", type=int, nargs="*", default=[0, 32])
+    ap.add_argument("--tokenizer", default=TOKENIZER, help="tokenizer for --token-budget (cl100k_base / o200k_base / estimate)")
+    ap.add_argument("--k", type=int, nargs="+", default=K_DEFAULT, help="k values for recall@k / ans@k")
+    ap.add_argument("--rank-by", default="MRR", help="metric used for ranking (e.g. MRR, recall@3, ans@1)")
+    ap.add_argument("--embed-cache", default=EMBED_CACHE_DIR_DEFAULT, help="embedding cache directory")
+    ap.add_argument("--pool-unit", type=int, default=POOL_UNIT_DEFAULT,
+                    help="embed the corpus once in N-char units and pool them per chunk (0 = embed every chunk exactly)")
+    ap.add_argument("--max-new-embeds", type=int, default=0, help="abort if the grid needs more new embeddings (0 = no limit)")
+    ap.add_argument("--embed-url", default=EMBED_URL_DEFAULT, help="Embedding API URL (only for cache misses)")
+    ap.add_argument("--task-desc", default=TASK_DESC_DEFAULT, help="Embedding task_description")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_argparser().parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit(f"找不到語料檔：{args.corpus}")
+    grid = build_grid(args.fixed_size, args.fixed_overlap, args.sliding_window, args.sliding_stride,
+                      args.token_budget, args.token_overlap)
+    if args.pool_unit:
+        # 對齊格子後可能有幾組變成同一組，保留第一次出現的順序
+        aligned = list(dict.fromkeys(align_config(cfg, args.pool_unit) for cfg in grid))
+        if aligned != grid:
+            print(f"[INFO] fixed / sliding params rounded to multiples of --pool-unit={args.pool_unit}")
+        grid = aligned
+    print(f"[INFO] corpus files={len(corpus)} configs={len(grid)}")
+
+    cache = EmbeddingCache(args.embed_cache, embed_url=args.embed_url, task_desc=args.task_desc)
+    ks = sorted(set(args.k))
+    results = run_sweep(args.questions, corpus, grid, cache, ks, args.tokenizer, args.max_new_embeds,
+                        args.pool_unit)
+
+    print_ranking(results, ks, args.rank_by)
+    print(f"\n[INFO] {cache.summary()}")
+
+
+if __name__ == "__main__":
+    main()
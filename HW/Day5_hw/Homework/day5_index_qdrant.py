@@ -1,30 +1,83 @@
-import json
-import requests
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+import argparse
+import sys
+import threading
+from contextlib import nullcontext
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from embed_cache import post_embed
+from rate_limit import TokenBucket
+
+# chunk_io.py / vdb_qdrant.py 放在 CW/02（串流讀取 chunk 檔、Qdrant 連線方式）
+CW02_DIR = Path(__file__).resolve().parents[1] / "CW" / "02"
+if str(CW02_DIR) not in sys.path:
+    sys.path.insert(0, str(CW02_DIR))
+
+from chunk_io import iter_jsonl  # noqa: E402
+from token_counter import get_counter  # noqa: E402
+from vdb_qdrant import hnsw_config, is_local, make_client, resolve_location  # noqa: E402
+
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[2] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import http_pool  # noqa: E402
+from embed_batcher import AdaptiveBatcher  # noqa: E402
+import embed_dedup  # noqa: E402
 
-QDRANT_URL = "http://localhost:6333"
 EMBED_URL = "https://ws-04.wade0426.me/embed"
 TASK_DESC = "檢索技術文件"
 DIM = 4096
 
+# (chunk 檔, collection, payload.method)；依你實際檔名調整
+COLLECTIONS = [
+    ("chunks_fixed.jsonl",    "day5_fixed",    "固定大小"),
+    ("chunks_sliding.jsonl",  "day5_sliding",  "滑動視窗"),
+    ("chunks_semantic.jsonl", "day5_semantic", "語意切塊"),
+]
+
 def embed_texts(texts):
-    r = requests.post(
-        EMBED_URL,
-        json={"texts": texts, "task_description": TASK_DESC, "normalize": True},
-        timeout=60
-    )
-    r.raise_for_status()
-    return r.json()["embeddings"]
+    return post_embed(http_pool.get_session(retry=True), EMBED_URL, TASK_DESC, texts).tolist()
 
 def load_jsonl(path):
-    items = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            items.append(json.loads(line))
-    return items
+    # lazy：讀到一行就交出一筆，不先把整個檔案載入
+    return iter_jsonl(path)
+
+def make_batcher(batch_by="chars"):
+    """--batch-size 0 時用：依總字元數或 token 數切批，延遲 / 錯誤自動調整。"""
+    if batch_by == "tokens":
+        return AdaptiveBatcher(2048, min_budget=64, max_budget=32768, count=get_counter(), unit="tokens")
+    return AdaptiveBatcher()
+
+def iter_batches(jsonl_path: str, method_name: str, batch_size=32, batcher=None):
+    """
+    邊讀邊組 batch：第一批湊滿就能開始 embed，不用等整個檔案讀完。
+    有 batcher 時改成「湊滿目前的字元 / token budget」就送出（batch_size 不用）。
+    """
+    batch, size = [], 0
+    for i, ch in enumerate(load_jsonl(jsonl_path)):
+        text = ch.get("text", "")
+        if not text.strip():
+            continue
 
-def ensure_collection(client: QdrantClient, name: str):
+        batch.append((i, {
+            "text": text,
+            "source": ch.get("source", ""),
+            "chunk_id": ch.get("chunk_id", i),
+            "method": method_name,
+        }))
+        size += batcher.count(text) if batcher else 0
+        if (batcher.full(len(batch), size) if batcher else len(batch) == batch_size):
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+def ensure_collection(client, name: str, hnsw=None):
     # 如果已存在就跳過；不存在就建
     try:
         client.get_collection(name)
@@ -35,49 +88,215 @@ def ensure_collection(client: QdrantClient, name: str):
     client.create_collection(
         collection_name=name,
         vectors_config=VectorParams(size=DIM, distance=Distance.COSINE),
+        hnsw_config=hnsw,  # None = Qdrant 預設（m=16, ef_construct=100）
     )
 
-def index_jsonl_to_collection(jsonl_path: str, collection: str, method_name: str, batch_size=32):
-    client = QdrantClient(url=QDRANT_URL)
-    ensure_collection(client, collection)
+def index_jsonl_to_collection(jsonl_path: str, collection: str, method_name: str, batch_size=32, client=None,
+                              hnsw=None, batcher=None):
+    client = client or make_client()
+    ensure_collection(client, collection, hnsw)
 
-    chunks = load_jsonl(jsonl_path)
+    # 批次 embedding + upsert（串流讀檔，總筆數事先不知道，只印累計）
+    done = 0
+    for batch in iter_batches(jsonl_path, method_name, batch_size, batcher):
+        batch_texts = [pay["text"] for _, pay in batch]
 
-    ids, vectors, payloads = [], [], []
-    for i, ch in enumerate(chunks):
-        text = ch.get("text", "")
-        if not text.strip():
-            continue
+        if batcher is not None:
+            batch_vecs = batcher.embed_all(batch_texts, embed_texts).tolist()
+        else:
+            batch_vecs = embed_texts(batch_texts)
 
-        ids.append(i)
-        payloads.append({
-            "text": text,
-            "source": ch.get("source", ""),
-            "chunk_id": ch.get("chunk_id", i),
-            "method": method_name,
-        })
+        client.upsert(
+            collection_name=collection,
+            points=[
+                PointStruct(id=int(pid), vector=vec, payload=pay)
+                for (pid, pay), vec in zip(batch, batch_vecs)
+            ],
+        )
+        done += len(batch)
+        print(f"[OK] upsert {collection}: {done}")
+
+# -----------------------------
+# 併發建索引：三個 collection 同時跑，共用一個限流的 embed client
+# -----------------------------
+class SharedEmbedClient:
+    """
+    所有 collection 共用同一個連線池（http_pool）與 token bucket，總請求數不會超過 rps。
+    有 batcher 時三個 collection 也共用同一個自動調整的批次大小（同一台 embed server）。
+    """
+
+    def __init__(self, rps=5.0, batcher=None):
+        self.session = http_pool.get_session(retry=True)
+        self.bucket = TokenBucket(rate=rps)
+        self.batcher = batcher
+
+    def _post(self, texts):
+        self.bucket.acquire()
+        return post_embed(self.session, EMBED_URL, TASK_DESC, texts)
+
+    def embed(self, texts):
+        if self.batcher is not None:
+            # budget 在組批之後才縮小的話，這裡會再切小；413 / 逾時也會自動拆半重送
+            return self.batcher.embed_all(texts, self._post).tolist()
+        return self._post(texts).tolist()  # PointStruct 要 list
+
+class Progress:
+    """各 collection 已 upsert 的點數與吞吐量；背景執行緒每 interval 秒印一行。"""
+
+    def __init__(self, names):
+        self._lock = threading.Lock()
+        self.t0 = time.monotonic()
+        self.done = {n: 0 for n in names}
+        self.ended = {}   # name -> 結束時間
+        self.errors = {}  # name -> exception
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name, n):
+        with self._lock:
+            self.done[name] += n
+
+    def finish(self, name, error=None):
+        with self._lock:
+            self.ended[name] = time.monotonic()
+            if error is not None:
+                self.errors[name] = error
 
-    # 批次 embedding + upsert
-    for start in range(0, len(ids), batch_size):
-        end = start + batch_size
-        batch_ids = ids[start:end]
-        batch_payloads = payloads[start:end]
-        batch_texts = [p["text"] for p in batch_payloads]
+    def line(self):
+        now = time.monotonic()
+        parts = []
+        with self._lock:
+            for name, n in self.done.items():
+                sec = max(self.ended.get(name, now) - self.t0, 1e-9)
+                mark = "ERR" if name in self.errors else ("done" if name in self.ended else "...")
+                parts.append(f"{name} {n} pts {n / sec:.1f}/s {mark}")
+        return f"[{now - self.t0:6.1f}s] " + " | ".join(parts)
 
-        batch_vecs = embed_texts(batch_texts)
+    def start(self, interval=1.0):
+        def loop():
+            while not self._stop.wait(interval):
+                print(self.line(), flush=True)
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
 
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        print(self.line(), flush=True)
+
+def _upsert(client, collection, batch, vecs, progress, lock):
+    with lock:
         client.upsert(
             collection_name=collection,
             points=[
-                {"id": int(pid), "vector": vec, "payload": pay}
-                for pid, vec, pay in zip(batch_ids, batch_vecs, batch_payloads)
+                PointStruct(id=int(pid), vector=vec, payload=pay)
+                for (pid, pay), vec in zip(batch, vecs)
             ],
         )
-        print(f"[OK] upsert {collection}: {end if end < len(ids) else len(ids)}/{len(ids)}")
+    progress.add(collection, len(batch))
 
-if __name__ == "__main__":
-    # 依你實際檔名調整
-    index_jsonl_to_collection("chunks_fixed.jsonl",   "day5_fixed",   "固定大小")
-    index_jsonl_to_collection("chunks_sliding.jsonl", "day5_sliding", "滑動視窗")
-    index_jsonl_to_collection("chunks_semantic.jsonl","day5_semantic","語意切塊")
+def index_collection_pipelined(jsonl_path, collection, method_name, embed_client, progress, batch_size=32,
+                               client=None, lock=None, hnsw=None):
+    """
+    同一個 collection 內做兩段 pipeline：
+    embed 第 N+1 批的同時，背景執行緒在 upsert 第 N 批（最多只有一批在途，記憶體不會累積）。
+    """
+    client = client or make_client()
+    lock = lock or nullcontext()
+    with lock:
+        ensure_collection(client, collection, hnsw)
+
+    pending = None
+    with ThreadPoolExecutor(max_workers=1) as upserter:
+        for batch in iter_batches(jsonl_path, method_name, batch_size, embed_client.batcher):
+            vecs = embed_client.embed([pay["text"] for _, pay in batch])
+            if pending is not None:
+                pending.result()  # 上一批 upsert 失敗就在這裡丟出來
+            pending = upserter.submit(_upsert, client, collection, batch, vecs, progress, lock)
+        if pending is not None:
+            pending.result()
+
+def index_all(specs=COLLECTIONS, rps=5.0, batch_size=32, interval=1.0, location=None, prefer_grpc=False,
+              hnsw=None, batch_by="chars"):
+    found = []
+    for spec in specs:
+        if Path(spec[0]).exists():
+            found.append(spec)
+        else:
+            print(f"[WARN] skip {spec[1]}: {spec[0]} not found")
+    specs = found
+    if not specs:
+        return {}, {}
+
+    # 所有 collection 共用一個 Qdrant client；local mode（:memory: / 路徑）不是 thread-safe，upsert 要排隊
+    location = resolve_location(location)
+    client = make_client(location, prefer_grpc=prefer_grpc)
+    lock = threading.Lock() if is_local(location) else nullcontext()
+
+    embed_client = SharedEmbedClient(rps=rps, batcher=make_batcher(batch_by) if batch_size <= 0 else None)
+    progress = Progress([c for _, c, _ in specs])
+    progress.start(interval)
+    try:
+        with ThreadPoolExecutor(max_workers=len(specs)) as pool:
+            futs = {
+                pool.submit(index_collection_pipelined, path, coll, method, embed_client, progress, batch_size,
+                            client, lock, hnsw): coll
+                for path, coll, method in specs
+            }
+            for fut in as_completed(futs):
+                try:
+                    fut.result()
+                    progress.finish(futs[fut])
+                except Exception as e:
+                    progress.finish(futs[fut], e)
+    finally:
+        progress.stop()
+
+    for coll, err in progress.errors.items():
+        print(f"[ERR] {coll}: {err}")
+    print(f"[INFO] embed bucket: {embed_client.bucket.stats()}")
+    if embed_client.batcher is not None:
+        print(embed_client.batcher.report())
+    embed_dedup.print_stats()
+    http_pool.print_stats()
+    return dict(progress.done), dict(progress.errors)
+
+def build_argparser():
+    ap = argparse.ArgumentParser(description="Day5 - index chunk files into Qdrant (collections in parallel)")
+    ap.add_argument("--rps", type=float, default=5.0, help="shared embed API rate limit (<=0 = unlimited)")
+    ap.add_argument("--batch-size", type=int, default=0,
+                    help="texts per /embed request and per upsert (0 = adaptive by total chars/tokens)")
+    ap.add_argument("--batch-by", choices=["chars", "tokens"], default="chars", help="adaptive batch budget unit")
+    ap.add_argument("--interval", type=float, default=1.0, help="progress print interval (sec)")
+    ap.add_argument("--qdrant", default=None,
+                    help="Qdrant URL, ':memory:' or local path (default: $QDRANT_LOCATION or http://localhost:6333)")
+    ap.add_argument("--grpc", action="store_true", help="use gRPC for remote Qdrant")
+    ap.add_argument("--hnsw-m", type=int, default=None, help="HNSW m for new collections (default: Qdrant's)")
+    ap.add_argument("--ef-construct", type=int, default=None, help="HNSW ef_construct for new collections")
+    ap.add_argument("--sequential", action="store_true", help="old behaviour: one collection after another")
+    return ap
+
+def main():
+    args = build_argparser().parse_args()
+    hnsw = hnsw_config(args.hnsw_m, args.ef_construct)
+    if args.sequential:
+        client = make_client(args.qdrant, prefer_grpc=args.grpc)
+        batcher = make_batcher(args.batch_by) if args.batch_size <= 0 else None
+        for path, coll, method in COLLECTIONS:
+            index_jsonl_to_collection(path, coll, method, batch_size=args.batch_size, client=client, hnsw=hnsw,
+                                      batcher=batcher)
+        if batcher is not None:
+            print(batcher.report())
+        embed_dedup.print_stats()
+    else:
+        _, errors = index_all(COLLECTIONS, rps=args.rps, batch_size=args.batch_size, interval=args.interval,
+                              location=args.qdrant, prefer_grpc=args.grpc, hnsw=hnsw, batch_by=args.batch_by)
+        if errors:
+            # 部分 collection 沒建好：exit code 非 0，腳本 / CI 才知道索引不完整
+            print(f"[FAIL] {len(errors)} collection(s) failed: {', '.join(sorted(errors))}")
+            sys.exit(1)
     print("[DONE] indexing all collections")
+
+if __name__ == "__main__":
+    main()
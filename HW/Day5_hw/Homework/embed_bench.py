@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+embed_bench.py
+
+embedding 路徑的吞吐量 benchmark（預設打本機的 HW/shared/embed_stub.py，不碰 ws-04）：
+掃 client × 傳輸格式 × 批次大小 × 併發數 × 文字長度，每組印出
+texts/s、單次 /embed 延遲 p50 / p95、client 端 CPU 秒數 / 使用率、RSS。
+
+client：
+- raw          : 原本的寫法，requests.post + resp.json()（沒有連線池 / 去重 / base64）
+- embed_client : CW/02/embed_client.embed_texts
+- post_embed   : embed_cache.post_embed（http_pool Session）
+- adaptive     : embed_batcher.AdaptiveBatcher + post_embed（自己決定批次大小，--batch 不用）
+
+    python embed_bench.py                                   # 自動起 stub（子行程，不吃本行程 CPU）
+    python embed_bench.py --lengths 30 300 1200 --concurrency 1 4 8 --csv bench.csv
+    python embed_bench.py --url http://127.0.0.1:8090/embed # 用已經開好的 stub / 其他服務
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import requests
+
+from embed_cache import post_embed
+
+CW02_DIR = Path(__file__).resolve().parents[1] / "CW" / "02"
+if str(CW02_DIR) not in sys.path:
+    sys.path.insert(0, str(CW02_DIR))
+
+import embed_client  # noqa: E402
+
+SHARED_DIR = Path(__file__).resolve().parents[2] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import http_pool  # noqa: E402
+from embed_batcher import AdaptiveBatcher  # noqa: E402
+
+try:
+    import psutil  # 有裝就量目前 RSS，沒有就用 getrusage 的峰值
+except ImportError:
+    psutil = None
+
+TASK_DESC = "檢索技術文件"
+CLIENTS = ["raw", "embed_client", "post_embed", "adaptive"]
+ENCODINGS = ["float", "base64"]
+
+FILLER = (
+    "檢索增強生成先用向量資料庫找出相關段落，再交給語言模型回答。"
+    "Qdrant stores dense vectors and supports HNSW approximate search. "
+    "切塊大小、重疊長度與 embedding 模型都會影響最後的檢索品質。"
+)
+
+EmbedCall = Callable[[List[str]], Any]
+
+
+def make_texts(n: int, length: int, tag: str) -> List[str]:
+    """n 段約 length 字元、彼此不同的文字（加上 tag，不同組之間也不重複，去重 / 快取不會影響結果）。"""
+    body = FILLER * (length // len(FILLER) + 2)
+    out = []
+    for i in range(n):
+        head = f"[{tag}-{i}] "
+        off = (i * 7) % len(FILLER)
+        out.append(head + body[off : off + max(length - len(head), 1)])
+    return out
+
+
+def rss_mb() -> float:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+
+
+def make_call(client: str, url: str) -> EmbedCall:
+    if client == "raw":
+        def call(batch: List[str]) -> Any:
+            r = requests.post(url, json={"texts": batch, "task_description": TASK_DESC, "normalize": True},
+                              timeout=60)
+            r.raise_for_status()
+            return r.json()["embeddings"]
+        return call
+    if client == "embed_client":
+        embed_client.API_URL = url
+        return lambda batch: embed_client.embed_texts(batch, task_description=TASK_DESC)
+    session = http_pool.get_session(retry=True)
+    return lambda batch: post_embed(session, url, TASK_DESC, batch)
+
+
+def run_one(client: str, url: str, texts: List[str], batch: int, concurrency: int) -> Dict[str, Any]:
+    call = make_call("post_embed" if client == "adaptive" else client, url)
+    lat: List[float] = []
+
+    def timed(b: List[str]) -> Any:
+        t0 = time.perf_counter()
+        out = call(b)
+        lat.append(time.perf_counter() - t0)  # list.append 在多執行緒下是安全的
+        return out
+
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    if client == "adaptive":
+        batcher = AdaptiveBatcher()
+        n = len(batcher.embed_all(texts, timed, workers=concurrency))
+    else:
+        batches = [texts[i : i + batch] for i in range(0, len(texts), batch)]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            n = sum(len(out) for out in pool.map(timed, batches))
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+
+    if n != len(texts):
+        raise RuntimeError(f"{client}: got {n} embeddings for {len(texts)} texts")
+    lat_ms = np.asarray(lat) * 1000
+    return {
+        "requests": len(lat),
+        "texts/s": len(texts) / wall,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "cpu_s": cpu,
+        "cpu%": cpu / wall * 100,
+        "rss_mb": rss_mb(),
+    }
+
+
+def sweep(
+    url: str,
+    clients: Sequence[str] = CLIENTS,
+    encodings: Sequence[str] = ENCODINGS,
+    batch_sizes: Sequence[int] = (16, 64),
+    concurrency: Sequence[int] = (1, 4),
+    lengths: Sequence[int] = (200,),
+    n: int = 256,
+) -> List[Dict[str, Any]]:
+    rows = []
+    run = 0
+    for client, enc, length, conc in itertools.product(clients, encodings, lengths, concurrency):
+        if client == "raw" and enc != "float":
+            continue  # raw 永遠是 JSON 小數
+        os.environ["EMBED_ENCODING"] = enc  # embed_wire 每次送出前讀
+        for batch in ([0] if client == "adaptive" else batch_sizes):
+            run += 1
+            texts = make_texts(n, length, f"r{run}")
+            row = {"client": client, "enc": enc, "batch": batch or "auto", "conc": conc, "len": length}
+            row.update(run_one(client, url, texts, batch, conc))
+            rows.append(row)
+            print_row(row, header=len(rows) == 1)
+    return rows
+
+
+COLUMNS = [("client", 13, "s"), ("enc", 7, "s"), ("batch", 6, "s"), ("conc", 5, "s"), ("len", 6, "s"),
+           ("requests", 9, "d"), ("texts/s", 9, ".1f"), ("p50_ms", 8, ".1f"), ("p95_ms", 8, ".1f"),
+           ("cpu_s", 7, ".2f"), ("cpu%", 6, ".0f"), ("rss_mb", 8, ".0f")]
+
+
+def print_row(row: Dict[str, Any], header: bool = False) -> None:
+    if header:
+        print("".join(f"{name:>{w}}" if i else f"{name:<{w}}" for i, (name, w, _) in enumerate(COLUMNS)))
+    cells = []
+    for i, (name, w, fmt) in enumerate(COLUMNS):
+        v = row[name]
+        cell = format(v, fmt) if fmt != "s" else str(v)
+        cells.append(f"{cell:>{w}}" if i else f"{cell:<{w}}")
+    print("".join(cells), flush=True)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(args: argparse.Namespace) -> subprocess.Popen:
+    """stub 跑在子行程：server 端的 JSON 編碼不算進 client 的 CPU。"""
+    cmd = [sys.executable, str(SHARED_DIR / "embed_stub.py"), "--port", str(args.port),
+           "--dim", str(args.dim), "--base-ms", str(args.base_ms), "--per-text-ms", str(args.per_text_ms),
+           "--per-kchar-ms", str(args.per_kchar_ms)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    health = f"http://127.0.0.1:{args.port}/health"
+    for _ in range(100):
+        try:
+            if requests.get(health, timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("embed stub did not start")
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Embedding client throughput benchmark against a local /embed stub")
+    ap.add_argument("--url", default=None, help="existing /embed URL (default: start HW/shared/embed_stub.py)")
+    ap.add_argument("--clients", nargs="+", default=CLIENTS, choices=CLIENTS)
+    ap.add_argument("--encodings", nargs="+", default=ENCODINGS, choices=ENCODINGS)
+    ap.add_argument("--batch", type=int, nargs="+", default=[16, 64], help="texts per request (fixed-size clients)")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="client threads")
+    ap.add_argument("--lengths", type=int, nargs="+", default=[200], help="approx chars per text")
+    ap.add_argument("--n", type=int, default=256, help="texts per run")
+    ap.add_argument("--csv", default=None, help="also write results to this CSV")
+    stub = ap.add_argument_group("stub (when --url is not given)")
+    stub.add_argument("--port", type=int, default=0, help="stub port (0 = pick a free one)")
+    stub.add_argument("--dim", type=int, default=4096)
+    stub.add_argument("--base-ms", type=float, default=20.0)
+    stub.add_argument("--per-text-ms", type=float, default=0.5)
+    stub.add_argument("--per-kchar-ms", type=float, default=1.0)
+    return ap
+
+
+def main() -> None:
+    args = build_argparser().parse_args()
+    proc: Optional[subprocess.Popen] = None
+    if args.url is None:
+        args.port = args.port or free_port()
+        proc = start_stub(args)
+        args.url = f"http://127.0.0.1:{args.port}/embed"
+    print(f"[INFO] bench {args.url}: n={args.n} per run, dim={args.dim if proc else '?'}")
+
+    try:
+        rows = sweep(args.url, args.clients, args.encodings, args.batch, args.concurrency, args.lengths, args.n)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    if args.csv:
+        with open(args.csv, "w", encoding="utf-8", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            w.writeheader()
+            w.writerows(rows)
+        print(f"[OK] wrote {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+embed_cache.py
+
+本地 embedding 快取（跨次執行保留），問題與 chunk 向量都可以放：
+- key = sha256(embed_url + task_description + normalize + text)，同一段文字只 embed 一次
+- 存法：<cache_dir>/keys.txt（一行一個 key）+ vectors.f32（float32 依序 append）
+  讀取時 np.fromfile 一次載入成 (n, dim) 矩陣
+
+    cache = EmbeddingCache("embed_cache", embed_url=EMBED_URL, task_desc=TASK_DESC)
+    vecs = cache.embed(texts, session=session)   # 只有快取沒有的才打 /embed
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import requests
+
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[2] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import embed_batcher  # noqa: E402
+import embed_dedup  # noqa: E402
+import embed_wire  # noqa: E402
+import http_pool  # noqa: E402
+
+EMBED_CACHE_DIR_DEFAULT = "embed_cache"
+EMBED_BATCH_SIZE = 0  # 0 = 依總字元數自動調整（embed_batcher）；> 0 = 固定每批筆數
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def post_embed(
+    session: requests.Session,
+    embed_url: str,
+    task_desc: str,
+    texts: List[str],
+    *,
+    normalize: bool = True,
+    timeout: int = 60,
+) -> np.ndarray:
+    """
+    One /embed request for a batch of texts -> (n, dim) float32 (base64 transport when the server supports it).
+    Duplicate texts are sent once, and texts already in flight on another thread are awaited instead of re-sent.
+    """
+
+    def post(batch: List[str]) -> np.ndarray:
+        payload = {"texts": batch, "task_description": task_desc, "normalize": normalize}
+        return embed_wire.post_embeddings(session.post, embed_url, payload, timeout=timeout)
+
+    return embed_dedup.embed_unique(texts, post, ns=(embed_url, task_desc, normalize))
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        cache_dir: str = EMBED_CACHE_DIR_DEFAULT,
+        *,
+        embed_url: str,
+        task_desc: str,
+        normalize: bool = True,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.embed_url = embed_url
+        self.task_desc = task_desc
+        self.normalize = normalize
+        self.batcher = embed_batcher.AdaptiveBatcher()
+
+        self._keys_path = os.path.join(cache_dir, "keys.txt")
+        self._vecs_path = os.path.join(cache_dir, "vectors.f32")
+        self._meta_path = os.path.join(cache_dir, "meta.json")
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        # append 時只把新的一塊放進 list，get_many 需要時才合併成一個矩陣（避免每批都複製整個矩陣）
+        self._blocks: List[np.ndarray] = []
+        self.dim: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    # -----------------------------
+    # storage
+    # -----------------------------
+    def _load(self) -> None:
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.dim = int(json.load(f)["dim"])
+        with open(self._keys_path, "r", encoding="utf-8") as f:
+            keys = [ln.strip() for ln in f if ln.strip()]
+
+        vecs = np.fromfile(self._vecs_path, dtype=np.float32)
+        n = min(len(keys), vecs.size // self.dim)  # 寫到一半中斷：以兩邊都完整的筆數為準
+        if vecs.size != n * self.dim:
+            # 把多出來的半筆向量切掉，之後 append 才會對齊
+            os.truncate(self._vecs_path, n * self.dim * 4)
+        if len(keys) != n:
+            with open(self._keys_path, "w", encoding="utf-8") as f:
+                f.write("".join(k + "\n" for k in keys[:n]))
+        self._blocks = [vecs[: n * self.dim].reshape(n, self.dim)]
+        self._index = {k: i for i, k in enumerate(keys[:n])}
+
+    def _append(self, keys: List[str], vecs: np.ndarray) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self.dim is None:
+            self.dim = int(vecs.shape[1])
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim}, f)
+        elif vecs.shape[1] != self.dim:
+            raise ValueError(f"Embedding dim mismatch: got {vecs.shape[1]}, cache has {self.dim}")
+
+        # 先寫向量再寫 key：中斷時多出來的向量沒有 key，載入時會被切掉
+        with open(self._vecs_path, "ab") as f:
+            f.write(np.ascontiguousarray(vecs, dtype=np.float32).tobytes())
+        with open(self._keys_path, "a", encoding="utf-8") as f:
+            f.write("".join(k + "\n" for k in keys))
+
+        start = len(self._index)
+        self._blocks.append(np.asarray(vecs, dtype=np.float32))
+        for i, k in enumerate(keys):
+            self._index[k] = start + i
+
+    def _matrix(self) -> np.ndarray:
+        """所有快取向量的 (n, dim) 矩陣；累積的區塊在這裡一次合併（呼叫端持有 self._lock）。"""
+        if len(self._blocks) > 1:
+            self._blocks = [np.concatenate(self._blocks)]
+        return self._blocks[0] if self._blocks else np.zeros((0, self.dim or 0), dtype=np.float32)
+
+    # -----------------------------
+    # public API
+    # -----------------------------
+    def key(self, text: str) -> str:
+        raw = f"{self.embed_url}\n{self.task_desc}\n{self.normalize}\n{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def missing(self, texts: Sequence[str]) -> List[str]:
+        """Unique texts that are not cached yet (original order)."""
+        seen = set()
+        out: List[str] = []
+        with self._lock:
+            for t in texts:
+                k = self.key(t)
+                if k in self._index or k in seen:
+                    continue
+                seen.add(k)
+                out.append(t)
+        return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        if len(texts) != len(vectors):
+            raise ValueError("texts and vectors length mismatch")
+        if not texts:
+            return
+        arr = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            keys, rows, seen = [], [], set()
+            for i, t in enumerate(texts):
+                k = self.key(t)
+                if k in self._index or k in seen:
+                    continue
+                seen.add(k)
+                keys.append(k)
+                rows.append(i)
+            if keys:
+                self._append(keys, arr[rows])
+
+    def get_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Return (len(texts), dim) float32 matrix; every text must already be cached."""
+        with self._lock:
+            idx = []
+            for t in texts:
+                i = self._index.get(self.key(t))
+                if i is None:
+                    raise KeyError(f"text not in embedding cache: {t[:40]!r}")
+                idx.append(i)
+            return self._matrix()[idx]
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        *,
+        embed_fn: Optional[EmbedFn] = None,
+        session: Optional[requests.Session] = None,
+        batch_size: int = EMBED_BATCH_SIZE,
+        workers: int = 1,
+    ) -> np.ndarray:
+        """
+        Embed texts through the cache; only uncached unique texts hit the API (batches run concurrently if workers > 1).
+        batch_size <= 0: batches sized by total chars and adapted to latency / errors (self.batcher).
+        """
+        todo = self.missing(texts)
+        self.misses += len(todo)
+        self.hits += len(texts) - len(todo)
+
+        if todo:
+            if embed_fn is None:
+                sess = session or http_pool.get_session(retry=True)
+                embed_fn = lambda batch: post_embed(  # noqa: E731
+                    sess, self.embed_url, self.task_desc, batch, normalize=self.normalize
+                )
+            if batch_size <= 0:
+                # 每批成功就寫進快取，中途失敗也不會丟掉已 embed 的部分
+                self.batcher.embed_all(todo, embed_fn, workers=workers, on_batch=self.put_many)
+                return self.get_many(texts)
+
+            batches = [todo[i : i + batch_size] for i in range(0, len(todo), batch_size)]
+            if workers > 1 and len(batches) > 1:
+                with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+                    for batch, vecs in zip(batches, pool.map(embed_fn, batches)):
+                        self.put_many(batch, vecs)
+            else:
+                for batch in batches:
+                    self.put_many(batch, embed_fn(batch))
+
+        return self.get_many(texts)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def summary(self) -> str:
+        return f"embed cache: hits={self.hits} misses={self.misses} entries={len(self)} ({self.cache_dir})"
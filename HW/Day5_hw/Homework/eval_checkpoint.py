@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+eval_checkpoint.py
+
+評分結果的 checkpoint（JSONL，一列一筆 (q_id, method) 結果）：
+- 每算完一筆就 append + flush，跑到一半掛掉也不會丟掉已完成的 embed / search / score
+- 重跑時讀回來，已完成的 (q_id, method) 直接跳過
+- 最後的 CSV 由 checkpoint 依題目順序組出來
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+RowKey = Tuple[int, str]
+
+
+class EvalCheckpoint:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._rows: Dict[RowKey, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        self.loaded = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        self._truncate_partial_tail()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    # 壞掉的列丟掉重算即可
+                    continue
+                self._rows[(int(row["q_id"]), str(row["method"]))] = row
+        self.loaded = len(self._rows)
+
+    def _truncate_partial_tail(self) -> None:
+        # 上次寫到一半被中斷：最後一列沒有換行，先切掉，否則下一筆 append 會黏在同一列
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if not data or data.endswith(b"\n"):
+                return
+            f.truncate(data.rfind(b"\n") + 1)
+
+    def is_done(self, q_id: int, method: str) -> bool:
+        return (int(q_id), method) in self._rows
+
+    def append(self, row: Dict[str, object]) -> None:
+        """Persist one finished row immediately (thread-safe)."""
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._rows[(int(row["q_id"]), str(row["method"]))] = row
+
+    def rows_in_order(self, keys: Iterable[RowKey]) -> Tuple[List[Dict[str, object]], List[RowKey]]:
+        """Return (rows found in checkpoint, missing keys) following the given key order."""
+        rows: List[Dict[str, object]] = []
+        missing: List[RowKey] = []
+        for key in keys:
+            row = self._rows.get(key)
+            if row is None:
+                missing.append(key)
+            else:
+                rows.append(row)
+        return rows, missing
+
+    def reset(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._rows.clear()
+            self.loaded = 0
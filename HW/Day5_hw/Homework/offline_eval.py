@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+offline_eval.py
+
+本地檢索品質評估（不打評分 API、不需要 Qdrant）：
+- 問題與 chunk 向量都從 embed_cache 取（第一次會補 embed，之後完全離線）
+- 每個方法只做一次 NumPy 矩陣乘法：(問題數 × dim) @ (dim × chunk 數)
+- 對照 questions.csv 的 answer / source 欄位計算：
+    recall@k   : top-k 內有來自正確 source 的 chunk 的比例
+    MRR        : 第一個正確 source chunk 的排名倒數平均
+    ans@k      : top-k chunk 對 answer 的字元 bigram 覆蓋率（取最高）
+
+    python offline_eval.py --questions questions.csv --k 1 3 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embed_cache import EMBED_CACHE_DIR_DEFAULT, EmbeddingCache
+
+EMBED_URL_DEFAULT = "https://ws-04.wade0426.me/embed"
+TASK_DESC_DEFAULT = "檢索技術文件"
+
+# collection 名稱 -> 切塊結果檔（與 day5_index_qdrant.py 對應）
+METHOD_CHUNKS: List[Tuple[str, str]] = [
+    ("day5_fixed", "chunks_fixed.jsonl"),
+    ("day5_sliding", "chunks_sliding.jsonl"),
+    ("day5_semantic", "chunks_semantic.jsonl"),
+]
+
+K_DEFAULT = [1, 3, 5]
+
+
+@dataclass
+class LabeledQuestion:
+    q_id: int
+    question: str
+    answer: str
+    sources: List[str]  # 可能有多個來源，用 , ; | 分隔
+
+
+def _split_sources(raw: str) -> List[str]:
+    return [os.path.basename(s.strip()) for s in re.split(r"[,;|、]", raw or "") if s.strip()]
+
+
+def load_labeled_questions(path: str) -> List[LabeledQuestion]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        items: List[LabeledQuestion] = []
+        for row in reader:
+            row = {(k or "").strip(): (v or "") for k, v in row.items()}
+            qid_raw = row.get("q_id") or row.get("id") or ""
+            qtext = row.get("questions", "").strip()
+            if not qtext:
+                continue
+            items.append(
+                LabeledQuestion(
+                    q_id=int(qid_raw),
+                    question=qtext,
+                    answer=row.get("answer", "").strip(),
+                    sources=_split_sources(row.get("source", "")),
+                )
+            )
+    return items
+
+
+def load_chunks(path: str) -> List[Dict[str, object]]:
+    chunks = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            ch = json.loads(line)
+            if str(ch.get("text", "")).strip():
+                chunks.append(ch)
+    return chunks
+
+
+# -----------------------------
+# metrics
+# -----------------------------
+def _bigrams(s: str) -> set:
+    s = re.sub(r"\s+", "", s)
+    if len(s) < 2:
+        return {s} if s else set()
+    return {s[i : i + 2] for i in range(len(s) - 1)}
+
+
+def answer_overlap(answer: str, text: str) -> float:
+    """Fraction of the answer's character bigrams that appear in the chunk text."""
+    a = _bigrams(answer)
+    if not a:
+        return 0.0
+    return len(a & _bigrams(text)) / len(a)
+
+
+def evaluate_method(
+    q_vecs: np.ndarray,
+    questions: Sequence[LabeledQuestion],
+    c_vecs: np.ndarray,
+    chunks: Sequence[Dict[str, object]],
+    ks: Sequence[int],
+) -> Dict[str, float]:
+    t0 = time.perf_counter()
+    sims = q_vecs @ c_vecs.T  # 一次算完整個 問題 × chunk 相似度矩陣
+
+    chunk_sources = np.array([os.path.basename(str(c.get("source", ""))) for c in chunks])
+    # MRR 看完整排名：對每題把所有 chunk 依分數排序
+    ranking = np.argsort(-sims, axis=1)
+    topk = ranking[:, : max(ks)]
+
+    out: Dict[str, float] = {"n_chunks": float(len(chunks))}
+    src_rows = [i for i, q in enumerate(questions) if q.sources]
+    ans_rows = [i for i, q in enumerate(questions) if q.answer]
+
+    if src_rows:
+        rel = np.stack([np.isin(chunk_sources[ranking[i]], questions[i].sources) for i in src_rows])
+        first = np.where(rel.any(axis=1), rel.argmax(axis=1) + 1, 0)
+        for k in ks:
+            out[f"recall@{k}"] = float(np.mean(rel[:, :k].any(axis=1)))
+        out["MRR"] = float(np.mean(np.where(first > 0, 1.0 / np.maximum(first, 1), 0.0)))
+
+    if ans_rows:
+        for k in ks:
+            scores = [
+                max(answer_overlap(questions[i].answer, str(chunks[j]["text"])) for j in topk[i, :k])
+                for i in ans_rows
+            ]
+            out[f"ans@{k}"] = float(np.mean(scores))
+
+    out["ms"] = (time.perf_counter() - t0) * 1000
+    return out
+
+
+def print_report(results: Dict[str, Dict[str, float]], ks: Sequence[int]) -> None:
+    cols = ["n_chunks"] + [f"recall@{k}" for k in ks] + ["MRR"] + [f"ans@{k}" for k in ks] + ["ms"]
+    print(f"{'method':<16}" + "".join(f"{c:>11}" for c in cols))
+    print("-" * (16 + 11 * len(cols)))
+    for method, m in results.items():
+        cells = []
+        for c in cols:
+            v = m.get(c)
+            if v is None:
+                cells.append(f"{'-':>11}")
+            elif c == "n_chunks":
+                cells.append(f"{int(v):>11}")
+            else:
+                cells.append(f"{v:>11.3f}" if c != "ms" else f"{v:>11.1f}")
+        print(f"{method:<16}" + "".join(cells))
+
+
+def run_offline_eval(
+    questions_csv: str,
+    method_chunks: Sequence[Tuple[str, str]],
+    cache: EmbeddingCache,
+    ks: Sequence[int] = K_DEFAULT,
+) -> Dict[str, Dict[str, float]]:
+    questions = load_labeled_questions(questions_csv)
+    n_src = sum(bool(q.sources) for q in questions)
+    n_ans = sum(bool(q.answer) for q in questions)
+    print(f"[INFO] questions={len(questions)} (with source={n_src}, with answer={n_ans})")
+    if not n_src and not n_ans:
+        print("[WARN] questions.csv 的 answer / source 欄位都是空的，無法計算指標")
+
+    q_vecs = cache.embed([q.question for q in questions])
+
+    results: Dict[str, Dict[str, float]] = {}
+    for method, path in method_chunks:
+        if not os.path.exists(path):
+            print(f"[WARN] skip {method}: {path} not found")
+            continue
+        chunks = load_chunks(path)
+        c_vecs = cache.embed([str(c["text"]) for c in chunks])
+        results[method] = evaluate_method(q_vecs, questions, c_vecs, chunks, ks)
+
+    print(f"[INFO] {cache.summary()}")
+    return results
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Day5 RAG HW01 - offline retrieval metrics (recall@k / MRR)")
+    ap.add_argument("--questions", default="questions.csv", help="questions.csv path (needs answer/source)")
+    ap.add_argument("--k", type=int, nargs="+", default=K_DEFAULT, help="k values for recall@k / ans@k")
+    ap.add_argument("--embed-cache", default=EMBED_CACHE_DIR_DEFAULT, help="embedding cache directory")
+    ap.add_argument("--embed-url", default=EMBED_URL_DEFAULT, help="Embedding API URL (only for cache misses)")
+    ap.add_argument("--task-desc", default=TASK_DESC_DEFAULT, help="Embedding task_description")
+    ap.add_argument(
+        "--method",
+        nargs=2,
+        action="append",
+        metavar=("NAME", "JSONL"),
+        help="extra/override method: name + chunk jsonl (default: day5_fixed/sliding/semantic)",
+    )
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_argparser().parse_args(argv)
+    cache = EmbeddingCache(args.embed_cache, embed_url=args.embed_url, task_desc=args.task_desc)
+    method_chunks = [tuple(m) for m in args.method] if args.method else METHOD_CHUNKS
+    ks = sorted(set(args.k))
+
+    results = run_offline_eval(args.questions, method_chunks, cache, ks)
+    print_report(results, ks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+rate_limit.py
+
+Thread-safe token bucket，給 concurrent runner 對每個 endpoint（embed / score）各自限流。
+
+    bucket = TokenBucket(rate=5, capacity=5)   # 平均每秒 5 次，最多瞬間爆發 5 次
+    bucket.acquire()                           # 拿不到 token 就睡到拿得到為止
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        # rate <= 0 代表不限流
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.waited_sec = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; return seconds spent waiting."""
+        if self.rate <= 0:
+            self.acquired += 1
+            return 0.0
+        if tokens > self.capacity:
+            # 桶子永遠裝不到這麼多，等下去只會卡死
+            raise ValueError(f"tokens={tokens} exceeds bucket capacity={self.capacity}")
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.acquired += 1
+                    self.waited_sec += waited
+                    return waited
+                need = (tokens - self._tokens) / self.rate
+            time.sleep(need)
+            waited += need
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate": self.rate,
+            "acquired": self.acquired,
+            "waited_sec": round(self.waited_sec, 3),
+        }
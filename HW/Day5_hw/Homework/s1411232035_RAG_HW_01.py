@@ -10,8 +10,27 @@ s1411232035_RAG_HW_01.py (Qdrant retrieval version)
     - Submit retrieve_text to scoring API
     - Write 60 rows CSV (utf-8-sig)
 
+Concurrent mode (--workers > 1):
+    - Questions run in a thread pool; embed / score calls each go through
+      their own token bucket (--embed-rps / --score-rps)
+    - Output rows keep the original (question, method) order
+
+Checkpoint (--checkpoint, default <out>.checkpoint.jsonl):
+    - Every finished (q_id, method) row is appended to the checkpoint JSONL
+    - Re-running skips pairs that are already scored (--fresh to start over)
+    - The final CSV is assembled from the checkpoint
+
+Question embeddings:
+    - All questions still to be scored are embedded up front in batched /embed
+      requests (--embed-batch, concurrent in --workers mode)
+    - Vectors persist in --embed-cache, so a re-run makes zero embed calls
+
+Score cache (--score-cache, default score_cache.jsonl):
+    - score_api results keyed by (score_url, q_id, sha256(retrieve_text))
+    - Looked up before every scoring call; hit rate is printed at the end
+
 Prereqs:
-    pip install qdrant-client requests pandas
+    pip install qdrant-client requests numpy
 
 Qdrant collections should already be indexed:
     day5_fixed / day5_sliding / day5_semantic
@@ -21,16 +40,30 @@ from __future__ import annotations
 
 import argparse
 import csv
-import json
+import sys
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
-import pandas as pd
 import requests
 from qdrant_client import QdrantClient
 
+from embed_cache import EMBED_BATCH_SIZE, EMBED_CACHE_DIR_DEFAULT, EmbeddingCache, post_embed
+from eval_checkpoint import EvalCheckpoint
+from rate_limit import TokenBucket
+from score_cache import SCORE_CACHE_FILE_DEFAULT, ScoreCache
+
+# 共用 HTTP client（連線池 / 重試 / 延遲統計）放在 HW/shared
+SHARED_DIR = Path(__file__).resolve().parents[2] / "shared"
+if str(SHARED_DIR) not in sys.path:
+    sys.path.insert(0, str(SHARED_DIR))
+
+import embed_dedup  # noqa: E402
+import http_pool  # noqa: E402
+
 
 # ====== APIs ======
 SCORE_URL_DEFAULT = "https://hw-01.wade0426.me/submit_answer"
@@ -46,6 +79,13 @@ METHODS: List[Tuple[str, str]] = [
     ("語意切塊", "day5_semantic"),
 ]
 
+# ====== Concurrent runner ======
+WORKERS_DEFAULT = 1  # 預設維持原本的逐題循序；--workers N 才開併發
+EMBED_RPS_DEFAULT = 5.0
+SCORE_RPS_DEFAULT = 5.0
+
+OUT_FIELDS = ["id", "q_id", "method", "retrieve_text", "score", "source"]
+
 
 @dataclass
 class QuestionItem:
@@ -56,50 +96,42 @@ class QuestionItem:
 def _safe_str(x) -> str:
     if x is None:
         return ""
-    try:
-        if pd.isna(x):
-            return ""
-    except Exception:
-        pass
     return str(x)
 
 
-def load_questions_csv(path: str) -> List[QuestionItem]:
+def iter_questions_csv(path: str) -> Iterator[QuestionItem]:
+    """Stream QuestionItems from questions.csv with the stdlib csv module (no pandas import)."""
     # 作業常見 utf-8-sig（有 BOM），用這個最保險
-    df = pd.read_csv(path, encoding="utf-8-sig")
-    df.columns = df.columns.str.strip()
-
-    # 你的欄位目前是：q_id, questions, answer, source
-    # 兼容少數同學的欄位：id -> q_id
-    if "q_id" not in df.columns and "id" in df.columns:
-        df = df.rename(columns={"id": "q_id"})
-    if "questions" not in df.columns:
-        raise KeyError(f"questions.csv 找不到欄位 'questions'，目前欄位={df.columns.tolist()}")
-
-    items: List[QuestionItem] = []
-    for _, row in df.iterrows():
-        qid_raw = row.get("q_id", "")
-        qid = int(qid_raw)
-        qtext = _safe_str(row.get("questions", "")).strip()
-        if qtext:
-            items.append(QuestionItem(q_id=qid, question=qtext))
-    return items
-
-
-def make_requests_session() -> requests.Session:
-    s = requests.Session()
-    # 可視需要加 headers（目前 API 不要求）
-    return s
-
-
-def embed_one(session: requests.Session, embed_url: str, task_desc: str, text: str, timeout: int = 60) -> List[float]:
-    payload = {"texts": [text], "task_description": task_desc, "normalize": True}
-    r = session.post(embed_url, json=payload, timeout=timeout)
-    r.raise_for_status()
-    data = r.json()
-    if "embeddings" not in data:
-        raise ValueError(f"embed API 回傳沒有 embeddings：{data}")
-    return data["embeddings"][0]
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+
+        # 你的欄位目前是：q_id, questions, answer, source
+        # 兼容少數同學的欄位：id -> q_id
+        if "q_id" not in header and "id" in header:
+            header = ["q_id" if h == "id" else h for h in header]
+        if "questions" not in header:
+            raise KeyError(f"questions.csv 找不到欄位 'questions'，目前欄位={header}")
+        qid_col = header.index("q_id")
+        q_col = header.index("questions")
+
+        for row in reader:
+            if len(row) <= max(qid_col, q_col):
+                continue
+            qtext = _safe_str(row[q_col]).strip()
+            if qtext:
+                yield QuestionItem(q_id=int(float(row[qid_col])), question=qtext)
+
+
+def load_questions_csv(path: str) -> List[QuestionItem]:
+    return list(iter_questions_csv(path))
+
+
+def make_requests_session(retry: bool = True, workers: int = 1) -> requests.Session:
+    # 全部共用 HW/shared/http_pool 的 Session：每個 host 一個連線池（至少 workers 條），並記錄各 host 延遲。
+    # retry=True 給 embed（冪等，5xx / 逾時也重送）；評分會記分，用 retry=False 只重試連線失敗與 429
+    http_pool.ensure_pool_size(workers)
+    return http_pool.get_session(retry=retry)
 
 
 def score_api(session: requests.Session, score_url: str, q_id: int, student_answer: str, timeout: int = 60) -> float:
@@ -117,6 +149,54 @@ def score_api(session: requests.Session, score_url: str, q_id: int, student_answ
     raise ValueError(f"score API 回傳格式看不到 score：{data}")
 
 
+def embed_questions(
+    session: requests.Session,
+    embed_url: str,
+    task_desc: str,
+    questions: List[QuestionItem],
+    *,
+    cache_dir: str = EMBED_CACHE_DIR_DEFAULT,
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = 1,
+    bucket: Optional[TokenBucket] = None,
+    sleep_sec: float = 0.0,
+) -> Dict[int, List[float]]:
+    """
+    Embed all questions up front in batches; vectors persist in the embedding cache between runs.
+    Questions that still fail to embed are reported and left out of the result (the caller skips them).
+    """
+    cache = EmbeddingCache(cache_dir, embed_url=embed_url, task_desc=task_desc)
+    texts = [qi.question for qi in questions]
+    calls: List[int] = []
+
+    def embed_fn(batch: List[str]) -> Sequence[Sequence[float]]:
+        calls.append(len(batch))
+        if bucket is not None:
+            bucket.acquire()
+        vecs = post_embed(session, embed_url, task_desc, batch)
+        if sleep_sec:
+            time.sleep(sleep_sec)
+        return vecs
+
+    qid_to_vec: Dict[int, List[float]] = {}
+    try:
+        vecs = cache.embed(texts, embed_fn=embed_fn, batch_size=batch_size, workers=workers)
+        qid_to_vec = {qi.q_id: vecs[i].tolist() for i, qi in enumerate(questions)}
+    except Exception as e:
+        # 成功的批次已經寫進快取；剩下的逐題重送，單題失敗只跳過那一題，重跑時會接續
+        print(f"[WARN] batched question embedding failed ({e}); retrying one question at a time")
+        for qi in questions:
+            try:
+                qid_to_vec[qi.q_id] = cache.embed([qi.question], embed_fn=embed_fn, batch_size=1)[0].tolist()
+            except Exception as e1:
+                print(f"[WARN] q_id={qi.q_id} embed failed: {e1}")
+
+    print(f"[INFO] question embeddings: {len(texts)} questions, {len(calls)} /embed requests ({cache.summary()})")
+    if cache.batcher.history:
+        print(cache.batcher.report())
+    return qid_to_vec
+
+
 def qdrant_search_top1(client, collection: str, query_vector):
     # 新版：client.search(...)
     if hasattr(client, "search"):
@@ -163,6 +243,42 @@ def qdrant_search_top1(client, collection: str, query_vector):
     raise RuntimeError("你的 qdrant-client 版本沒有 search/search_points/query_points，請升級 qdrant-client。")
 
 
+def make_row(q_id: int, method_name: str, retrieve_text: str, score: float, source: str) -> Dict[str, object]:
+    return {
+        "id": str(uuid.uuid4()),
+        "q_id": q_id,
+        "method": method_name,
+        "retrieve_text": retrieve_text,
+        "score": score,
+        "source": source,
+    }
+
+
+def write_out_csv(out_csv: str, out_rows: List[Dict[str, object]]) -> None:
+    # 輸出 utf-8-sig（Excel 不亂碼）
+    with open(out_csv, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=OUT_FIELDS)
+        writer.writeheader()
+        writer.writerows(out_rows)
+
+
+def open_checkpoint(out_csv: str, checkpoint_path: str = "", fresh: bool = False) -> EvalCheckpoint:
+    path = checkpoint_path or f"{out_csv}.checkpoint.jsonl"
+    ckpt = EvalCheckpoint(path)
+    if fresh:
+        ckpt.reset()
+    print(f"[INFO] checkpoint: {path} (already scored: {ckpt.loaded})")
+    return ckpt
+
+
+def finalize_from_checkpoint(ckpt: EvalCheckpoint, questions: List[QuestionItem], out_csv: str) -> None:
+    keys = [(qi.q_id, method_name) for qi in questions for method_name, _ in METHODS]
+    out_rows, missing = ckpt.rows_in_order(keys)
+    write_out_csv(out_csv, out_rows)
+    if missing:
+        print(f"[WARN] {len(missing)} rows not scored yet (re-run to resume): {missing[:5]}")
+    print(f"[DONE] rows={len(out_rows)} -> {out_csv}")
+
 
 def run(
     questions_csv: str,
@@ -173,57 +289,147 @@ def run(
     task_desc: str,
     top_k: int = 1,  # 目前作業只需要 top-1
     sleep_sec: float = 0.0,  # 避免 API 被打太快
+    checkpoint_path: str = "",
+    fresh: bool = False,
+    score_cache: Optional[ScoreCache] = None,
+    embed_cache_dir: str = EMBED_CACHE_DIR_DEFAULT,
+    embed_batch: int = EMBED_BATCH_SIZE,
 ) -> None:
     if top_k != 1:
         raise ValueError("此作業流程預設 top_k=1（只取 top-1 chunk）。")
 
     questions = load_questions_csv(questions_csv)
     print(f"[INFO] loaded questions: {len(questions)} from {questions_csv}")
+    ckpt = open_checkpoint(out_csv, checkpoint_path, fresh)
+    score_cache = score_cache or ScoreCache(enabled=False)
 
     session = make_requests_session()
+    score_session = make_requests_session(retry=False)
     qdrant = QdrantClient(url=qdrant_url)
 
-    # 小優化：同一題的 embedding 三個 method 共用（省 2 次 embed 呼叫）
-    qid_to_vec: Dict[int, List[float]] = {}
-
-    out_rows: List[Dict[str, object]] = []
-    for qi in questions:
-        if qi.q_id not in qid_to_vec:
-            qid_to_vec[qi.q_id] = embed_one(session, embed_url, task_desc, qi.question)
-            if sleep_sec:
-                time.sleep(sleep_sec)
+    # 三個 method 都在 checkpoint 裡的題目，連 embedding 都不用算
+    pending = [qi for qi in questions if not all(ckpt.is_done(qi.q_id, m) for m, _ in METHODS)]
+    # 一次把所有題目批次 embed 完（同一題的向量三個 method 共用）
+    qid_to_vec = embed_questions(
+        session,
+        embed_url,
+        task_desc,
+        pending,
+        cache_dir=embed_cache_dir,
+        batch_size=embed_batch,
+        sleep_sec=sleep_sec,
+    )
 
-        q_vec = qid_to_vec[qi.q_id]
+    for qi in pending:
+        q_vec = qid_to_vec.get(qi.q_id)
+        if q_vec is None:
+            continue  # embed 失敗（上面已印 WARN），這題留到重跑
+        todo = [(m, c) for m, c in METHODS if not ckpt.is_done(qi.q_id, m)]
 
-        for method_name, collection in METHODS:
+        for method_name, collection in todo:
             retrieve_text, source = qdrant_search_top1(qdrant, collection, q_vec)
 
             # 如果真的搜不到（理論上不會），給一個最小字串避免 API 失敗
             if not retrieve_text.strip():
                 retrieve_text = "（空）"
 
-            score = score_api(session, score_url, qi.q_id, retrieve_text)
-            if sleep_sec:
-                time.sleep(sleep_sec)
-
-            out_rows.append(
-                {
-                    "id": str(uuid.uuid4()),
-                    "q_id": qi.q_id,
-                    "method": method_name,
-                    "retrieve_text": retrieve_text,
-                    "score": score,
-                    "source": source,
-                }
-            )
+            score = score_cache.get(score_url, qi.q_id, retrieve_text)
+            if score is None:
+                score = score_api(score_session, score_url, qi.q_id, retrieve_text)
+                score_cache.put(score_url, qi.q_id, retrieve_text, score)
+                if sleep_sec:
+                    time.sleep(sleep_sec)
 
-    # 輸出 utf-8-sig（Excel 不亂碼）
-    with open(out_csv, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=["id", "q_id", "method", "retrieve_text", "score", "source"])
-        writer.writeheader()
-        writer.writerows(out_rows)
+            ckpt.append(make_row(qi.q_id, method_name, retrieve_text, score, source))
 
-    print(f"[DONE] rows={len(out_rows)} -> {out_csv}")
+    print(f"[INFO] {score_cache.summary()}")
+    embed_dedup.print_stats()
+    http_pool.print_stats()
+    finalize_from_checkpoint(ckpt, questions, out_csv)
+
+
+def run_concurrent(
+    questions_csv: str,
+    out_csv: str,
+    qdrant_url: str,
+    embed_url: str,
+    score_url: str,
+    task_desc: str,
+    workers: int = WORKERS_DEFAULT,
+    embed_rps: float = EMBED_RPS_DEFAULT,
+    score_rps: float = SCORE_RPS_DEFAULT,
+    checkpoint_path: str = "",
+    fresh: bool = False,
+    score_cache: Optional[ScoreCache] = None,
+    embed_cache_dir: str = EMBED_CACHE_DIR_DEFAULT,
+    embed_batch: int = EMBED_BATCH_SIZE,
+) -> None:
+    """
+    Thread-pool version of run(): questions are batch-embedded first, then each
+    question (3 searches -> 3 scores) is one task; embed / score endpoints are
+    rate-limited by separate token buckets.
+    """
+    questions = load_questions_csv(questions_csv)
+    print(f"[INFO] loaded questions: {len(questions)} from {questions_csv}")
+    print(f"[INFO] concurrent: workers={workers} embed_rps={embed_rps} score_rps={score_rps}")
+    ckpt = open_checkpoint(out_csv, checkpoint_path, fresh)
+    score_cache = score_cache or ScoreCache(enabled=False)
+
+    session = make_requests_session(workers=workers)
+    score_session = make_requests_session(retry=False, workers=workers)
+    qdrant = QdrantClient(url=qdrant_url)
+    embed_bucket = TokenBucket(rate=embed_rps)
+    score_bucket = TokenBucket(rate=score_rps)
+
+    t0 = time.perf_counter()
+    pending = [qi for qi in questions if not all(ckpt.is_done(qi.q_id, m) for m, _ in METHODS)]
+    qid_to_vec = embed_questions(
+        session,
+        embed_url,
+        task_desc,
+        pending,
+        cache_dir=embed_cache_dir,
+        batch_size=embed_batch,
+        workers=workers,
+        bucket=embed_bucket,
+    )
+
+    def eval_question(qi: QuestionItem) -> None:
+        q_vec = qid_to_vec.get(qi.q_id)
+        if q_vec is None:
+            raise RuntimeError("question embedding failed")
+        todo = [(m, c) for m, c in METHODS if not ckpt.is_done(qi.q_id, m)]
+
+        for method_name, collection in todo:
+            retrieve_text, source = qdrant_search_top1(qdrant, collection, q_vec)
+            if not retrieve_text.strip():
+                retrieve_text = "（空）"
+
+            score = score_cache.get(score_url, qi.q_id, retrieve_text)
+            if score is None:
+                score_bucket.acquire()
+                score = score_api(score_session, score_url, qi.q_id, retrieve_text)
+                score_cache.put(score_url, qi.q_id, retrieve_text, score)
+            ckpt.append(make_row(qi.q_id, method_name, retrieve_text, score, source))
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(eval_question, qi) for qi in pending]
+        for qi, fut in zip(pending, futures):
+            try:
+                fut.result()
+            except Exception as e:
+                # 單題失敗不影響其他題；已完成的都在 checkpoint，重跑會接續
+                failed += 1
+                print(f"[WARN] q_id={qi.q_id} failed: {e}")
+    elapsed = time.perf_counter() - t0
+
+    print(f"[INFO] elapsed={elapsed:.2f}s embed={embed_bucket.stats()} score={score_bucket.stats()} failed={failed}")
+    print(f"[INFO] {score_cache.summary()}")
+    embed_dedup.print_stats()
+    http_pool.print_stats()
+    # 輸出列順序依題目 × METHODS，與原本 run() 相同
+    finalize_from_checkpoint(ckpt, questions, out_csv)
 
 
 def build_argparser() -> argparse.ArgumentParser:
@@ -234,13 +440,42 @@ def build_argparser() -> argparse.ArgumentParser:
     ap.add_argument("--embed-url", default=EMBED_URL_DEFAULT, help="Embedding API URL")
     ap.add_argument("--score-url", default=SCORE_URL_DEFAULT, help="Scoring API URL")
     ap.add_argument("--task-desc", default=TASK_DESC_DEFAULT, help="Embedding task_description")
-    ap.add_argument("--sleep", type=float, default=0.0, help="sleep seconds between API calls (avoid rate limit)")
+    ap.add_argument("--sleep", type=float, default=0.0, help="sleep seconds after each embed / score API call (sequential mode only)")
+    ap.add_argument("--workers", type=int, default=WORKERS_DEFAULT, help="concurrent questions (default 1 = original sequential run)")
+    ap.add_argument("--embed-rps", type=float, default=EMBED_RPS_DEFAULT, help="embed API requests/sec (<=0: unlimited)")
+    ap.add_argument("--score-rps", type=float, default=SCORE_RPS_DEFAULT, help="score API requests/sec (<=0: unlimited)")
+    ap.add_argument("--checkpoint", default="", help="checkpoint JSONL path (default: <out>.checkpoint.jsonl)")
+    ap.add_argument("--fresh", action="store_true", help="ignore existing checkpoint and start over")
+    ap.add_argument("--embed-cache", default=EMBED_CACHE_DIR_DEFAULT, help="question embedding cache directory")
+    ap.add_argument("--embed-batch", type=int, default=EMBED_BATCH_SIZE, help="questions per /embed request (0 = adaptive by total chars)")
+    ap.add_argument("--score-cache", default=SCORE_CACHE_FILE_DEFAULT, help="score API cache file (JSONL, append-only)")
+    ap.add_argument("--no-score-cache", action="store_true", help="always call the score API")
     return ap
 
 
 def main():
     ap = build_argparser()
     args = ap.parse_args()
+    score_cache = ScoreCache(args.score_cache, enabled=not args.no_score_cache)
+
+    if args.workers > 1:
+        run_concurrent(
+            questions_csv=args.questions,
+            out_csv=args.out,
+            qdrant_url=args.qdrant_url,
+            embed_url=args.embed_url,
+            score_url=args.score_url,
+            task_desc=args.task_desc,
+            workers=args.workers,
+            embed_rps=args.embed_rps,
+            score_rps=args.score_rps,
+            checkpoint_path=args.checkpoint,
+            fresh=args.fresh,
+            score_cache=score_cache,
+            embed_cache_dir=args.embed_cache,
+            embed_batch=args.embed_batch,
+        )
+        return
 
     run(
         questions_csv=args.questions,
@@ -250,6 +485,11 @@ def main():
         score_url=args.score_url,
         task_desc=args.task_desc,
         sleep_sec=args.sleep,
+        checkpoint_path=args.checkpoint,
+        fresh=args.fresh,
+        score_cache=score_cache,
+        embed_cache_dir=args.embed_cache,
+        embed_batch=args.embed_batch,
     )
 
 
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+score_cache.py
+
+評分 API 結果的本地快取（JSONL，跨次執行保留）：
+- key = (score_url, q_id, sha256(student_answer))
+- 呼叫 score_api 前先查；換 chunker 重跑時，top-1 文字沒變的題目不用再打 API
+- 每個新結果只 append 一列（同 eval_checkpoint.py），不會每次重寫整個檔；同 key 以最後一列為準
+- 最後印出命中率
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+SCORE_CACHE_FILE_DEFAULT = "score_cache.jsonl"
+
+
+def make_key(score_url: str, q_id: int, student_answer: str) -> str:
+    digest = hashlib.sha256(student_answer.encode("utf-8")).hexdigest()
+    return f"{score_url}|{int(q_id)}|{digest}"
+
+
+class ScoreCache:
+    def __init__(self, path: str = SCORE_CACHE_FILE_DEFAULT, enabled: bool = True) -> None:
+        self.path = path
+        self.enabled = enabled
+        self._data: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if enabled and os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            text = f.read()
+        for line in text.splitlines():
+            try:
+                rec = json.loads(line)
+                self._data[str(rec["key"])] = float(rec["score"])
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                continue  # 空白列或寫到一半被中斷的最後一列，丟掉重打即可
+        if text and not text.endswith("\n"):
+            self._rewrite()  # 切掉沒寫完的尾巴，否則下一筆 append 會黏在同一列
+
+    def get(self, score_url: str, q_id: int, student_answer: str) -> Optional[float]:
+        if not self.enabled:
+            return None
+        key = make_key(score_url, q_id, student_answer)
+        with self._lock:
+            score = self._data.get(key)
+            if score is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return score
+
+    def put(self, score_url: str, q_id: int, student_answer: str, score: float) -> None:
+        if not self.enabled:
+            return
+        key = make_key(score_url, q_id, student_answer)
+        line = json.dumps({"key": key, "score": float(score)}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._data[key] = float(score)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def _rewrite(self) -> None:
+        # 先寫暫存檔再 replace，寫到一半中斷也不會把舊快取弄壞（只在載入時修尾巴用）
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for key, score in self._data.items():
+                f.write(json.dumps({"key": key, "score": score}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (
+            f"score cache: hits={self.hits} misses={self.misses} "
+            f"hit_rate={rate:.1%} entries={len(self._data)} ({self.path})"
+        )
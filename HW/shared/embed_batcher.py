@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+embed_batcher.py
+
+依「總字元數（或 token 數）」切 /embed 批次，並依實際延遲 / 錯誤自動調整大小：
+- 一批塞到 budget 為止（至少 1 筆、最多 max_items 筆），短句一批很多筆、長 chunk 一批少筆
+- 成功：吞吐量（單位/秒）還在進步就放大 budget；開始變差就退回目前最好的 budget，之後不再長到變差的那個大小
+- 單批延遲超過 target_sec：縮小 budget（離 timeout 太近）
+- 413（或 400 / 422 且訊息說超過長度上限）：budget 砍半，該批拆成兩半重送；只剩 1 筆還失敗才真的丟出錯誤
+- 連線中斷、逾時、5xx 跟批次大小無關，不縮 budget，交給 embed_fn 的 session 重試（http_pool retry=True），還是失敗就丟出
+- report() 印出各 budget 區間的吞吐量曲線
+
+    batcher = AdaptiveBatcher()
+    mat = batcher.embed_all(texts, embed_fn)          # embed_fn(List[str]) -> (n, dim)
+    print(batcher.report())
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+SHRINK_STATUS = 413
+SIZE_ERROR_STATUS = (400, 422)  # 有些 server 用這兩個回「輸入太長」，要看訊息才知道
+SIZE_ERROR_HINTS = ("too large", "too long", "too many", "exceeds", "maximum context", "max_tokens")
+
+CountFn = Callable[[str], int]
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+BatchCallback = Callable[[List[str], np.ndarray], None]
+
+
+def is_too_large(exc: BaseException) -> bool:
+    """這個錯誤是不是「批次太大」造成的（縮小再試有機會成功）；網路錯誤不算。"""
+    if not isinstance(exc, requests.HTTPError) or exc.response is None:
+        return False
+    resp = exc.response
+    if resp.status_code == SHRINK_STATUS:
+        return True
+    return resp.status_code in SIZE_ERROR_STATUS and any(h in (resp.text or "").lower() for h in SIZE_ERROR_HINTS)
+
+
+@dataclass
+class BatchStat:
+    budget: int
+    n: int
+    size: int
+    sec: float
+    ok: bool
+
+
+class AdaptiveBatcher:
+    def __init__(
+        self,
+        budget: int = 8000,
+        *,
+        min_budget: int = 256,
+        max_budget: int = 131072,
+        max_items: int = 512,
+        target_sec: float = 15.0,
+        grow: float = 1.5,
+        shrink: float = 0.5,
+        count: CountFn = len,
+        unit: str = "chars",
+    ) -> None:
+        self.budget = budget
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.max_items = max_items
+        self.target_sec = target_sec
+        self.grow = grow
+        self.shrink = shrink
+        self.count = count
+        self.unit = unit
+
+        self.best_rate = 0.0
+        self.best_budget = budget
+        self.ceiling = max_budget  # 試過、吞吐量反而變差的 budget
+        self.history: List[BatchStat] = []
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # 批次大小
+    # -----------------------------
+    def full(self, n: int, size: int) -> bool:
+        """目前累積 n 筆 / size 單位，是否該送出了（給邊讀邊組 batch 的呼叫端用）。"""
+        return n >= self.max_items or size >= self.budget
+
+    def take(self, sizes: Sequence[int], start: int) -> int:
+        """從 start 開始塞到 budget 為止，回傳結束 index（至少 1 筆）。"""
+        budget = self.budget
+        end, total = start + 1, sizes[start]
+        while end < len(sizes) and end - start < self.max_items and total + sizes[end] <= budget:
+            total += sizes[end]
+            end += 1
+        return end
+
+    def observe(self, n: int, size: int, sec: float) -> None:
+        rate = size / max(sec, 1e-6)
+        with self._lock:
+            self.history.append(BatchStat(self.budget, n, size, sec, True))
+            if sec > self.target_sec:
+                self.budget = max(self.min_budget, int(self.budget * self.shrink))
+            elif rate >= self.best_rate * 0.95:
+                if rate > self.best_rate:
+                    self.best_rate, self.best_budget = rate, self.budget
+                # 只有這批真的塞到接近 budget，放大才有意義（資料不夠多時不要一直長）
+                grown = min(self.max_budget, int(self.budget * self.grow))
+                if size >= self.budget * 0.5 and grown < self.ceiling:
+                    self.budget = grown
+            else:
+                self.ceiling = min(self.ceiling, self.budget)
+                self.budget = self.best_budget
+
+    def failed(self, n: int, size: int, sec: float) -> None:
+        with self._lock:
+            self.history.append(BatchStat(self.budget, n, size, sec, False))
+            self.budget = max(self.min_budget, int(min(self.budget, size) * self.shrink))
+            self.ceiling = min(self.ceiling, size)
+            self.best_budget = min(self.best_budget, self.budget)
+
+    # -----------------------------
+    # 執行
+    # -----------------------------
+    def embed_all(
+        self,
+        texts: Sequence[str],
+        embed_fn: EmbedFn,
+        *,
+        workers: int = 1,
+        on_batch: Optional[BatchCallback] = None,
+    ) -> np.ndarray:
+        """
+        依目前 budget 切批呼叫 embed_fn，回傳與 texts 同順序的 (n, dim) float32。
+        workers > 1 時多批同時送；on_batch(批次文字, 向量) 在每批成功後呼叫（例如寫快取）。
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        sizes = [self.count(t) for t in texts]
+
+        queue_lock = threading.Lock()
+        state = {"cursor": 0}
+        retry: List[Tuple[int, int]] = []  # 失敗後拆開、等著重送的區間
+        results: Dict[int, np.ndarray] = {}
+        abort = threading.Event()
+
+        def next_range() -> Optional[Tuple[int, int]]:
+            with queue_lock:
+                if retry:
+                    return retry.pop()
+                i = state["cursor"]
+                if i >= len(texts):
+                    return None
+                j = self.take(sizes, i)
+                state["cursor"] = j
+                return i, j
+
+        def worker() -> None:
+            while not abort.is_set():
+                rng = next_range()
+                if rng is None:
+                    return
+                i, j = rng
+                batch, size = texts[i:j], sum(sizes[i:j])
+                t0 = time.perf_counter()
+                try:
+                    vecs = np.asarray(embed_fn(batch), dtype=np.float32)
+                except Exception as e:
+                    sec = time.perf_counter() - t0
+                    if j - i == 1 or not is_too_large(e):
+                        abort.set()
+                        raise
+                    self.failed(j - i, size, sec)
+                    mid = i + (j - i) // 2
+                    with queue_lock:
+                        retry.extend([(mid, j), (i, mid)])  # pop() 先拿前半
+                    continue
+                self.observe(j - i, size, time.perf_counter() - t0)
+                if on_batch is not None:
+                    on_batch(batch, vecs)
+                with queue_lock:
+                    results[i] = vecs
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for fut in [pool.submit(worker) for _ in range(workers)]:
+                    fut.result()
+        else:
+            worker()
+
+        return np.vstack([results[i] for i in sorted(results)])
+
+    # -----------------------------
+    # 報表
+    # -----------------------------
+    def report(self) -> str:
+        """依 budget（取 2 的次方區間）彙總：批數、平均筆數、吞吐量、平均延遲、失敗數。"""
+        with self._lock:
+            history = list(self.history)
+        if not history:
+            return "[BATCH] no /embed batches"
+
+        buckets: Dict[int, List[BatchStat]] = {}
+        for s in history:
+            buckets.setdefault(1 << max(s.budget, 1).bit_length() - 1, []).append(s)
+
+        lines = [
+            f"[BATCH] adaptive /embed batching ({self.unit}): final budget={self.budget}, best={self.best_budget}",
+            f"{'budget>=':>10}{'batches':>9}{'texts/b':>9}{'texts/s':>9}{self.unit + '/s':>12}{'lat ms':>9}{'fail':>6}",
+        ]
+        for b in sorted(buckets):
+            ok = [s for s in buckets[b] if s.ok]
+            sec = sum(s.sec for s in ok) or 1e-9
+            n = sum(s.n for s in ok)
+            lines.append(
+                f"{b:>10}{len(ok):>9}{n / max(len(ok), 1):>9.1f}{n / sec:>9.1f}"
+                f"{sum(s.size for s in ok) / sec:>12.0f}{sec / max(len(ok), 1) * 1000:>9.0f}"
+                f"{len(buckets[b]) - len(ok):>6}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+embed_dedup.py
+
+/embed 呼叫前先去重：
+- 同一個 request 裡重複的文字（頁首、樣板句、很短的重複 chunk）只送一次
+- 不同執行緒同時要 embed 同一段文字（例如併發查詢同一題）：第一個執行緒送出，
+  其他執行緒等它的結果（single-flight），不會重複計算
+- 結果再依原本順序展開回每個位置
+
+    from embed_dedup import embed_unique
+    mat = embed_unique(texts, post_fn, ns=(url, task_desc, normalize))   # post_fn(去重後的 texts) -> (n, dim)
+
+ns 用來區分 embed 參數（URL / task_description / normalize），只有 ns 與文字都相同才共用。
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+Key = Tuple[Hashable, str]
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: Dict[Key, Future] = {}
+
+        # requested = 呼叫端給的文字數；computed = 真的送去 embed 的數量
+        self.requested = 0
+        self.in_batch_dups = 0
+        self.joined = 0
+        self.computed = 0
+
+    def embed(self, texts: Sequence[str], embed_fn: EmbedFn, ns: Hashable = ()) -> np.ndarray:
+        """回傳與 texts 同順序的 (n, dim) float32；embed_fn 只會拿到「沒人在算」的不重複文字。"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # 1) request 內去重：每個位置對到 uniq 的第幾列
+        uniq: List[str] = []
+        row_of: Dict[str, int] = {}
+        for t in texts:
+            if t not in row_of:
+                row_of[t] = len(uniq)
+                uniq.append(t)
+
+        # 2) 跨執行緒：已經有人在算的就等它，其餘由自己認領
+        mine: List[Tuple[int, Future]] = []
+        theirs: List[Tuple[int, Future]] = []
+        with self._lock:
+            for r, t in enumerate(uniq):
+                fut = self._inflight.get((ns, t))
+                if fut is None:
+                    fut = self._inflight[(ns, t)] = Future()
+                    mine.append((r, fut))
+                else:
+                    theirs.append((r, fut))
+            self.requested += len(texts)
+            self.in_batch_dups += len(texts) - len(uniq)
+            self.joined += len(theirs)
+            self.computed += len(mine)
+
+        rows: List[Optional[np.ndarray]] = [None] * len(uniq)
+        if mine:
+            try:
+                vecs = np.asarray(embed_fn([uniq[r] for r, _ in mine]), dtype=np.float32)
+                if len(vecs) != len(mine):
+                    raise RuntimeError(f"Embedding count mismatch: got {len(vecs)} != texts {len(mine)}")
+            except BaseException as e:
+                for _, fut in mine:
+                    fut.set_exception(e)
+                raise
+            else:
+                for (r, fut), v in zip(mine, vecs):
+                    fut.set_result(v)
+                    rows[r] = v
+            finally:
+                # 先把結果交給等待者再移除：之後再來的同一段文字會重新計算（或先由快取擋掉）
+                with self._lock:
+                    for r, _ in mine:
+                        self._inflight.pop((ns, uniq[r]), None)
+
+        # 自己的先算完才等別人的：embed_fn 不會反過來等我們，不會互等卡死
+        for r, fut in theirs:
+            rows[r] = fut.result()
+
+        return np.vstack(rows)[[row_of[t] for t in texts]]
+
+    def summary(self) -> str:
+        with self._lock:
+            return (
+                f"embed dedup: requested={self.requested} computed={self.computed} "
+                f"in_batch_dups={self.in_batch_dups} joined_inflight={self.joined}"
+            )
+
+
+_FLIGHT = SingleFlight()
+
+
+def get_flight() -> SingleFlight:
+    return _FLIGHT
+
+
+def embed_unique(texts: Sequence[str], embed_fn: EmbedFn, ns: Hashable = ()) -> np.ndarray:
+    return _FLIGHT.embed(texts, embed_fn, ns)
+
+
+def print_stats() -> None:
+    if _FLIGHT.requested:
+        print(f"[INFO] {_FLIGHT.summary()}")
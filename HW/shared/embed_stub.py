@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+embed_stub.py
+
+本機假的 /embed 服務（只用標準函式庫 + numpy），給 benchmark / 離線測試用，不用每次都打 ws-04：
+- 介面同學長的服務：POST {"texts": [...], "task_description": ..., "normalize": ...} -> {"embeddings": [...]}
+- 向量由 sha256(task_description + text) 當亂數種子產生：同一段文字永遠同一個向量，不同文字幾乎正交
+- 支援 "encoding_format": "base64"（--no-base64 改成回 422，模擬舊版 server）
+- 延遲 = base + 每筆 + 每字元（可加 jitter），--max-chars 超過回 413，--fail-rate 隨機回 503
+
+    python embed_stub.py --port 8090 --base-ms 20 --per-text-ms 1 --per-kchar-ms 2
+    EMBED_API_URL=http://127.0.0.1:8090/embed python main.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DIM_DEFAULT = 4096
+
+
+@dataclass
+class StubConfig:
+    dim: int = DIM_DEFAULT
+    base_ms: float = 20.0       # 每個 request 固定成本
+    per_text_ms: float = 0.5    # 每筆文字
+    per_kchar_ms: float = 1.0   # 每 1000 字元
+    jitter: float = 0.1         # 延遲 ±10% 隨機
+    max_chars: int = 0          # 單一 request 總字元上限（0 = 不限），超過回 413
+    fail_rate: float = 0.0      # 隨機回 503 的機率
+    base64: bool = True         # False：帶 encoding_format 就回 422
+
+
+def hash_vector(text: str, task_description: str = "", dim: int = DIM_DEFAULT, normalize: bool = True) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(f"{task_description}\n{text}".encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    if normalize:
+        vec /= np.linalg.norm(vec)
+    return vec
+
+
+def latency_sec(cfg: StubConfig, texts: List[str]) -> float:
+    ms = cfg.base_ms + cfg.per_text_ms * len(texts) + cfg.per_kchar_ms * sum(map(len, texts)) / 1000
+    return max(ms * (1 + random.uniform(-cfg.jitter, cfg.jitter)), 0.0) / 1000
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: "StubServer"
+    protocol_version = "HTTP/1.1"  # keep-alive，跟真的服務一樣可以重用連線
+    # header 與 body 分兩次寫出：不關 Nagle 的話，keep-alive 下 body 會卡在 delayed ACK 約 40ms，量到的延遲全是假的
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/health":
+            self._send(200, {"ok": True, **self.server.stats()})
+        else:
+            self._send(404, {"detail": "not found"})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") != "/embed":
+            self._send(404, {"detail": "not found"})
+            return
+        cfg = self.server.cfg
+        try:
+            req = json.loads(body)
+            texts = [str(t) for t in req["texts"]]
+        except (ValueError, KeyError, TypeError):
+            self._send(422, {"detail": "body must be JSON with a 'texts' list"})
+            return
+
+        encoding = req.get("encoding_format")
+        if encoding is not None and not cfg.base64:
+            self._send(422, {"detail": "extra field not permitted: encoding_format"})
+            return
+        if cfg.max_chars and sum(map(len, texts)) > cfg.max_chars:
+            self._send(413, {"detail": f"request too large (> {cfg.max_chars} chars)"})
+            return
+        if cfg.fail_rate and random.random() < cfg.fail_rate:
+            self._send(503, {"detail": "injected failure"})
+            return
+
+        time.sleep(latency_sec(cfg, texts))
+        task, normalize = str(req.get("task_description") or ""), bool(req.get("normalize", True))
+        vecs = [hash_vector(t, task, cfg.dim, normalize) for t in texts]
+        if encoding == "base64":
+            out: List[Any] = [base64.b64encode(v.astype("<f4").tobytes()).decode("ascii") for v in vecs]
+        else:
+            out = [v.tolist() for v in vecs]
+        self.server.count(len(texts))
+        self._send(200, {"embeddings": out})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: Tuple[str, int], cfg: StubConfig) -> None:
+        super().__init__(addr, StubHandler)
+        self.cfg = cfg
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+
+    def count(self, n: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.texts += n
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "texts": self.texts}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/embed"
+
+
+def serve(cfg: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """背景執行緒啟動（port=0 自動挑空的），回傳 server；用 server.url 取得 /embed 位址，server.shutdown() 關掉。"""
+    server = StubServer((host, port), cfg or StubConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    d = StubConfig()
+    ap = argparse.ArgumentParser(description="Local stand-in for the /embed service (deterministic hash vectors)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--dim", type=int, default=d.dim)
+    ap.add_argument("--base-ms", type=float, default=d.base_ms, help="fixed latency per request")
+    ap.add_argument("--per-text-ms", type=float, default=d.per_text_ms, help="extra latency per text")
+    ap.add_argument("--per-kchar-ms", type=float, default=d.per_kchar_ms, help="extra latency per 1000 chars")
+    ap.add_argument("--jitter", type=float, default=d.jitter, help="relative latency jitter (0.1 = ±10%%)")
+    ap.add_argument("--max-chars", type=int, default=d.max_chars, help="413 above this many chars per request")
+    ap.add_argument("--fail-rate", type=float, default=d.fail_rate, help="probability of an injected 503")
+    ap.add_argument("--no-base64", action="store_true", help="reject encoding_format with 422 (old server)")
+    return ap
+
+
+def main() -> None:
+    args = build_argparser().parse_args()
+    cfg = StubConfig(
+        dim=args.dim,
+        base_ms=args.base_ms,
+        per_text_ms=args.per_text_ms,
+        per_kchar_ms=args.per_kchar_ms,
+        jitter=args.jitter,
+        max_chars=args.max_chars,
+        fail_rate=args.fail_rate,
+        base64=not args.no_base64,
+    )
+    server = StubServer((args.host, args.port), cfg)
+    print(f"[embed-stub] {server.url} dim={cfg.dim} latency={cfg.base_ms}ms+{cfg.per_text_ms}ms/text"
+          f"+{cfg.per_kchar_ms}ms/kchar", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
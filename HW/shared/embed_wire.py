@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+embed_wire.py
+
+/embed 回應的傳輸格式：
+- JSON 小數陣列：每個文字 4096 個十進位浮點數，resp.json() 解析的時間比網路傳輸還久，大小約是 float32 原始 bytes 的 4 倍
+- base64 float32（同 OpenAI 的 encoding_format="base64"）：每個向量一個字串，np.frombuffer 直接還原
+
+request 會帶 "encoding_format": "base64"：
+- server 看得懂 → 回 base64 字串
+- server 忽略這個欄位 → 照樣回小數陣列，decode_embeddings 兩種都吃
+- server 回 400 / 422 且錯誤訊息提到 encoding_format → 只有這一次 request 拿掉欄位重送
+  其他 400 / 422（輸入錯、批次太大）照常丟出錯誤；不記任何全域狀態，下一次照樣先試 base64
+  （確定 server 不支援就設 EMBED_ENCODING=float，省掉每次被拒的那一趟）
+
+    from embed_wire import post_embeddings
+    mat = post_embeddings(http_pool.post, url, {"texts": texts, "normalize": True}, retry=True)   # (n, dim) float32
+
+EMBED_ENCODING=float 可強制走原本的 JSON 小數格式（除錯 / 比對用）。
+"""
+
+from __future__ import annotations
+
+import base64
+import os
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+import numpy as np
+
+ENCODING_FORMAT = "base64"
+REJECT_STATUS = (400, 422)  # 422：FastAPI / pydantic 不認得欄位
+
+PostFn = Callable[..., Any]  # requests.post / Session.post / http_pool.post
+
+def wants_base64() -> bool:
+    return os.getenv("EMBED_ENCODING", ENCODING_FORMAT).lower() != "float"
+
+
+def decode_vector(item: Union[str, Sequence[float]]) -> np.ndarray:
+    if isinstance(item, str):
+        return np.frombuffer(base64.b64decode(item), dtype="<f4")
+    return np.asarray(item, dtype=np.float32)
+
+
+def decode_embeddings(items: List[Union[str, Sequence[float]]]) -> np.ndarray:
+    """base64 字串或小數陣列 → (n, dim) float32 矩陣。"""
+    if not items:
+        return np.zeros((0, 0), dtype=np.float32)
+    if isinstance(items[0], str):
+        return np.vstack([decode_vector(s) for s in items])
+    return np.asarray(items, dtype=np.float32)
+
+
+def extract_embeddings(data: Dict[str, Any]) -> List[Union[str, Sequence[float]]]:
+    """支援 {"embeddings": [...]} / {"embedding": [...]} 與 OpenAI 的 {"data": [{"embedding": ...}]}。"""
+    items = data.get("embeddings") or data.get("embedding")
+    if items is None and isinstance(data.get("data"), list):
+        items = [d["embedding"] for d in sorted(data["data"], key=lambda d: d.get("index", 0))]
+    if items is None:
+        raise ValueError(f"embed API 回傳沒有 embeddings：{list(data.keys())}")
+    return items
+
+
+def rejects_encoding(resp: Any) -> bool:
+    """這個錯誤回應是不是 server 不接受 encoding_format 欄位（而不是 request 本身有別的問題）。"""
+    return resp.status_code in REJECT_STATUS and "encoding_format" in (resp.text or "")
+
+
+def post_embeddings(post: PostFn, url: str, payload: Dict[str, Any], **kwargs) -> np.ndarray:
+    """送一次 /embed，回傳 (n, dim) float32；base64 不被接受時自動退回 JSON 小數。"""
+    if wants_base64():
+        resp = post(url, json={**payload, "encoding_format": ENCODING_FORMAT}, **kwargs)
+        if rejects_encoding(resp):
+            resp = post(url, json=payload, **kwargs)
+    else:
+        resp = post(url, json=payload, **kwargs)
+    resp.raise_for_status()
+    return decode_embeddings(extract_embeddings(resp.json()))
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+http_pool.py
+
+全部作業共用的 HTTP client（embed / Qdrant REST / 評分 / LLM / SearXNG / ASR）：
+- 共用的 requests.Session：每個 host 一個連線池，keep-alive，不用每次重新 TCP + TLS
+- 重試分兩種，POST 預設只走保守的那種：
+  - 預設（非冪等，評分 / LLM）：只重試「確定沒送到 server」的情況 —— 連線失敗與 429
+  - retry=True（冪等，embed / 搜尋 / GET）：另外重試 5xx / 524 / 讀取逾時 / 連線中斷
+  兩種都是 exponential backoff + jitter，有 Retry-After 就照它
+- post / get 沒給 timeout 就套預設值（連線 5 秒、讀取 60 秒）
+- 每個 host 記一份延遲直方圖（到收到 response header 為止），print_stats() 印出來
+
+    from http_pool import post, get_session, print_stats
+    r = post(url, json=payload)                  # 評分 / LLM：不會因為逾時或 5xx 重送
+    r = post(url, json=payload, retry=True)      # embed / 搜尋：冪等，5xx / 逾時也重送
+    session = get_session(retry=True)            # 需要 Session 的既有程式碼（執行緒共用同一個）
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUS = (429, 500, 502, 503, 504, 524)
+SAFE_RETRY_STATUS = (429,)  # 非冪等請求只重試這些：server 明確表示沒處理
+DEFAULT_TIMEOUT = (5, 60)  # (connect, read) 秒
+POOL_MAXSIZE = 32          # 每個 host 最多保留幾條連線（>= 併發執行緒數）
+POOL_HOSTS = 16            # 最多同時保留幾個 host 的連線池
+
+# 直方圖邊界（ms），最後一格是 > 10s
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.statuses: Dict[int, int] = {}
+        self.retries = 0
+
+    def record(self, ms: float, status: int, retries: int = 0) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.retries += retries
+
+    @property
+    def n(self) -> int:
+        return sum(self.counts)
+
+    def percentile(self, p: float) -> float:
+        """以直方圖估算（回傳該筆落在的那一格上界）。"""
+        if not self.n:
+            return 0.0
+        target = p / 100 * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, object]:
+        n = self.n
+        return {
+            "n": n,
+            "mean_ms": round(self.total_ms / n, 1) if n else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "max_ms": round(self.max_ms, 1),
+            "retries": self.retries,
+            "status": dict(sorted(self.statuses.items())),
+            "buckets": dict(zip([f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"], self.counts)),
+        }
+
+
+class _SafeRetry(Retry):
+    # urllib3 預設 413 / 503 帶 Retry-After 也會重試；非冪等請求只認 429
+    RETRY_AFTER_STATUS_CODES = frozenset(SAFE_RETRY_STATUS)
+
+
+class HttpPool:
+    def __init__(
+        self,
+        retries: int = 3,
+        backoff: float = 0.5,
+        backoff_max: float = 8.0,
+        pool_maxsize: int = POOL_MAXSIZE,
+        timeout=DEFAULT_TIMEOUT,
+    ) -> None:
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        common = dict(
+            total=retries,
+            connect=retries,
+            status=retries,
+            allowed_methods=None,          # 要不要重試由 session 決定，不看 method
+            backoff_factor=backoff,
+            backoff_max=backoff_max,
+            backoff_jitter=backoff,        # 同時重試的執行緒錯開，不會一起再打爆 server
+            respect_retry_after_header=True,
+            raise_on_status=False,         # 重試用完就把最後的 response 交回去，由呼叫端 raise_for_status
+        )
+        # 冪等：5xx / 逾時 / 連線中斷都重送
+        self._retry_idempotent = Retry(read=retries, status_forcelist=RETRY_STATUS, **common)
+        # 非冪等：request 可能已經被處理（評分記分、LLM 生成要錢），只重試連線失敗與 429；
+        # read=False：讀取逾時 / 中途斷線直接丟給呼叫端（requests 的 ReadTimeout / ConnectionError）
+        self._retry_safe = _SafeRetry(read=False, other=0, status_forcelist=SAFE_RETRY_STATUS, **common)
+
+        self.session = self._new_session(self._retry_safe)
+        self.retry_session = self._new_session(self._retry_idempotent)
+
+        self._lock = threading.Lock()
+        self.hosts: Dict[str, LatencyHistogram] = {}
+        self.errors: Dict[str, int] = {}
+
+    def _mount(self, session: requests.Session, retry: Retry) -> None:
+        adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    def _new_session(self, retry: Retry) -> requests.Session:
+        session = requests.Session()
+        self._mount(session, retry)
+        session.hooks["response"].append(self._record)
+        return session
+
+    def ensure_pool_size(self, n: int) -> None:
+        """併發執行緒數超過連線池大小時放大（否則多出來的連線用完就丟，一直重新握手）。"""
+        with self._lock:
+            if n <= self.pool_maxsize:
+                return
+            self.pool_maxsize = n
+            self._mount(self.session, self._retry_safe)
+            self._mount(self.retry_session, self._retry_idempotent)
+
+    def _hist(self, host: str) -> LatencyHistogram:
+        h = self.hosts.get(host)
+        if h is None:
+            h = self.hosts.setdefault(host, LatencyHistogram())
+        return h
+
+    def _record(self, resp: requests.Response, *args, **kwargs) -> None:
+        host = urlsplit(resp.url).netloc
+        retry_state = getattr(resp.raw, "retries", None)
+        n_retries = len(retry_state.history) if retry_state is not None else 0
+        with self._lock:
+            self._hist(host).record(resp.elapsed.total_seconds() * 1000, resp.status_code, n_retries)
+
+    def request(self, method: str, url: str, retry: bool = False, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.retry_session if retry else self.session
+        try:
+            return session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            host = urlsplit(url).netloc
+            with self._lock:
+                self.errors[host] = self.errors.get(host, 0) + 1
+            raise
+
+    def get(self, url: str, retry: bool = True, **kwargs) -> requests.Response:
+        return self.request("GET", url, retry=retry, **kwargs)
+
+    def post(self, url: str, retry: bool = False, **kwargs) -> requests.Response:
+        return self.request("POST", url, retry=retry, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            out = {host: h.snapshot() for host, h in self.hosts.items()}
+            for host, n in self.errors.items():
+                out.setdefault(host, LatencyHistogram().snapshot())["errors"] = n
+        return out
+
+    def report(self) -> str:
+        lines = [f"{'host':<32}{'n':>6}{'mean':>9}{'p50':>8}{'p95':>8}{'max':>9}{'retry':>7}{'err':>5}  status"]
+        for host, s in sorted(self.stats().items()):
+            lines.append(
+                f"{host:<32}{s['n']:>6}{s['mean_ms']:>9}{s['p50_ms']:>8.0f}{s['p95_ms']:>8.0f}"
+                f"{s['max_ms']:>9}{s['retries']:>7}{s.get('errors', 0):>5}  {s['status']}"
+            )
+        return "\n".join(lines)
+
+
+_POOL: Optional[HttpPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> HttpPool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = HttpPool()
+    return _POOL
+
+
+def get_session(retry: bool = False) -> requests.Session:
+    """retry=True：冪等呼叫用（embed / 搜尋），5xx / 逾時也重送；預設只重試連線失敗與 429。"""
+    pool = get_pool()
+    return pool.retry_session if retry else pool.session
+
+
+def ensure_pool_size(n: int) -> None:
+    get_pool().ensure_pool_size(n)
+
+
+def get(url: str, retry: bool = True, **kwargs) -> requests.Response:
+    return get_pool().get(url, retry=retry, **kwargs)
+
+
+def post(url: str, retry: bool = False, **kwargs) -> requests.Response:
+    return get_pool().post(url, retry=retry, **kwargs)
+
+
+def print_stats() -> None:
+    pool = get_pool()
+    if pool.hosts or pool.errors:
+        print("[HTTP] per-host latency (ms, to response headers)")
+        print(pool.report())
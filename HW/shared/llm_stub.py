@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+llm_stub.py
+
+本機假的 OpenAI-compatible LLM 服務（只用標準函式庫），讓 Day2～Day5 的 chain / graph 可以離線壓測、
+量自己的編排成本，不用打遠端 vLLM：
+- GET  /v1/models
+- POST /v1/chat/completions：非串流 / 串流（SSE，stream_options.include_usage）/ tool calls / max_tokens
+- TTFT 與 tokens/sec 可調（串流時逐 token 照速率送出）
+- 劇本（--script，JSON 陣列或 JSONL）：依最後一則 user 訊息的 regex、是否剛收到 tool 結果等條件，
+  指定回覆內容、tool calls、失敗方式、TTFT / 速率
+- 失敗注入：隨機或劇本指定 524 / 5xx / 429、timeout（一直不回）、drop（串流到一半斷線）
+- 沒有劇本時：json_schema / 強制 tool_choice 依 schema 產生最小合法值；--auto-tools 會先呼叫第一個 tool
+
+    python llm_stub.py --port 8091 --ttft-ms 300 --tps 40
+    LLM_BASE_URL=http://127.0.0.1:8091/v1 python ../Day4_hw/ch6_1.py
+
+劇本範例（第一次問天氣先叫 tool，拿到 tool 結果再回答；含「壞掉」的問題回 524）：
+    [{"match": "天氣", "after_tool": false, "tool_calls": [{"name": "get_weather", "arguments": {"city": "台中"}}]},
+     {"match": "天氣", "after_tool": true, "content": "台中今天晴天。"},
+     {"match": "壞掉", "fail": 524}]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+FAIL_MODES = ["524", "500", "502", "503", "429", "timeout", "drop"]
+
+# 一個中日韓字一個 token；其他依空白切（含後面的空白），接回去就是原字串
+_TOKEN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]|[^\s\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+\s*|\s+")
+
+FILLER = "這是本機 stub 產生的回覆內容，用來模擬模型逐字輸出的速度與長度。"
+
+
+@dataclass
+class Rule:
+    match: Optional[str] = None          # regex，搜尋最後一則 user 訊息
+    model: Optional[str] = None          # regex，比對 request 的 model
+    after_tool: Optional[bool] = None    # True：最後一則是 tool 結果才符合；False：不是才符合
+    content: Optional[str] = None
+    tool_calls: Optional[List[Dict[str, Any]]] = None  # [{"name": ..., "arguments": {...} 或 JSON 字串}]
+    fail: Optional[Union[int, str]] = None             # HTTP 狀態碼，或 "timeout" / "drop"
+    ttft_ms: Optional[float] = None
+    tps: Optional[float] = None
+    times: Optional[int] = None          # 只生效幾次（None = 不限）
+
+    def matches(self, model: str, last_user: str, after_tool: bool) -> bool:
+        if self.times is not None and self.times <= 0:
+            return False
+        if self.model is not None and not re.search(self.model, model):
+            return False
+        if self.match is not None and not re.search(self.match, last_user):
+            return False
+        return self.after_tool is None or self.after_tool == after_tool
+
+
+@dataclass
+class LLMStubConfig:
+    ttft_ms: float = 200.0
+    tps: float = 50.0                   # 每秒輸出 token 數（<=0：一次送完）
+    jitter: float = 0.1
+    reply_tokens: int = 48              # 預設回覆長度（token）
+    models: List[str] = field(default_factory=lambda: ["stub-model"])
+    auto_tools: bool = False
+    fail_rate: float = 0.0
+    fail_mode: str = "524"
+    hang_sec: float = 600.0             # timeout 模式卡住多久
+    rules: List[Rule] = field(default_factory=list)
+
+
+def load_rules(path: str) -> List[Rule]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    items = json.loads(text) if text.startswith("[") else [json.loads(ln) for ln in text.splitlines() if ln.strip()]
+    names = {f.name for f in fields(Rule)}
+    return [Rule(**{k: v for k, v in item.items() if k in names}) for item in items]
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def message_text(msg: Dict[str, Any]) -> str:
+    content = msg.get("content")
+    if isinstance(content, list):  # [{"type": "text", "text": ...}, {"type": "image_url", ...}]
+        return "".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return content or ""
+
+
+def schema_instance(schema: Dict[str, Any], defs: Optional[Dict[str, Any]] = None) -> Any:
+    """依 JSON schema 產生最小合法值（structured output / 強制 tool call 用）。"""
+    defs = defs if defs is not None else {**schema.get("definitions", {}), **schema.get("$defs", {})}
+    if "$ref" in schema:
+        return schema_instance(defs.get(schema["$ref"].rsplit("/", 1)[-1], {}), defs)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return schema_instance(options[0], defs)
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    if "default" in schema:
+        return schema["default"]
+
+    t = schema.get("type")
+    if isinstance(t, list):
+        t = next((x for x in t if x != "null"), "null")
+    if t == "object" or (t is None and "properties" in schema):
+        return {k: schema_instance(v, defs) for k, v in schema.get("properties", {}).items()}
+    if t == "array":
+        n = schema.get("minItems", 0)
+        return [schema_instance(schema.get("items", {}), defs) for _ in range(n)]
+    return {"string": "stub", "integer": 0, "number": 0.0, "boolean": False, "null": None}.get(t, "stub")
+
+
+class LLMStubHandler(BaseHTTPRequestHandler):
+    server: "LLMStubServer"
+    protocol_version = "HTTP/1.1"
+    # SSE 每個 chunk 都是一次小 write：不關 Nagle 的話會卡在 delayed ACK 約 40ms，TTFT / 延遲全被灌水
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    # -----------------------------
+    # 輸出
+    # -----------------------------
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int) -> None:
+        if status == 524:
+            # Cloudflare 的逾時頁：不是 JSON，client 要能處理
+            data = b"error code: 524"
+            self.send_response(524, "A Timeout Occurred")
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._send_json(status, {"error": {"message": f"injected failure ({status})", "type": "stub_error",
+                                           "code": status}})
+
+    def _chunk(self, obj: Union[Dict[str, Any], str]) -> None:
+        payload = obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False)
+        data = f"data: {payload}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    # -----------------------------
+    # 路由
+    # -----------------------------
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path in ("/v1/models", "/models"):
+            now = int(time.time())
+            self._send_json(200, {"object": "list", "data": [
+                {"id": m, "object": "model", "created": now, "owned_by": "stub"} for m in self.server.cfg.models
+            ]})
+        elif path in ("/health", "/stats"):
+            self._send_json(200, {"ok": True, **self.server.stats()})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        try:
+            req = json.loads(body)
+            messages = req["messages"]
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": {"message": "body must be JSON with 'messages'"}})
+            return
+        self._chat(req, messages)
+
+    # -----------------------------
+    # chat completions
+    # -----------------------------
+    def _plan(self, req: Dict[str, Any], messages: List[Dict[str, Any]]) -> Tuple[Optional[Rule], str, List[Dict]]:
+        """決定這次要回什麼：(符合的劇本規則, 文字內容, tool calls)。"""
+        cfg = self.server.cfg
+        model = str(req.get("model", ""))
+        users = [m for m in messages if m.get("role") == "user"]
+        last_user = message_text(users[-1]) if users else ""
+        after_tool = bool(messages) and messages[-1].get("role") == "tool"
+
+        rule = self.server.pick_rule(model, last_user, after_tool)
+        if rule is not None and (rule.content is not None or rule.tool_calls):
+            return rule, rule.content or "", [
+                {"name": tc["name"], "arguments": tc.get("arguments", {})} for tc in rule.tool_calls or []
+            ]
+
+        tools = [t["function"] for t in req.get("tools") or [] if t.get("type") == "function"]
+        choice = req.get("tool_choice")
+        forced = None
+        if isinstance(choice, dict):
+            forced = next((t for t in tools if t["name"] == choice.get("function", {}).get("name")), None)
+        elif tools and (choice == "required" or (cfg.auto_tools and choice != "none" and not after_tool)):
+            forced = tools[0]
+        if forced is not None:
+            return rule, "", [{"name": forced["name"], "arguments": schema_instance(forced.get("parameters", {}))}]
+
+        fmt = req.get("response_format") or {}
+        if fmt.get("type") == "json_schema":
+            schema = fmt.get("json_schema", {}).get("schema", {})
+            return rule, json.dumps(schema_instance(schema), ensure_ascii=False), []
+        if fmt.get("type") == "json_object":
+            return rule, "{}", []
+
+        head = f"（stub）{last_user[:60]}" if last_user else "（stub）"
+        toks = tokenize(head)
+        while len(toks) < cfg.reply_tokens:
+            toks.extend(tokenize(FILLER))
+        return rule, "".join(toks[: max(cfg.reply_tokens, len(tokenize(head)))]), []
+
+    def _chat(self, req: Dict[str, Any], messages: List[Dict[str, Any]]) -> None:
+        cfg = self.server.cfg
+        rule, content, calls = self._plan(req, messages)
+
+        fail = rule.fail if rule is not None and rule.fail is not None else None
+        if fail is None and cfg.fail_rate and random.random() < cfg.fail_rate:
+            fail = cfg.fail_mode
+        stream = bool(req.get("stream"))
+        self.server.count("requests", stream=stream)
+        if fail is not None:
+            self.server.count(f"fail_{fail}")
+            if str(fail) == "timeout":
+                time.sleep(cfg.hang_sec)  # client 的 read timeout 會先到
+                self.close_connection = True
+                return
+            if str(fail) != "drop" or not stream:
+                self._send_error(int(fail) if str(fail).isdigit() else 500)
+                return
+
+        def jittered(x: float) -> float:
+            return max(x * (1 + random.uniform(-cfg.jitter, cfg.jitter)), 0.0)
+
+        ttft = jittered(rule.ttft_ms if rule is not None and rule.ttft_ms is not None else cfg.ttft_ms) / 1000
+        tps = rule.tps if rule is not None and rule.tps is not None else cfg.tps
+
+        tokens = tokenize(content)
+        limit = req.get("max_completion_tokens") or req.get("max_tokens")
+        finish = "tool_calls" if calls else "stop"
+        if limit and len(tokens) > int(limit):
+            tokens, finish = tokens[: int(limit)], "length"
+        content = "".join(tokens)
+
+        tool_calls = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {
+                "name": c["name"],
+                "arguments": c["arguments"] if isinstance(c["arguments"], str)
+                else json.dumps(c["arguments"], ensure_ascii=False),
+            },
+        } for c in calls]
+
+        prompt_tokens = sum(len(tokenize(message_text(m))) for m in messages)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()),
+                "model": req.get("model") or cfg.models[0]}
+        self.server.count("completion_tokens", len(tokens))
+
+        if not stream:
+            time.sleep(ttft + (len(tokens) / tps if tps > 0 else 0))
+            message: Dict[str, Any] = {"role": "assistant", "content": content if content or not tool_calls else None}
+            if tool_calls:
+                message["tool_calls"] = tool_calls
+            self._send_json(200, {**base, "object": "chat.completion", "usage": usage,
+                                  "choices": [{"index": 0, "message": message, "finish_reason": finish}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def delta(d: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {**base, "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": d, "finish_reason": finish_reason}]}
+
+        time.sleep(ttft)
+        self._chunk(delta({"role": "assistant", "content": ""}))
+        t0 = time.perf_counter()
+        drop_at = len(tokens) // 2 if str(fail) == "drop" else None
+        for i, tok in enumerate(tokens):
+            if drop_at is not None and i >= drop_at:
+                self.close_connection = True  # 不送結尾 chunk 就斷線
+                return
+            if tps > 0:
+                wait = t0 + i / tps - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+            self._chunk(delta({"content": tok}))
+        for i, tc in enumerate(tool_calls):
+            self._chunk(delta({"tool_calls": [{"index": i, **tc}]}))
+        self._chunk(delta({}, finish))
+        if (req.get("stream_options") or {}).get("include_usage"):
+            self._chunk({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        self._chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class LLMStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: Tuple[str, int], cfg: LLMStubConfig) -> None:
+        super().__init__(addr, LLMStubHandler)
+        self.cfg = cfg
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+
+    def pick_rule(self, model: str, last_user: str, after_tool: bool) -> Optional[Rule]:
+        with self._lock:
+            for rule in self.cfg.rules:
+                if rule.matches(model, last_user, after_tool):
+                    if rule.times is not None:
+                        rule.times -= 1
+                    return rule
+        return None
+
+    def count(self, key: str, n: int = 1, stream: bool = False) -> None:
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+            if stream:
+                self.counters["streams"] = self.counters.get("streams", 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def serve(cfg: Optional[LLMStubConfig] = None, host: str = "127.0.0.1", port: int = 0) -> LLMStubServer:
+    """背景執行緒啟動（port=0 自動挑），server.base_url 給 OpenAI / ChatOpenAI 的 base_url。"""
+    server = LLMStubServer((host, port), cfg or LLMStubConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_argparser() -> argparse.ArgumentParser:
+    d = LLMStubConfig()
+    ap = argparse.ArgumentParser(description="Local OpenAI-compatible LLM stand-in (/v1/chat/completions, /v1/models)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8091)
+    ap.add_argument("--ttft-ms", type=float, default=d.ttft_ms, help="time to first token")
+    ap.add_argument("--tps", type=float, default=d.tps, help="output tokens/sec (<=0: no pacing)")
+    ap.add_argument("--jitter", type=float, default=d.jitter, help="relative TTFT jitter")
+    ap.add_argument("--reply-tokens", type=int, default=d.reply_tokens, help="length of the default reply")
+    ap.add_argument("--models", nargs="+", default=d.models, help="ids listed by /v1/models (any id is accepted)")
+    ap.add_argument("--script", default=None, help="JSON / JSONL rules (match, after_tool, content, tool_calls, fail, ...)")
+    ap.add_argument("--auto-tools", action="store_true", help="call the first offered tool unless a tool result just came back")
+    ap.add_argument("--fail-rate", type=float, default=d.fail_rate, help="probability of an injected failure")
+    ap.add_argument("--fail-mode", choices=FAIL_MODES, default=d.fail_mode)
+    ap.add_argument("--hang-sec", type=float, default=d.hang_sec, help="how long 'timeout' failures hang")
+    ap.add_argument("--seed", type=int, default=None)
+    return ap
+
+
+def main() -> None:
+    args = build_argparser().parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    cfg = LLMStubConfig(
+        ttft_ms=args.ttft_ms,
+        tps=args.tps,
+        jitter=args.jitter,
+        reply_tokens=args.reply_tokens,
+        models=args.models,
+        auto_tools=args.auto_tools,
+        fail_rate=args.fail_rate,
+        fail_mode=args.fail_mode,
+        hang_sec=args.hang_sec,
+        rules=load_rules(args.script) if args.script else [],
+    )
+    server = LLMStubServer((args.host, args.port), cfg)
+    print(f"[llm-stub] {server.base_url} ttft={cfg.ttft_ms}ms tps={cfg.tps} rules={len(cfg.rules)} "
+          f"fail_rate={cfg.fail_rate}({cfg.fail_mode})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()